@@ -1,20 +1,53 @@
 # Vollständige app.py mit dynamischem TTS, Tacotron-Fallback, Audioverwaltung und allen API-Routen
 
-from flask import Flask, request, jsonify, send_from_directory, abort
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file, abort, stream_with_context, g
 from flask_cors import CORS
-from datetime import datetime
+from werkzeug.security import safe_join
 import os
 import time
+import json
+import itertools
+import uuid
+import functools
+import threading
 import logging
 
 # =========================================================
 # LLM KONFIGURATION
-MAX_HISTORY_LENGTH = 20  # Begrenzt Historie auf Nachrichtenanzahl
+# Obergrenze der gespeicherten Historie: MAX_HISTORY_LENGTH (Umgebungsvariable, utils.py);
+# was ans LLM geht, bestimmt das Token-Budget (context_packer)
+# Ältere Runden im Hintergrund zu einer laufenden Zusammenfassung falten (konstante Prompt-Größe)
+HISTORY_SUMMARY_ENABLED = os.environ.get('HISTORY_SUMMARY_ENABLED', '1') != '0'
+# "MISTRAL" (API) oder "LOCAL" (llama.cpp im eigenen Worker-Prozess, offline)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'MISTRAL').strip().upper()
 
 # =========================================================
-# TTS KONFIGURATION: Wählen Sie hier Ihren aktiven TTS-Anbieter
-# Mögliche Werte: "GOOGLE", "MINIMAX", "OPENAI", "AMAZON_POLLY"
-ACTIVE_TTS_PROVIDER = "AMAZON_POLLY" # <--- HIER KÖNNEN SIE DEN ANBIETER WECHSELN
+# TTS KONFIGURATION: Wählen Sie hier Ihre TTS-Anbieter (Reihenfolge = Priorität)
+# Mögliche Werte: "GOOGLE", "MINIMAX", "OPENAI", "AMAZON_POLLY", "TACOTRON"
+# Bei mehreren Anbietern wählt der Router den schnellsten gesunden (z.B. "AMAZON_POLLY,OPENAI")
+TTS_PROVIDERS = ["AMAZON_POLLY"] # <--- HIER KÖNNEN SIE DEN ANBIETER WECHSELN
+if os.environ.get('TTS_PROVIDERS'):
+    TTS_PROVIDERS = [p.strip().upper() for p in os.environ['TTS_PROVIDERS'].split(',') if p.strip()]
+ACTIVE_TTS_PROVIDER = TTS_PROVIDERS[0] # Primärer Anbieter
+# Zweite Anfrage an den nächsten Anbieter, wenn der erste sein p95 überschreitet
+TTS_HEDGE_ENABLED = os.environ.get('TTS_HEDGE_ENABLED', '1') != '0'
+# =========================================================
+# TTS CACHE: Identische Texte (z.B. Starter-Sätze, Fehlerantworten) nur einmal synthetisieren
+TTS_CACHE_ENABLED = os.environ.get('TTS_CACHE_ENABLED', '1') != '0'
+TTS_CACHE_MAX_MB = int(os.environ.get('TTS_CACHE_MAX_MB', 200))
+# =========================================================
+# AUDIO IM SPEICHER: Antworten ohne Umweg über temp_audio ausliefern (große werden ausgelagert)
+AUDIO_BLOB_STORE_ENABLED = os.environ.get('AUDIO_BLOB_STORE_ENABLED', '1') != '0'
+# =========================================================
+# AUDIOFORMAT: Server-Reihenfolge; genutzt wird das erste, das Client UND Anbieter können (mp3 immer als Fallback)
+TTS_OUTPUT_FORMATS = [f.strip().lower() for f in os.environ.get('TTS_OUTPUT_FORMATS', 'opus,vorbis,mp3').split(',') if f.strip()]
+# =========================================================
+# ERÖFFNUNGS-POOL: vorbereitete Begrüßungen (Text + Audio) je Szenario - Start ohne LLM/TTS-Wartezeit
+# (0 = aus, z.B. für Skripte und Tests; sonst füllt er sich ab dem ersten Request)
+OPENING_POOL_ENABLED = os.environ.get('OPENING_POOL_ENABLED', '1') != '0'
+# =========================================================
+# STT: serverseitige Transkription mit Vosk (Modell wird beim Start geladen)
+STT_ENABLED = os.environ.get('STT_ENABLED', '1') != '0'
 # =========================================================
 
 # Setup für Render
@@ -36,69 +69,324 @@ logging.getLogger('boto3').setLevel(logging.WARNING)
 logging.getLogger('botocore').setLevel(logging.WARNING)
 
 # === Dummy-TTS (nur Fallback) ===
-def dummy_synthesize_tts(text, output_path):
+def dummy_synthesize_tts(text, formats=None):
     logger.warning("Dummy TTS wird verwendet.")
-    with open(output_path, "wb") as f:
-        f.write(b"Dummy Audio")
-    return True # Dummy-Funktion sollte Erfolg signalisieren, da sie immer eine Datei "schreibt"
+    return b"Dummy Audio", None, 'mp3' # Dummy-Funktion signalisiert Erfolg, da sie immer Daten "liefert"
 
 # === Dynamische TTS-Auswahl ===
-try:
-    if ACTIVE_TTS_PROVIDER == "GOOGLE":
-        from tts_google import synthesize_speech_google as synthesize_tts
-    elif ACTIVE_TTS_PROVIDER == "MINIMAX":
-        from tts_minimax import synthesize_speech_minimax as synthesize_tts
-    elif ACTIVE_TTS_PROVIDER == "OPENAI":
-        from tts_openai import synthesize_speech_openai as synthesize_tts
-    elif ACTIVE_TTS_PROVIDER == "AMAZON_POLLY":
-        from tts_amzpolly import synthesize_speech_amzpolly as synthesize_tts
-    elif ACTIVE_TTS_PROVIDER == "TACOTRON":
-        from tts_tacotron import synthesize_speech as synthesize_tts
+from tts_router import TTSProvider, TTSRouter
+
+def load_tts_provider(name):
+    """Importiert einen TTS-Anbieter; das Stimmprofil fließt in den Cache-Schlüssel ein."""
+    if name == "GOOGLE":
+        from tts_google import (synthesize_speech_google as synthesize, synthesize_bytes_google as synthesize_bytes,
+                                TTS_VOICE_PROFILE as profile, SUPPORTED_AUDIO_FORMATS as formats)
+    elif name == "MINIMAX":
+        from tts_minimax import (synthesize_speech_minimax as synthesize, synthesize_bytes_minimax as synthesize_bytes,
+                                 TTS_VOICE_PROFILE as profile, SUPPORTED_AUDIO_FORMATS as formats)
+    elif name == "OPENAI":
+        from tts_openai import (synthesize_speech_openai as synthesize, synthesize_bytes_openai as synthesize_bytes,
+                                TTS_VOICE_PROFILE as profile, SUPPORTED_AUDIO_FORMATS as formats)
+    elif name == "AMAZON_POLLY":
+        from tts_amzpolly import (synthesize_speech_amzpolly as synthesize, synthesize_bytes_amzpolly as synthesize_bytes,
+                                  TTS_VOICE_PROFILE as profile, SUPPORTED_AUDIO_FORMATS as formats)
+    elif name == "TACOTRON":
+        from tts_tacotron import (synthesize_speech as synthesize, synthesize_speech_bytes as synthesize_bytes,
+                                  TTS_VOICE_PROFILE as profile, SUPPORTED_AUDIO_FORMATS as formats)
     else:
-        synthesize_tts = dummy_synthesize_tts # Fallback auf Dummy
-except ImportError as e:
-    logger.error(f"TTS-Anbieter '{ACTIVE_TTS_PROVIDER}' konnte nicht geladen werden: {e}. Verwende Dummy TTS.")
+        raise ImportError(f"Unbekannter TTS-Anbieter: {name}")
+    return TTSProvider(name, synthesize, profile, synthesize_bytes, formats)
+
+tts_providers = []
+for provider_name in TTS_PROVIDERS:
+    try:
+        tts_providers.append(load_tts_provider(provider_name))
+    except ImportError as e:
+        logger.error(f"TTS-Anbieter '{provider_name}' konnte nicht geladen werden: {e}")
+
+if tts_providers:
+    tts_router = TTSRouter(tts_providers, hedge=TTS_HEDGE_ENABLED)
+    synthesize_tts = tts_router.synthesize_bytes
+    # Profil des primären Anbieters bestimmt Dateiformat und Streaming-Fähigkeit
+    tts_voice_profile = tts_providers[0].profile
+else:
+    logger.error("Kein TTS-Anbieter verfügbar. Verwende Dummy TTS.")
+    tts_router = None
     synthesize_tts = dummy_synthesize_tts # Immer einen Fallback haben
+    tts_voice_profile = None # Dummy-Audio niemals cachen
+
+# Polly: funktionierende Stimme/Engine für die Region im Hintergrund ermitteln
+get_polly_voice_stats = None
+if any(p.name == "AMAZON_POLLY" for p in tts_providers):
+    from tts_amzpolly import warm_up_voice_selection, get_voice_stats as get_polly_voice_stats
+    threading.Thread(target=warm_up_voice_selection, name='polly-voice-warmup', daemon=True).start()
 
 # === Session-Speicher  und temporäre Verzeichnisse ===
 # Diese Variablen sollten NACH der App-Initialisierung stehen
-user_sessions = {}
 PROJECT_ROOT = os.path.dirname(app.root_path)
+# Begrenzt (Anzahl, Speicher, Leerlauf); inaktive Sessions werden komprimiert ausgelagert
+from session_store import SessionStore, SESSION_SPILL_ENABLED
+user_sessions = SessionStore(os.path.join(PROJECT_ROOT, 'session_spill') if SESSION_SPILL_ENABLED else None)
 TEMP_AUDIO_DIR_ROOT = os.path.join(PROJECT_ROOT, 'temp_audio')
 os.makedirs(TEMP_AUDIO_DIR_ROOT, exist_ok=True) # Sicherstellen, dass das Root-Verzeichnis existiert
 
 # === LLM & Hilfsmodule ===
-from llm_agent_mistral import get_initial_llm_response_for_scenario, query_llm_for_scenario
+from llm_agent_mistral import (get_initial_llm_response_for_scenario, query_initial_llm_response, query_llm_for_scenario,
+                               query_llm_for_scenario_stream, get_canned_reply, summarize_conversation,
+                               response_cache as llm_response_cache)
+local_llm_engine = None
+if LLM_BACKEND == "LOCAL":
+    # Gleiche Schnittstelle; Antwort-Cache und Canned Replies bleiben aus llm_agent_mistral
+    from llm_agent_local import (get_initial_llm_response_for_scenario, query_initial_llm_response,
+                                 query_llm_for_scenario, query_llm_for_scenario_stream, summarize_conversation,
+                                 engine as local_llm_engine)
 from utils import get_user_temp_dir, log_request, add_to_history#, cleanup_temp_dir
-#from vosk_stt import transcribe_audio #momentan nicht verwendet
+from tts_cache import TTSAudioCache, make_cache_key
+import provider_clients
+from resilience import CircuitOpenError, retry_pause, start_retry_budget, breaker_stats
+from deadline import (start_deadline, clear_deadline, plan_llm_stage, llm_allowed, tts_allowed, record_degradation, ladder_stats,
+                      DEGRADE_CANNED_REPLY, DEGRADE_TEXT_ONLY)
+from tts_pipeline import start_sentence_stream, get_sentence_stream, SentenceAccumulator, submit_synthesis
+from audio_store import AudioBlobStore, content_etag
+from context_packer import packer_stats
+from history_summarizer import HistorySummarizer
+from single_flight import get_single_flight, payload_key, single_flight_stats
+from opening_pool import OpeningPool
+from audio_formats import negotiate_audio_formats, choose_audio_format, audio_extension
+from tts_jobs import TTSJobQueue, file_status, job_audio_path, STATUS_READY, STATUS_PENDING
+from audio_janitor import AudioJanitor, enforce_user_limits
+
+# === Zusammenfassen identischer, gleichzeitiger TTS-Aufrufe ===
+tts_flight = get_single_flight('tts')
+
+# === TTS-Jobs im Hintergrund (audio_mode='async') ===
+tts_jobs = TTSJobQueue()
+
+# === Laufende Zusammenfassung langer Gespräche ===
+history_summarizer = HistorySummarizer(summarize_conversation, sessions=user_sessions) if HISTORY_SUMMARY_ENABLED else None
+
+# === Aufräumen von temp_audio im Hintergrund ===
+audio_janitor = AudioJanitor(TEMP_AUDIO_DIR_ROOT)
+
+# === TTS-Cache (gemeinsam für alle Benutzer und Worker) ===
+tts_audio_cache = None
+if TTS_CACHE_ENABLED and tts_voice_profile:
+    tts_audio_cache = TTSAudioCache(
+        os.path.join(PROJECT_ROOT, 'tts_cache'),
+        max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024
+    )
+
+# === Audio-Blob-Speicher: /temp_audio/ wird zuerst hieraus bedient ===
+audio_blob_store = None
+if AUDIO_BLOB_STORE_ENABLED:
+    audio_blob_store = AudioBlobStore(os.path.join(TEMP_AUDIO_DIR_ROOT, 'spill'))
+
+# === Spracherkennung (Vosk): Modell einmal pro Prozess, Recognizer aus einem Pool ===
+import vosk_stt
+stt_available = vosk_stt.preload() if STT_ENABLED else False
+
+# WebSocket für gestreamte Spracherkennung (optional: flask-sock; braucht Gunicorn mit --threads)
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+sock = Sock(app) if Sock and stt_available else None
+# Ohne Audio so lange wird ein STT-Stream geschlossen
+STT_STREAM_IDLE_SECONDS = 10
 
 # === Hilfsfunktionen: ===
 
-def safe_synthesize_tts(text, output_path, user_id, max_retries=2):
-    """TTS mit begrenzten Wiederholungsversuchen"""
+# Endpunkte mit Gesamt-Deadline (REQUEST_DEADLINE_SECONDS); respond_stream setzt sie pro Stufe
+DEADLINE_ENDPOINTS = ('respond', 'start_conversation', 'transcribe')
+
+@app.before_request
+def init_request_budgets():
+    """
+    Jeder eingehende Request bekommt ein eigenes Retry-Budget; eine Deadline nur die Gesprächszüge.
+    Streams, Long-Polls und Dateien laufen ohne - Gunicorn-Threads werden wiederverwendet,
+    daher wird eine Deadline des vorherigen Requests hier ausdrücklich aufgehoben.
+    """
+    start_retry_budget()
+    if request.endpoint in DEADLINE_ENDPOINTS:
+        start_deadline()
+    else:
+        clear_deadline()
+    # Der Aufräum-Thread läuft ab dem ersten Request, egal welche Route Dateien anlegt
+    audio_janitor.start()
+    if opening_pool:
+        opening_pool.start()
+    if local_llm_engine:
+        # Worker-Prozess beim ersten Request (z.B. Seitenaufruf) starten, nicht beim Import -
+        # so lädt er genau einmal pro Gunicorn-Worker und schon vor dem ersten Gespräch
+        local_llm_engine.start()
+
+def request_session(user_id, scenario='libre'):
+    """Session des Benutzers, bis zum Ende der Antwort (auch eines SSE-Streams) vor dem Auslagern geschützt."""
+    session = user_sessions.get_or_create(user_id, scenario, pin=True)
+    g.setdefault('pinned_sessions', []).append((user_id, session))
+    return session
+
+def _release_sessions(pinned):
+    for user_id, session in pinned:
+        user_sessions.release(user_id, session)
+
+@app.after_request
+def release_sessions_on_close(response):
+    pinned = g.pop('pinned_sessions', None)
+    if pinned:
+        # Erst wenn die Antwort vollständig ausgeliefert ist - der SSE-Generator schreibt danach noch in die Historie
+        response.call_on_close(functools.partial(_release_sessions, pinned))
+    return response
+
+@app.teardown_request
+def release_sessions_on_error(exc):
+    # Nur falls after_request nicht mehr lief (unbehandelte Exception)
+    pinned = g.pop('pinned_sessions', None)
+    if pinned:
+        _release_sessions(pinned)
+
+def synthesize_audio_bytes(text, user_id, max_retries=2, cache_only=False, formats=None):
+    """
+    TTS mit Cache, Provider-Routing und begrenzten Wiederholungsversuchen - im Speicher.
+    cache_only=True: nur aus dem Cache bedienen, keinen Provider aufrufen (Deadline knapp).
+    formats: ausgehandelte Ausgabeformate (negotiate_audio_formats); None = Standard des Anbieters.
+
+    Returns:
+        tuple: (bytes, audio_format) oder (None, None), wenn alle Versuche fehlschlagen
+    """
+    if tts_audio_cache:
+        # Cache-Einträge aller Anbieter prüfen, bevorzugt den aktuell schnellsten - jeweils im Format, das er liefern würde
+        key_formats = {}
+        for p in tts_router.ranked():
+            audio_format = choose_audio_format(p.formats, formats)
+            key_formats[make_cache_key(p.name, text, **dict(p.profile, audio_format=audio_format))] = audio_format
+        hit_key, audio_bytes = tts_audio_cache.fetch_first_bytes(list(key_formats))
+        if hit_key:
+            logger.info(f"[{user_id}] TTS aus Cache bedient ({hit_key[:12]})")
+            return audio_bytes, key_formats[hit_key]
+    if cache_only:
+        return None, None
+
     for attempt in range(max_retries):
         try:
-            synthesize_tts(text, output_path)
-            return True
+            # Gleichzeitige identische Anfragen (Wiederholung im Frontend, gleicher Szenario-Start) teilen sich einen Aufruf
+            flight_key = payload_key(text, formats or [])
+            return tts_flight.do(flight_key, _synthesize_and_cache, text, formats)
+        except CircuitOpenError as e:
+            # Anbieter als ausgefallen bekannt - nicht warten, sondern sofort ohne Audio weiter
+            logger.warning(f"[{user_id}] TTS übersprungen: {str(e)}")
+            break
         except Exception as e:
             logger.warning(f"[{user_id}] TTS Versuch {attempt + 1} fehlgeschlagen: {str(e)}")
-            if attempt == max_retries - 1:
-                # Letzter Versuch - erstelle Dummy-Datei und logge Fehler
-                with open(output_path, "wb") as f:
-                    f.write(b"Dummy Audio")
-                logger.error(f"[{user_id}] Alle TTS Versuche fehlgeschlagen für '{text[:50]}...'. Dummy-Datei erstellt.")
-                return False
-            time.sleep(1)  # Kurze Pause zwischen Versuchen
-    return False # Sollte nie erreicht werden, aber zur Sicherheit
-
-
+            # Backoff mit Jitter, solange das Retry-Budget des Requests reicht
+            if attempt == max_retries - 1 or not retry_pause(attempt, f"TTS [{user_id}]"):
+                break
+
+    logger.error(f"[{user_id}] Alle TTS Versuche fehlgeschlagen für '{text[:50]}...'.")
+    return None, None
+
+def _synthesize_and_cache(text, formats):
+    audio_bytes, provider, audio_format = synthesize_tts(text, formats)
+    if tts_audio_cache and isinstance(provider, TTSProvider):
+        cache_key = make_cache_key(provider.name, text, **dict(provider.profile, audio_format=audio_format))
+        tts_audio_cache.store_bytes(cache_key, audio_bytes)
+    return audio_bytes, audio_format
+
+def safe_synthesize_tts(text, output_stem, user_id, max_retries=2, cache_only=False, formats=None):
+    """
+    Wie synthesize_audio_bytes, schreibt das Ergebnis aber nach <output_stem>.<ext>
+    (für Satz-Pipeline und Hintergrund-Jobs). Die Endung folgt dem tatsächlich
+    gelieferten Format - auch nach einem Wechsel auf einen anderen Anbieter.
+
+    Returns:
+        str: Pfad der geschriebenen Datei oder None
+    """
+    audio_bytes, audio_format = synthesize_audio_bytes(text, user_id, max_retries=max_retries,
+                                                       cache_only=cache_only, formats=formats)
+    if audio_bytes is None:
+        return None
+
+    output_path = f"{output_stem}.{audio_extension(audio_format)}"
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path + '.part', "wb") as f:
+        f.write(audio_bytes)
+    os.replace(output_path + '.part', output_path)  # atomar - andere Worker sehen nur fertige Dateien
+    return output_path
+
+def synthesize_stream_sentence(text, output_stem, user_id, formats=None):
+    """Satz-Synthese für /api/respond_stream (im Thread-Pool) - jede mit eigener Deadline als Stufe."""
+    start_deadline()
+    return safe_synthesize_tts(text, output_stem, user_id, formats=formats)
+
+def publish_tts_audio(text, user_id, file_stem, cache_only=False, formats=None):
+    """
+    Synthetisiert text und macht es unter /temp_audio/user_<id>/<file_stem>.<ext> abrufbar -
+    im Blob-Speicher (ohne Datei) oder, falls deaktiviert, als Datei im Benutzerverzeichnis.
+    Die Endung folgt dem tatsächlich gelieferten Format.
+
+    Returns:
+        str: Audio-URL oder None
+    """
+    audio_bytes, audio_format = synthesize_audio_bytes(text, user_id, cache_only=cache_only, formats=formats)
+    if audio_bytes is None:
+        return None
+    return publish_audio_bytes(user_id, file_stem, audio_bytes, audio_format)
+
+def publish_audio_bytes(user_id, file_stem, audio_bytes, audio_format):
+    """Legt fertige Audiodaten unter /temp_audio/user_<id>/<file_stem>.<ext> ab. Returns: Audio-URL"""
+    audio_url_path = f"user_{user_id}/{file_stem}.{audio_extension(audio_format)}"
+    if audio_blob_store:
+        audio_blob_store.put(audio_url_path, audio_bytes)
+    else:
+        get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)  # legt das Verzeichnis an
+        output_path = os.path.join(TEMP_AUDIO_DIR_ROOT, audio_url_path)
+        with open(output_path + '.part', "wb") as f:
+            f.write(audio_bytes)
+        os.replace(output_path + '.part', output_path)
+    return f"/temp_audio/{audio_url_path}"
+
+
+
+# === Eröffnungs-Pool ===
+def _pool_synthesize(text, audio_format):
+    return synthesize_audio_bytes(text, 'opening-pool', formats=[audio_format])
+
+opening_pool = None
+if OPENING_POOL_ENABLED:
+    # Vorab genau die Formate erzeugen, die der primäre Anbieter für die Server-Reihenfolge liefern würde
+    primary_formats = tts_providers[0].formats if tts_providers else ('mp3',)
+    pool_formats = []
+    for f in TTS_OUTPUT_FORMATS + ['mp3']:
+        audio_format = choose_audio_format(primary_formats, [f])
+        if audio_format not in pool_formats:
+            pool_formats.append(audio_format)
+    # Das Nachfüllen startet mit dem ersten Request (init_request_budgets), nicht beim Import
+    opening_pool = OpeningPool(query_initial_llm_response, _pool_synthesize, pool_formats)
+
+def llm_fallback_reply(degradation):
+    """
+    Antwort, wenn der LLM-Aufruf scheitert: reicht die Restzeit nicht mehr für einen
+    weiteren Versuch, die vorbereitete Relance (Degradationsstufe), sonst die Fehlermeldung.
+
+    Returns:
+        tuple: (Antworttext, degradation)
+    """
+    if not llm_allowed():
+        record_degradation(DEGRADE_CANNED_REPLY)
+        return get_canned_reply(), DEGRADE_CANNED_REPLY
+    return "Désolé, je ne peux pas répondre maintenant.", degradation
 
 # === Hauptfunktion: LLM-Antwort + TTS optimized===
-def generate_llm_and_tts_response(user_id, scenario, prompt, is_user_message=True):
-    """Speicher-optimierte Version der Hauptfunktion"""
-    session = user_sessions.setdefault(user_id, {
-        'history': [], 'scenario': 'libre', 'created_at': datetime.now()
-    })
+def generate_llm_and_tts_response(user_id, scenario, prompt, is_user_message=True, audio_mode='file', audio_formats=None):
+    """
+    Speicher-optimierte Version der Hauptfunktion.
+
+    audio_mode='file' synthetisiert den ganzen Text in eine Datei,
+    audio_mode='stream' startet die Satz-Pipeline und liefert eine Stream-URL,
+    audio_mode='async' gibt sofort den Text und eine Job-ID zurück; das Audio entsteht im Hintergrund.
+    audio_formats: mit dem Client ausgehandelte Formate (audio_mode='stream' bleibt MP3, da fortlaufend abgespielt).
+    """
+    session = request_session(user_id)
     
     session['scenario'] = scenario
 
@@ -106,33 +394,66 @@ def generate_llm_and_tts_response(user_id, scenario, prompt, is_user_message=Tru
         add_to_history(session, 'user', prompt)
         log_request(user_id, "User input", prompt)
 
-    try:
-        llm_response = query_llm_for_scenario(prompt, scenario, session['history'], max_tokens=160)
-        log_request(user_id, "LLM response", llm_response)
-        add_to_history(session, 'assistant', llm_response)
-    except Exception as e:
-        logger.error(f"[{user_id}] LLM Fehler: {str(e)[:100]}")
-        llm_response = "Désolé, je ne peux pas répondre maintenant."
+    # Degradationsstufe nach Restzeit: volle Antwort -> kürzere Antwort -> vorbereitete Antwort
+    degradation, max_tokens = plan_llm_stage(160)
+    if degradation == DEGRADE_CANNED_REPLY:
+        llm_response = get_canned_reply()
+        logger.warning(f"[{user_id}] Zeitbudget knapp - vorbereitete Antwort statt LLM")
         add_to_history(session, 'assistant', llm_response)
+    else:
+        try:
+            llm_response = query_llm_for_scenario(prompt, scenario, session['history'], max_tokens=max_tokens,
+                                                  session_id=user_id)
+            log_request(user_id, "LLM response", llm_response)
+            add_to_history(session, 'assistant', llm_response)
+        except Exception as e:
+            logger.error(f"[{user_id}] LLM Fehler: {str(e)[:100]}")
+            llm_response, degradation = llm_fallback_reply(degradation)
+            add_to_history(session, 'assistant', llm_response)
+
+    # Ältere Runden im Hintergrund zusammenfassen - die nächste Runde schickt Zusammenfassung + letzte Nachrichten
+    if history_summarizer:
+        history_summarizer.request(user_id, session)
 
     # TTS nur wenn erfolgreich
-    # KORREKTUR: Entpacke alle Rückgabewerte von get_user_temp_dir
-    user_dir_path, _, session_timestamp = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
+    user_dir_path, _ = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
+
+    # Letzte Stufe: reicht die Zeit nicht mehr für einen Provider, nur Cache oder Text
+    synthesis_allowed = tts_allowed()
+
+    # Streaming nur für MP3 - WAV-Teile lassen sich nicht einfach aneinanderhängen
+    audio_format = (tts_voice_profile or {}).get('audio_format', 'mp3')
+    if audio_mode == 'stream' and audio_format == 'mp3' and synthesis_allowed:
+        # Die Teile werden aneinandergehängt - nur MP3, auch bei einem Wechsel des Anbieters
+        synthesize = functools.partial(safe_synthesize_tts, formats=['mp3'])
+        stream_id = start_sentence_stream(llm_response, synthesize, user_dir_path, user_id)
+        audio_url = f"/api/audio_stream/{stream_id}"
+        log_request(user_id, "TTS stream", {'url': audio_url})
+        return {'response': llm_response, 'audio_url': audio_url, 'degraded': degradation}
+
+    if audio_mode == 'async' and synthesis_allowed:
+        job_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        synthesize = functools.partial(safe_synthesize_tts, formats=audio_formats)
+        tts_jobs.submit(job_id, synthesize, llm_response, os.path.join(user_dir_path, f"llm_{job_id}"), user_id)
+        log_request(user_id, "TTS job", {'job_id': job_id})
+        return {'response': llm_response, 'audio_url': None, 'audio_job_id': job_id, 'degraded': degradation}
 
-    audio_url = None
     timestamp_for_filename = int(time.time())
-    output_filename = f"llm_{timestamp_for_filename}.mp3"
-    output_path = os.path.join(user_dir_path, output_filename)
-    
-    if safe_synthesize_tts(llm_response, output_path, user_id):
-        #  URL-Konstruktion, die user_id beinhaltet
-        audio_url_path = f"user_{user_id}/{output_filename}"
-        audio_url = f"/temp_audio/{audio_url_path}"
+    # Eindeutiger Name - die Datei wird vom Browser als unveränderlich gecacht
+    file_stem = f"llm_{timestamp_for_filename}_{uuid.uuid4().hex[:8]}"
+
+    audio_url = publish_tts_audio(llm_response, user_id, file_stem, cache_only=not synthesis_allowed,
+                                  formats=audio_formats)
+    if audio_url:
         log_request(user_id, "TTS success", {'url': audio_url})
+    elif not synthesis_allowed:
+        degradation = DEGRADE_TEXT_ONLY
+        record_degradation(DEGRADE_TEXT_ONLY)
+        log_request(user_id, "TTS übersprungen (Deadline)", {'response_text': llm_response[:50]})
     else:
         log_request(user_id, "TTS failed", {'response_text': llm_response[:50]})
 
-    return {'response': llm_response, 'audio_url': audio_url}
+    return {'response': llm_response, 'audio_url': audio_url, 'degraded': degradation}
 
 # === API-Routen ===
 
@@ -154,7 +475,7 @@ def start_conversation():
     user_id = current_user_id_for_dir 
 
     # Initialisiere Session
-    session = user_sessions.setdefault(user_id, {'history': [], 'scenario': scenario, 'created_at': datetime.now()})
+    session = request_session(user_id, scenario)
 
     if force_reset:
         session['history'] = []
@@ -164,24 +485,34 @@ def start_conversation():
     try:
         #from llm_agent_mistral import get_initial_llm_response_for_scenario, get_scenario_system_prompt
         
-        logger.info(f"[{user_id}] Anforderung der ersten inhaltlichen LLM-Antwort für Szenario '{scenario}'.")
-        llm_initial_response_data = get_initial_llm_response_for_scenario(scenario, user_id)
-        llm_initial_response_text = llm_initial_response_data.get('response', 'Bonjour !') # Sicherstellen, dass Text vorhanden ist
-        
-        logger.info(f"[{user_id}] Erhaltene erste LLM-Antwort (Anfang): '{llm_initial_response_text[:100]}...'")
-        add_to_history(session, 'assistant', llm_initial_response_text)
-        
-        audio_url = None
         timestamp_for_filename = int(time.time())
-        output_filename = f"llm_initial_{timestamp_for_filename}.mp3"
-        output_path = os.path.join(user_dir_path, output_filename)
-
-        logger.info(f"[{user_id}] Versuche, TTS für initiale Antwort zu generieren.")
-        if safe_synthesize_tts(llm_initial_response_text, output_path, user_id):
-            # KORREKTUR: URL-Konstruktion ohne session_timestamp
-            audio_url_path = f"user_{user_id}/{output_filename}"
-            audio_url = f"/temp_audio/{audio_url_path}"
+        file_stem = f"llm_initial_{timestamp_for_filename}_{uuid.uuid4().hex[:8]}"
+        audio_formats = negotiate_audio_formats(data.get('audio_formats'), TTS_OUTPUT_FORMATS)
+
+        # Vorbereitete Eröffnung aus dem Pool - sonst live über LLM und TTS
+        opening = opening_pool.take(scenario) if opening_pool else None
+        audio_url = None
+        if opening:
+            llm_initial_response_text = opening.text
+            logger.info(f"[{user_id}] Eröffnung für '{scenario}' aus dem Pool.")
+            audio_bytes, audio_format = opening.audio_for(audio_formats)
+            if audio_bytes is not None:
+                audio_url = publish_audio_bytes(user_id, file_stem, audio_bytes, audio_format)
+        else:
+            logger.info(f"[{user_id}] Anforderung der ersten inhaltlichen LLM-Antwort für Szenario '{scenario}'.")
+            llm_initial_response_data = get_initial_llm_response_for_scenario(scenario, user_id)
+            llm_initial_response_text = llm_initial_response_data.get('response', 'Bonjour !') # Sicherstellen, dass Text vorhanden ist
+            logger.info(f"[{user_id}] Erhaltene erste LLM-Antwort (Anfang): '{llm_initial_response_text[:100]}...'")
+
+        add_to_history(session, 'assistant', llm_initial_response_text)
+
+        if audio_url is None:
+            logger.info(f"[{user_id}] Versuche, TTS für initiale Antwort zu generieren.")
+            audio_url = publish_tts_audio(llm_initial_response_text, user_id, file_stem, cache_only=not tts_allowed(),
+                                          formats=audio_formats)
+        if audio_url:
             logger.info(f"[{user_id}] TTS für initiale Antwort erfolgreich: {audio_url}")
+            audio_janitor.request_cleanup(user_dir_path)
         else:
             logger.warning(f"[{user_id}] TTS für initiale Antwort fehlgeschlagen.")
 
@@ -198,54 +529,172 @@ def respond():
     message = data.get('message', '').strip()
     user_id = data.get('userId')
     scenario = data.get('scenario', 'libre')
+    audio_mode = data.get('audio_mode', 'file')  # 'file', 'stream' oder 'async'
+    # Formate, die der Browser abspielen kann (z.B. ['opus', 'mp3']); ohne Angabe MP3
+    audio_formats = negotiate_audio_formats(data.get('audio_formats'), TTS_OUTPUT_FORMATS)
 
     if not message or not user_id:
         return jsonify({'error': 'Message und User ID erforderlich'}), 400
 
-    result = generate_llm_and_tts_response(user_id, scenario, prompt=message, is_user_message=True)
-    if result.get('audio_url'):
-        try:
-            # Nutze app.test_client().post, um den /api/delete-audio Endpunkt zu triggern
-            app.test_client().post('/api/delete-audio', json={'userId': user_id})
-        except Exception as e:
-            logger.warning(f"[{user_id}] Fehler bei Audio-Bereinigung nach Antwort: {e}")
-            
+    result = generate_llm_and_tts_response(user_id, scenario, prompt=message, is_user_message=True,
+                                           audio_mode=audio_mode, audio_formats=audio_formats)
+    if result.get('audio_url') or result.get('audio_job_id'):
+        # Alte Dateien räumt der Janitor im Hintergrund auf - nicht im Request-Pfad
+        user_dir_path, _ = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
+        audio_janitor.request_cleanup(user_dir_path)
+
     return jsonify(result)
 
-@app.route('/api/delete-audio', methods=['POST'])
-def delete_audio():
+def sse_event(event, data):
+    """Formatiert ein Server-Sent-Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/respond_stream', methods=['POST'])
+def respond_stream():
+    """
+    Wie /api/respond, aber als Server-Sent-Events:
+    'token' für jedes LLM-Fragment, 'audio' für jeden fertig synthetisierten Satz
+    (in Reihenfolge), 'done' mit dem vollständigen Text.
+    """
     data = request.get_json()
+    message = data.get('message', '').strip()
     user_id = data.get('userId')
-    if not user_id:
-        return jsonify({'error': 'User ID erforderlich'}), 400
-
-    user_dir_path, _ = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
+    scenario = data.get('scenario', 'libre')
+    # Jeder Satz ist eine eigene Datei - hier gilt das ausgehandelte Format
+    audio_formats = negotiate_audio_formats(data.get('audio_formats'), TTS_OUTPUT_FORMATS)
 
-    deleted = []
-    MAX_LLM_FILES = 2
-    MAX_RECORDING_FILES = 2
+    if not message or not user_id:
+        return jsonify({'error': 'Message und User ID erforderlich'}), 400
 
-    if not os.path.exists(user_dir_path):
-        return jsonify({'deleted': deleted})
+    session = request_session(user_id)
+    session['scenario'] = scenario
+    add_to_history(session, 'user', message)
+    log_request(user_id, "User input (stream)", message)
 
-    all_files = os.listdir(user_dir_path)
+    user_dir_path, _ = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
+    file_prefix = f"llm_part_{int(time.time())}"
+
+    def generate():
+        accumulator = SentenceAccumulator()
+        pending = []  # (index, future) in Satzreihenfolge
+        parts = []
+        sentence_counter = itertools.count()
+
+        def schedule(sentence):
+            index = next(sentence_counter)
+            synthesize = functools.partial(synthesize_stream_sentence, formats=audio_formats)
+            future = submit_synthesis(synthesize, sentence, os.path.join(user_dir_path, f"{file_prefix}_{index}"), user_id)
+            pending.append((index, future))
+
+        def ready_audio_events(wait=False):
+            # Audio-Events strikt in Satzreihenfolge ausgeben
+            while pending and (wait or pending[0][1].done()):
+                index, future = pending.pop(0)
+                try:
+                    output_path = future.result()
+                except Exception as e:
+                    logger.warning(f"[{user_id}] TTS für Satz {index} fehlgeschlagen: {e}")
+                    output_path = None
+                if output_path:
+                    filename = os.path.basename(output_path)
+                    yield sse_event('audio', {'index': index, 'url': f"/temp_audio/user_{user_id}/{filename}"})
+
+        # Stufe LLM-Stream: Deadline erst hier, nicht für die gesamte Lebensdauer des Streams
+        start_deadline()
+        degradation, max_tokens = plan_llm_stage(160)
+        if degradation == DEGRADE_CANNED_REPLY:
+            tokens = iter([get_canned_reply()])
+        else:
+            tokens = query_llm_for_scenario_stream(message, scenario, session['history'], max_tokens=max_tokens,
+                                                   session_id=user_id)
 
-    llm_files = sorted([f for f in all_files if f.startswith("llm")], key=lambda f: os.path.getmtime(os.path.join(user_dir_path, f)))
-    for f in llm_files[:-MAX_LLM_FILES]:
         try:
-            os.remove(os.path.join(user_dir_path, f))
-            deleted.append(f)
+            for token in tokens:
+                parts.append(token)
+                yield sse_event('token', {'text': token})
+                for sentence in accumulator.feed(token):
+                    schedule(sentence)
+                yield from ready_audio_events()
+            llm_response = ''.join(parts).strip()
         except Exception as e:
-            logger.warning(f"Fehler beim Löschen von {f}: {e}")
+            logger.error(f"[{user_id}] LLM Stream Fehler: {str(e)[:100]}")
+            llm_response = ''.join(parts).strip()
+            if not llm_response:
+                llm_response, degradation = llm_fallback_reply(degradation)
+                accumulator = SentenceAccumulator()
+                accumulator.feed(llm_response)
+                yield sse_event('token', {'text': llm_response})
 
-    recording_files = sorted([f for f in all_files if f.startswith("recording")], key=lambda f: os.path.getmtime(os.path.join(user_dir_path, f)))
-    for f in recording_files[:-MAX_RECORDING_FILES]:
-        try:
-            os.remove(os.path.join(user_dir_path, f))
-            deleted.append(f)
-        except Exception as e:
-            logger.warning(f"Fehler beim Löschen von {f}: {e}")
+        for sentence in accumulator.flush():
+            schedule(sentence)
+
+        yield from ready_audio_events(wait=True)
+
+        # Antwort genau einmal in die Historie, zusammen mit 'done' - wie beim Client, der erst dann fertig ist
+        add_to_history(session, 'assistant', llm_response)
+        log_request(user_id, "LLM response (stream)", llm_response)
+        if history_summarizer:
+            history_summarizer.request(user_id, session)
+        yield sse_event('done', {'response': llm_response, 'degraded': degradation})
+
+    audio_janitor.request_cleanup(user_dir_path)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/audio_stream/<stream_id>')
+def audio_stream(stream_id):
+    """Liefert die Satz-Audiodaten fortlaufend, sobald der jeweils nächste Satz synthetisiert ist."""
+    stream = get_sentence_stream(stream_id)
+    if stream is None:
+        abort(404)
+    return Response(
+        stream.iter_chunks(),
+        mimetype='audio/mpeg',
+        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/audio_jobs/<job_id>')
+def audio_job_status(job_id):
+    """
+    Status eines TTS-Jobs (Long-Poll): wartet bis zu ?wait= Sekunden auf das Ergebnis.
+    Antwort: {'status': 'pending'|'ready'|'failed', 'audio_url': ...}
+    """
+    user_id = request.args.get('userId')
+    if not user_id:
+        return jsonify({'error': 'User ID erforderlich'}), 400
+    # Job-IDs sind 'timestamp_hex' - alles andere wäre ein Pfad-Trick
+    if not all(c.isalnum() or c == '_' for c in job_id):
+        abort(404)
+
+    try:
+        wait_seconds = float(request.args.get('wait', 0))
+    except ValueError:
+        wait_seconds = 0
+
+    user_dir_path, _ = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
+    output_stem = os.path.join(user_dir_path, f"llm_{job_id}")
+    status = tts_jobs.wait(job_id, output_stem, wait_seconds)
+
+    audio_url = None
+    if status == STATUS_READY:
+        # Endung je nach geliefertem Format (ausgehandelt oder nach Wechsel des Anbieters)
+        output_path = job_audio_path(output_stem)
+        audio_url = f"/temp_audio/user_{user_id}/{os.path.basename(output_path)}" if output_path else None
+    return jsonify({'status': status, 'audio_url': audio_url, 'job_id': job_id})
+
+@app.route('/api/delete-audio', methods=['POST'])
+def delete_audio():
+    data = request.get_json()
+    user_id = data.get('userId')
+    if not user_id:
+        return jsonify({'error': 'User ID erforderlich'}), 400
+
+    user_dir_path, _ = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
 
+    deleted = enforce_user_limits(user_dir_path)
     return jsonify({'deleted': deleted})
 
 @app.route('/api/transcribe', methods=['POST'])
@@ -260,28 +709,37 @@ def transcribe():
         return jsonify({'error': 'User ID erforderlich'}), 400
 
     audio_file = request.files['audio']
-    user_dir_path, current_user_id = get_user_temp_dir(user_id_from_request, TEMP_AUDIO_DIR_ROOT)
+    user_dir_path, current_user_id = get_user_temp_dir(user_id, TEMP_AUDIO_DIR_ROOT)
 
     timestamp_for_filename = int(time.time())
     ext = os.path.splitext(audio_file.filename)[1] or '.webm'
     filename = f"user_recording_{timestamp_for_filename}{ext}"
     path = os.path.join(user_dir_path, filename)
-    
-    audio_file.save(path)
+
+    # Einmal lesen: gespeichert wird für die Wiedergabe, transkribiert direkt aus dem Speicher
+    audio_bytes = audio_file.read()
+    with open(path, 'wb') as f:
+        f.write(audio_bytes)
     logger.info(f"[{current_user_id}] Aufnahme gespeichert: {filename} im Pfad: {user_dir_path}")
+    audio_janitor.request_cleanup(user_dir_path)
 
     transcription_text = ""
-    try:
-        # --- HIER MÜSSEN SIE IHRE EIGENTLICHE TRANSKRIPTIONSLOGIK EINFÜGEN ---
-        transcription_text = "Platzhalter Transkription: Bitte implementieren Sie Ihre STT-Logik hier." 
-        # ---------------------------------------------------------------------
-        
-        logger.info(f"[{current_user_id}] Transkription erfolgreich (Platzhalter): {transcription_text[:50]}...")
-        log_request(current_user_id, 'Transkription erfolgreich', {'text': transcription_text[:50]})
-
-    except Exception as e:
-        logger.critical(f"[{current_user_id}] KRITISCHER FEHLER bei Transkription: {str(e)}", exc_info=True)
-        transcription_text = "Fehler bei der Transkription." 
+    transcription_ok = False
+    if not stt_available:
+        logger.info(f"[{current_user_id}] Serverseitige Transkription nicht verfügbar - nur gespeichert")
+    else:
+        try:
+            transcription_text = vosk_stt.transcribe_bytes(audio_bytes)
+            transcription_ok = True
+            log_request(current_user_id, 'Transkription erfolgreich', {'text': transcription_text[:50]})
+        except vosk_stt.NoSpeechError as e:
+            # Leere Aufnahme ist ein gültiges Ergebnis: kein Text, aber kein Fehler
+            transcription_ok = True
+            logger.info(f"[{current_user_id}] {e}")
+        except vosk_stt.UnsupportedAudioError as e:
+            logger.warning(f"[{current_user_id}] Aufnahme nicht transkribierbar: {e}")
+        except Exception as e:
+            logger.critical(f"[{current_user_id}] KRITISCHER FEHLER bei Transkription: {str(e)}", exc_info=True)
 
     audio_url_path = f"user_{current_user_id}/{filename}"
 
@@ -289,9 +747,49 @@ def transcribe():
         'message': 'Audio gespeichert und transkribiert.',
         'user_id': current_user_id,
         'audio_path': f"/temp_audio/{audio_url_path}",
-        'transcription': transcription_text
+        'transcription': transcription_text,
+        'transcription_ok': transcription_ok
     })
 
+def stt_stream(ws):
+    """
+    Gestreamte Spracherkennung während der Aufnahme.
+
+    Client -> Server: Binärnachrichten mit PCM 16 bit mono 16 kHz,
+                      zum Schluss {"event": "stop"} als Text.
+    Server -> Client: {"type": "partial", "text": ...} bei jeder Änderung,
+                      {"type": "final", "text": ...} direkt nach dem Stopp.
+    """
+    user_id = request.args.get('userId', 'unbekannt')
+    try:
+        with vosk_stt.streaming_recognition() as recognition:
+            while True:
+                message = ws.receive(timeout=STT_STREAM_IDLE_SECONDS)
+                if message is None:
+                    logger.info(f"[{user_id}] STT-Stream ohne Audio - wird beendet")
+                    break
+                if isinstance(message, (bytes, bytearray)):
+                    partial = recognition.accept(bytes(message))
+                    if partial is not None:
+                        ws.send(json.dumps({'type': 'partial', 'text': partial}))
+                    if not recognition.exceeded():
+                        continue
+                    logger.warning(f"[{user_id}] STT-Stream zu lang - wird abgeschlossen")
+                elif json.loads(message).get('event') != 'stop':
+                    continue
+                text = recognition.finish()
+                ws.send(json.dumps({'type': 'final', 'text': text}))
+                log_request(user_id, 'Transkription (Stream)', {'text': text[:50]})
+                break
+    except TimeoutError as e:
+        ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+    except Exception as e:
+        # Verbindungsabbruch durch den Client ist normal (Seite geschlossen, Aufnahme verworfen)
+        logger.info(f"[{user_id}] STT-Stream beendet: {e}")
+
+if sock:
+    sock.route('/ws/stt')(stt_stream)
+
 @app.route('/api/reset_session', methods=['POST'])
 def reset_session():
     data = request.get_json()
@@ -299,27 +797,89 @@ def reset_session():
     if not user_id:
         return jsonify({'error': 'User ID erforderlich'}), 400
         
-    if user_id in user_sessions:
-        del user_sessions[user_id]
+    if user_sessions.reset(user_id):
         logger.info(f"[{user_id}] Session zurückgesetzt.")
     return jsonify({'status': 'Session reset'})
 
 @app.route('/health')
 def health():
+    session_stats = user_sessions.stats()
     return jsonify({
         'status': 'healthy',
-        'active_sessions': len(user_sessions),
+        'active_sessions': session_stats['entries'],
+        'sessions': session_stats,
         'tts_provider': ACTIVE_TTS_PROVIDER,
-        'memory_usage': f"{len(str(user_sessions))} chars"  # Grobe Schätzung
+        'tts_router': tts_router.stats() if tts_router else None,
+        'circuit_breakers': breaker_stats(),
+        'single_flight': single_flight_stats(),
+        'context_packer': packer_stats(),
+        'llm_cache': llm_response_cache.stats(),
+        'local_llm': local_llm_engine.stats() if local_llm_engine else None,
+        'stt': vosk_stt.stt_stats() if stt_available else None,
+        'history_summarizer': history_summarizer.stats() if history_summarizer else None,
+        'opening_pool': opening_pool.stats() if opening_pool else None,
+        'degradation': ladder_stats(),
+        'tts_cache': tts_audio_cache.stats() if tts_audio_cache else None,
+        'audio_store': audio_blob_store.stats() if audio_blob_store else None,
+        'tts_jobs': tts_jobs.stats(),
+        'audio_janitor': audio_janitor.stats(),
+        'provider_clients': provider_clients.stats(),
+        'polly_voices': get_polly_voice_stats() if get_polly_voice_stats else None,
+        'memory_usage': f"{session_stats['memory_kb']} KB Sessions"  # Grobe Schätzung
     })
 
+# Zeitgestempelte Antworten (llm_<ts>_<id>.*) ändern sich nie - der Browser darf sie ohne Rückfrage wiederverwenden
+IMMUTABLE_AUDIO_MAX_AGE = 365 * 24 * 3600
+
+@functools.lru_cache(maxsize=512)
+def _file_content_etag(path, mtime_ns, size):
+    """Inhalts-Hash einer Audiodatei; mtime/Größe im Schlüssel machen den Cache bei Änderungen ungültig."""
+    with open(path, 'rb') as f:
+        return content_etag(f.read())
+
+def _audio_cache_control(response, filename):
+    if os.path.basename(filename).startswith('llm_'):
+        response.cache_control.private = True
+        response.cache_control.max_age = IMMUTABLE_AUDIO_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # Aufnahmen o.ä.: zwischenspeichern, aber per ETag nachfragen
+        response.cache_control.no_cache = True
+    return response
+
 @app.route('/temp_audio/<path:filename>')
 def serve_temp_audio(filename):
-    full_path = os.path.join(TEMP_AUDIO_DIR_ROOT, filename)
+    """
+    Liefert generiertes Audio mit starkem ETag (304 bei Wiederholung), Range-Requests
+    (206 für Safari-Seeks) und langlebigen Cache-Headern für die unveränderlichen llm_*-Dateien.
+    Dateien gehen per send_file/wsgi.file_wrapper raus (Gunicorn nutzt dafür sendfile).
+    """
+    # Pfad zuerst prüfen - erst danach stat, Hash oder Job-Status (sonst ließe sich per ../ fremdes lesen/erraten)
+    full_path = safe_join(TEMP_AUDIO_DIR_ROOT, filename)
+    if full_path is None or not os.path.realpath(full_path).startswith(os.path.realpath(TEMP_AUDIO_DIR_ROOT) + os.sep):
+        abort(404)
+
+    # Zuerst aus dem Speicher - neue Antworten liegen gar nicht mehr auf der Platte
+    blob = audio_blob_store.get(filename) if audio_blob_store else None
+    if blob is not None:
+        if blob.data is not None:
+            response = Response(blob.data, mimetype=blob.mimetype)
+            response.set_etag(blob.etag)
+            response = response.make_conditional(request, accept_ranges=True, complete_length=blob.size)
+        else:
+            response = send_file(blob.path, mimetype=blob.mimetype, etag=blob.etag, conditional=True)
+        return _audio_cache_control(response, filename)
+
+    if not os.path.exists(full_path) and file_status(os.path.splitext(full_path)[0]) == STATUS_PENDING:
+        # TTS-Job läuft noch - Client soll es gleich nochmal versuchen
+        return Response(status=202, headers={'Retry-After': '1', 'Cache-Control': 'no-store'})
     if not os.path.exists(full_path):
         logger.warning(f"404: Datei nicht gefunden: {full_path}")
         abort(404)
-    return send_from_directory(TEMP_AUDIO_DIR_ROOT, filename)
+    stat = os.stat(full_path)
+    etag = _file_content_etag(full_path, stat.st_mtime_ns, stat.st_size)
+    response = send_file(full_path, etag=etag, conditional=True)
+    return _audio_cache_control(response, filename)
 
 # === KORRIGIERTE ROUTEN FÜR STATISCHE DATEIEN ===
 
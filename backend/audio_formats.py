@@ -0,0 +1,116 @@
+# backend/audio_formats.py
+import io
+import wave
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ausgabeformate: Dateiendung und MIME-Typ für Auslieferung und Blob-Speicher
+AUDIO_FORMATS = {
+    'opus':   {'extension': 'ogg', 'mimetype': 'audio/ogg'},   # Ogg/Opus - am kompaktesten für Sprache
+    'vorbis': {'extension': 'ogg', 'mimetype': 'audio/ogg'},   # Ogg/Vorbis - Polly kann kein Opus
+    'mp3':    {'extension': 'mp3', 'mimetype': 'audio/mpeg'},  # Fallback, spielt überall
+    'wav':    {'extension': 'wav', 'mimetype': 'audio/wav'},   # nur lokales Tacotron ohne Encoder
+}
+DEFAULT_AUDIO_FORMAT = 'mp3'
+
+
+def audio_extension(audio_format):
+    return AUDIO_FORMATS.get(audio_format, AUDIO_FORMATS[DEFAULT_AUDIO_FORMAT])['extension']
+
+
+def negotiate_audio_formats(client_formats, server_preference):
+    """
+    Schnittmenge aus dem, was der Client abspielen kann, und der Server-Reihenfolge.
+    mp3 steht immer am Ende, damit jeder Provider etwas liefern kann.
+
+    Args:
+        client_formats (list): z.B. ['opus', 'mp3'] (vom Frontend per canPlayType ermittelt)
+        server_preference (list): z.B. ['opus', 'vorbis', 'mp3']
+
+    Returns:
+        list: Formate in Wunschreihenfolge
+    """
+    client_formats = {str(f).lower() for f in (client_formats or [])}
+    preferred = [f for f in server_preference if f in client_formats and f in AUDIO_FORMATS]
+    if DEFAULT_AUDIO_FORMAT not in preferred:
+        preferred.append(DEFAULT_AUDIO_FORMAT)
+    return preferred
+
+
+def choose_audio_format(supported, preferences=None):
+    """
+    Erstes gewünschtes Format, das der Provider liefern kann.
+
+    Args:
+        supported (tuple): Formate des Providers, das erste ist sein Standard
+        preferences (list): Ergebnis von negotiate_audio_formats oder None
+    """
+    for audio_format in preferences or ():
+        if audio_format in supported:
+            return audio_format
+    return supported[0]
+
+
+# === Encoder für lokal erzeugte WAV-Daten (Tacotron) ===
+# soundfile/libsndfile ist optional; ab libsndfile 1.0.29 kann es Ogg/Opus, ab 1.1.0 MP3.
+_SOUNDFILE_SUBTYPES = {
+    'opus': ('OGG', 'OPUS'),
+    'vorbis': ('OGG', 'VORBIS'),
+    'mp3': ('MP3', 'MPEG_LAYER_III'),
+}
+
+
+def available_wav_encodings():
+    """Formate, in die sich WAV-Samples lokal umwandeln lassen (wav immer)."""
+    try:
+        import soundfile
+    except ImportError:
+        return ('wav',)
+    available = []
+    for audio_format, (container, subtype) in _SOUNDFILE_SUBTYPES.items():
+        if subtype in soundfile.available_subtypes(container):
+            available.append(audio_format)
+    return tuple(available) + ('wav',)
+
+
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def resample(samples, sample_rate, target_rate):
+    """Lineare Interpolation - für Sprache ausreichend, ohne zusätzliche Abhängigkeit."""
+    import numpy as np
+    duration = len(samples) / sample_rate
+    target_length = int(round(duration * target_rate))
+    source_times = np.arange(len(samples)) / sample_rate
+    target_times = np.arange(target_length) / target_rate
+    return np.interp(target_times, source_times, samples).astype(np.float32)
+
+
+def encode_samples(samples, sample_rate, audio_format):
+    """
+    Kodiert Float-Samples (z.B. Tacotron-Ausgabe) ins gewünschte Format.
+
+    Raises:
+        ValueError: Wenn das Format lokal nicht kodiert werden kann
+    """
+    import numpy as np  # nur für den lokalen Tacotron-Pfad nötig (kommt mit torch)
+    samples = np.asarray(samples, dtype=np.float32)
+    buffer = io.BytesIO()
+    if audio_format == 'wav':
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm.tobytes())
+    elif audio_format in _SOUNDFILE_SUBTYPES:
+        import soundfile
+        container, subtype = _SOUNDFILE_SUBTYPES[audio_format]
+        if audio_format == 'opus' and sample_rate not in OPUS_SAMPLE_RATES:
+            # libsndfile akzeptiert für Opus nur die nativen Raten
+            samples, sample_rate = resample(samples, sample_rate, 24000), 24000
+        soundfile.write(buffer, samples, sample_rate, format=container, subtype=subtype)
+    else:
+        raise ValueError(f"Audioformat '{audio_format}' kann lokal nicht kodiert werden")
+    return buffer.getvalue()
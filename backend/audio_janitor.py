@@ -0,0 +1,202 @@
+# backend/audio_janitor.py
+import os
+import time
+import threading
+import logging
+
+from utils import cleanup_temp_dir
+from tts_pipeline import STREAM_TTL_SECONDS
+from tts_jobs import JOB_TTL_SECONDS, PENDING_SUFFIX, FAILED_SUFFIX, PART_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# Pro Benutzer: so viele der neuesten Dateien bleiben erhalten
+MAX_LLM_FILES = 2
+MAX_RECORDING_FILES = 2
+# Gesamtbudget für temp_audio; darüber werden die ältesten Dateien gelöscht
+TEMP_AUDIO_MAX_MB = int(os.environ.get('TEMP_AUDIO_MAX_MB', 200))
+# user_*-Verzeichnisse ohne Aktivität seit so vielen Sekunden gelten als verwaist
+USER_DIR_MAX_AGE_SECONDS = int(os.environ.get('USER_DIR_MAX_AGE_SECONDS', 3600))
+# Abstand der vollständigen Durchläufe (Disk-Budget, verwaiste Verzeichnisse)
+JANITOR_INTERVAL_SECONDS = int(os.environ.get('JANITOR_INTERVAL_SECONDS', 60))
+
+
+def _is_job_marker(name):
+    return name.endswith((PENDING_SUFFIX, FAILED_SUFFIX))
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None  # inzwischen von einem anderen Worker gelöscht
+
+
+def enforce_user_limits(user_dir_path):
+    """
+    Begrenzt die Dateien eines Benutzers: nur die neuesten MAX_LLM_FILES Antworten
+    und MAX_RECORDING_FILES Aufnahmen bleiben; Satz-Teile und Job-Marker nach Ablauf ihrer TTL.
+
+    Returns:
+        list: Namen der gelöschten Dateien
+    """
+    deleted = []
+    if not os.path.isdir(user_dir_path):
+        return deleted
+
+    mtimes = {}
+    for entry in os.scandir(user_dir_path):
+        if entry.is_file():
+            try:
+                mtimes[entry.name] = entry.stat().st_mtime
+            except OSError:
+                pass
+
+    now = time.time()
+    doomed = []
+
+    # Halb geschriebene Dateien (.part) zählen nicht als Antwort - sonst verdrängt ein laufender Job die fertigen
+    llm_files = sorted((f for f in mtimes if f.startswith("llm") and not f.startswith("llm_part_")
+                        and not _is_job_marker(f) and not f.endswith(PART_SUFFIX)), key=mtimes.get)
+    doomed += llm_files[:-MAX_LLM_FILES]
+
+    recording_files = sorted((f for f in mtimes if f.startswith("recording") or f.startswith("user_recording")),
+                             key=mtimes.get)
+    doomed += recording_files[:-MAX_RECORDING_FILES]
+
+    # Satz-Teile der Streaming-Pipeline erst nach Ablauf der Stream-TTL löschen
+    doomed += [f for f in mtimes if f.startswith("llm_part_") and mtimes[f] < now - STREAM_TTL_SECONDS]
+    # Marker abgeschlossener/verwaister TTS-Jobs nach Ablauf der Job-TTL löschen
+    doomed += [f for f in mtimes if _is_job_marker(f) and mtimes[f] < now - JOB_TTL_SECONDS]
+    # Reste abgebrochener Schreibvorgänge ebenso
+    doomed += [f for f in mtimes if f.endswith(PART_SUFFIX) and mtimes[f] < now - JOB_TTL_SECONDS]
+
+    for f in doomed:
+        try:
+            os.remove(os.path.join(user_dir_path, f))
+            deleted.append(f)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Fehler beim Löschen von {f}: {e}")
+    return deleted
+
+
+class AudioJanitor:
+    """
+    Räumt temp_audio im Hintergrund auf, statt im Request-Pfad.
+
+    start() startet den Daemon-Thread einmal pro Prozess; request_cleanup(user_dir)
+    merkt ein Benutzerverzeichnis nur vor. Der Thread setzt dann die Limits pro
+    Benutzer durch und prüft alle JANITOR_INTERVAL_SECONDS zusätzlich verwaiste Verzeichnisse und das Disk-Budget.
+    """
+
+    def __init__(self, root_dir, max_bytes=TEMP_AUDIO_MAX_MB * 1024 * 1024,
+                 max_dir_age=USER_DIR_MAX_AGE_SECONDS, interval=JANITOR_INTERVAL_SECONDS):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_dir_age = max_dir_age
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._owner_pid = None
+        self._stats = {'user_cleanups': 0, 'sweeps': 0, 'files_deleted': 0, 'bytes_evicted': 0,
+                       'dirs_expired': 0, 'disk_usage_bytes': 0, 'last_sweep_ms': None}
+
+    def start(self):
+        """Startet den Aufräum-Thread, falls er in diesem Prozess noch nicht läuft."""
+        # Pro Prozess starten - ein vor dem Fork (Gunicorn --preload) gestarteter Thread lebt im Kind nicht weiter
+        if self._owner_pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._owner_pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._owner_pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name='audio-janitor', daemon=True)
+            self._thread.start()
+
+    def request_cleanup(self, user_dir_path):
+        """Merkt ein Benutzerverzeichnis zur Bereinigung vor (kehrt sofort zurück)."""
+        self.start()
+        with self._lock:
+            self._pending.add(user_dir_path)
+        self._wakeup.set()
+
+    def _loop(self):
+        next_sweep = time.monotonic()
+        while True:
+            self._wakeup.wait(timeout=max(next_sweep - time.monotonic(), 0))
+            self._wakeup.clear()
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            for user_dir_path in pending:
+                try:
+                    deleted = enforce_user_limits(user_dir_path)
+                    self._count(user_cleanups=1, files_deleted=len(deleted))
+                except Exception as e:
+                    logger.warning(f"Bereinigung von {user_dir_path} fehlgeschlagen: {e}")
+            if time.monotonic() >= next_sweep:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"temp_audio-Durchlauf fehlgeschlagen: {e}")
+                next_sweep = time.monotonic() + self.interval
+
+    def sweep(self):
+        """Vollständiger Durchlauf: verwaiste user_*-Verzeichnisse entfernen, dann Disk-Budget durchsetzen."""
+        start = time.monotonic()
+        now = time.time()
+        files = []  # (mtime, size, path) aller verbleibenden Dateien
+        if not os.path.isdir(self.root_dir):
+            return
+
+        for entry in os.scandir(self.root_dir):
+            if not (entry.is_dir() and entry.name.startswith('user_')):
+                continue
+            dir_files = []
+            for item in os.scandir(entry.path):
+                if item.is_file():
+                    try:
+                        st = item.stat()
+                    except OSError:
+                        continue
+                    dir_files.append((st.st_mtime, st.st_size, item.path))
+            newest = max((m for m, _, _ in dir_files), default=_mtime(entry.path) or now)
+            if now - newest > self.max_dir_age:
+                logger.info(f"Verwaistes Verzeichnis wird entfernt: {entry.name}")
+                cleanup_temp_dir(entry.path)
+                self._count(dirs_expired=1, files_deleted=len(dir_files))
+            else:
+                files.extend(dir_files)
+
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            # Älteste zuerst; laufende Jobs (.pending) nie anfassen
+            for mtime, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if path.endswith(PENDING_SUFFIX):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._count(files_deleted=1, bytes_evicted=size)
+            logger.info(f"temp_audio über Budget - auf {total // 1024} KB reduziert")
+
+        with self._lock:
+            self._stats['sweeps'] += 1
+            self._stats['disk_usage_bytes'] = total
+            self._stats['last_sweep_ms'] = round((time.monotonic() - start) * 1000)
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, max_bytes=self.max_bytes, pending=len(self._pending))
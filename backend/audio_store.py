@@ -0,0 +1,166 @@
+# backend/audio_store.py
+import os
+import time
+import uuid
+import hashlib
+import threading
+import mimetypes
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Speicherbudget für Audio im RAM (pro Worker-Prozess)
+AUDIO_STORE_MAX_MB = int(os.environ.get('AUDIO_STORE_MAX_MB', 32))
+# Audio wird in der Regel einmal abgespielt - danach darf es verfallen
+AUDIO_STORE_TTL_SECONDS = int(os.environ.get('AUDIO_STORE_TTL_SECONDS', 600))
+# Größere Antworten werden auf die Platte ausgelagert statt den RAM zu belegen
+AUDIO_SPILL_THRESHOLD_KB = int(os.environ.get('AUDIO_SPILL_THRESHOLD_KB', 512))
+
+
+def content_etag(data):
+    """Starker ETag aus dem Inhalt - gleiche Audiodaten ergeben denselben ETag."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class AudioBlob:
+    """Ein gespeichertes Audio: entweder im Speicher (data) oder ausgelagert (path)."""
+
+    def __init__(self, mimetype, etag, data=None, path=None, size=0):
+        self.mimetype = mimetype
+        self.etag = etag  # Inhalts-Hash für bedingte Requests
+        self.data = data
+        self.path = path
+        self.size = size
+        self.created_at = time.time()
+
+
+class AudioBlobStore:
+    """
+    Begrenzter Audio-Speicher, adressiert über die Audio-ID (= Pfad unter /temp_audio/).
+
+    Kleine Blobs liegen im RAM, große werden nach spill_dir ausgelagert. Einträge
+    verfallen nach ttl Sekunden; wird das RAM-Budget überschritten, fliegen die
+    am längsten nicht abgerufenen zuerst raus.
+    """
+
+    def __init__(self, spill_dir, max_bytes=AUDIO_STORE_MAX_MB * 1024 * 1024,
+                 ttl=AUDIO_STORE_TTL_SECONDS, spill_threshold=AUDIO_SPILL_THRESHOLD_KB * 1024):
+        self.spill_dir = spill_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_threshold = spill_threshold
+        self._blobs = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+        self.evictions = 0
+        self.expired = 0
+        self._purge_stale_spill_files()
+
+    def _purge_stale_spill_files(self):
+        """Entfernt ausgelagerte Dateien früherer Prozesse, deren TTL abgelaufen ist."""
+        if not os.path.isdir(self.spill_dir):
+            return
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.spill_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def put(self, audio_id, data, mimetype=None):
+        """
+        Legt Audiodaten unter audio_id ab (überschreibt einen vorhandenen Eintrag).
+
+        Args:
+            audio_id (str): z.B. 'user_42/llm_1700000000_ab12cd34.mp3'
+            data (bytes): Audiodaten
+        """
+        mimetype = mimetype or mimetypes.guess_type(audio_id)[0] or 'application/octet-stream'
+        etag = content_etag(data)
+        if len(data) > self.spill_threshold:
+            blob = self._spill(audio_id, data, mimetype, etag)
+        else:
+            blob = AudioBlob(mimetype, etag, data=data, size=len(data))
+
+        with self._lock:
+            self._drop_locked(audio_id)
+            self._blobs[audio_id] = blob
+            if blob.data is not None:
+                self._memory_bytes += blob.size
+            self._evict_locked()
+        return audio_id
+
+    def _spill(self, audio_id, data, mimetype, etag):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        ext = os.path.splitext(audio_id)[1]
+        path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}{ext}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            self.spilled += 1
+        return AudioBlob(mimetype, etag, path=path, size=len(data))
+
+    def get(self, audio_id):
+        """
+        Returns:
+            AudioBlob oder None (unbekannt oder abgelaufen)
+        """
+        with self._lock:
+            blob = self._blobs.get(audio_id)
+            if blob is not None and time.time() - blob.created_at > self.ttl:
+                self._drop_locked(audio_id)
+                self.expired += 1
+                blob = None
+            if blob is None:
+                self.misses += 1
+                return None
+            self._blobs.move_to_end(audio_id)
+            self.hits += 1
+            return blob
+
+    def _drop_locked(self, audio_id):
+        blob = self._blobs.pop(audio_id, None)
+        if blob is None:
+            return
+        if blob.data is not None:
+            self._memory_bytes -= blob.size
+        if blob.path:
+            try:
+                os.remove(blob.path)
+            except OSError:
+                pass
+
+    def _evict_locked(self):
+        now = time.time()
+        # Abgelaufene zuerst (älteste stehen vorne, sofern nicht zwischendurch abgerufen)
+        for audio_id in [k for k, b in self._blobs.items() if now - b.created_at > self.ttl]:
+            self._drop_locked(audio_id)
+            self.expired += 1
+        # Danach nur RAM-Einträge verdrängen - ausgelagerte belegen kein Speicherbudget
+        in_memory = (k for k, b in list(self._blobs.items()) if b.data is not None)
+        while self._memory_bytes > self.max_bytes:
+            audio_id = next(in_memory, None)
+            if audio_id is None:
+                break
+            self._drop_locked(audio_id)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._blobs),
+                'memory_kb': self._memory_bytes // 1024,
+                'max_kb': self.max_bytes // 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'spilled': self.spilled,
+                'evictions': self.evictions,
+                'expired': self.expired,
+            }
@@ -0,0 +1,183 @@
+# backend/batch_transcribe.py
+"""
+Massen-Transkription gespeicherter Aufnahmen (Bewertung offline, Datensätze).
+
+    python backend/batch_transcribe.py                              # alle temp_audio/**/user_recording_*
+    python backend/batch_transcribe.py aufnahmen/ -o ergebnis.jsonl --workers 4
+
+Die Dateien werden auf einen Prozess-Pool verteilt; jeder Worker lädt sein
+eigenes Vosk-Modell. Jedes Ergebnis wird sofort als JSON-Zeile angehängt -
+nach einem Abbruch setzt ein erneuter Aufruf mit derselben Ausgabedatei dort
+fort, wo er aufgehört hat (bereits erfolgreiche Dateien werden übersprungen).
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'temp_audio')
+DEFAULT_PATTERN = 'user_recording_*'
+DEFAULT_OUTPUT = 'transcriptions.jsonl'
+# Fortschritt alle so viele Dateien loggen
+PROGRESS_EVERY = 50
+
+
+def find_recordings(inputs, pattern=DEFAULT_PATTERN):
+    """
+    Sammelt Audiodateien: Dateien direkt, Verzeichnisse rekursiv nach pattern, sonst als Glob.
+
+    Returns:
+        list: absolute Pfade, sortiert und ohne Duplikate
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', pattern), recursive=True)
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = glob.glob(item, recursive=True)
+        paths.update(os.path.abspath(p) for p in matches if os.path.isfile(p))
+    return sorted(paths)
+
+
+def load_done(output_path, retry_failed=True):
+    """
+    Pfade, die in einer vorhandenen Ausgabedatei bereits stehen. Eine beim Abbruch
+    halb geschriebene letzte Zeile wird ignoriert.
+
+    Returns:
+        set: erledigte Pfade (mit retry_failed ohne die fehlgeschlagenen)
+    """
+    done = set()
+    try:
+        with open(output_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if retry_failed and record.get('error'):
+                    continue
+                done.add(record.get('path'))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+# === Worker (eigener Prozess) ===
+
+def _init_worker():
+    """Lädt das Modell einmal pro Worker; ein Recognizer genügt, der Worker arbeitet seriell."""
+    import vosk_stt
+    vosk_stt.recognizer_pool = vosk_stt.RecognizerPool(size=1)
+    vosk_stt.get_model()
+
+
+def _transcribe_file(path):
+    import vosk_stt
+    record = {'path': path, 'text': '', 'audio_seconds': 0.0, 'skipped_seconds': 0.0,
+              'processing_seconds': 0.0, 'no_speech': False, 'error': None}
+    started = time.monotonic()
+    try:
+        with open(path, 'rb') as f:
+            record.update(vosk_stt.transcribe_bytes_detailed(f.read()))
+    except vosk_stt.NoSpeechError as e:
+        record['no_speech'] = True
+        record['audio_seconds'] = record['skipped_seconds'] = e.audio_seconds
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['processing_seconds'] = round(time.monotonic() - started, 3)
+    record['audio_seconds'] = round(record['audio_seconds'], 3)
+    record['skipped_seconds'] = round(record['skipped_seconds'], 3)
+    return record
+
+
+# === Ablauf ===
+
+def batch_transcribe(paths, output_path, workers=None, retry_failed=True, progress=None):
+    """
+    Transkribiert paths parallel und hängt jedes Ergebnis sofort an output_path an.
+
+    Args:
+        paths (list): Audiodateien
+        output_path (str): JSONL-Datei (wird fortgesetzt, nicht überschrieben)
+        workers (int): Anzahl Prozesse (Standard: CPU-Zahl)
+        retry_failed (bool): früher fehlgeschlagene Dateien erneut versuchen
+        progress (callable): optional, wird mit jedem Ergebnis aufgerufen
+
+    Returns:
+        dict: Zusammenfassung inkl. Durchsatz (Audio-Sekunden pro Wand-Sekunde)
+    """
+    done = load_done(output_path, retry_failed)
+    todo = [p for p in paths if p not in done]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    summary = {'files': len(paths), 'skipped_existing': len(paths) - len(todo), 'transcribed': 0,
+               'no_speech': 0, 'failed': 0, 'audio_seconds': 0.0, 'wall_seconds': 0.0,
+               'throughput': None, 'workers': workers}
+    if not todo:
+        return summary
+
+    logger.info(f"Batch: {len(todo)} Dateien, {summary['skipped_existing']} bereits erledigt, {workers} Worker")
+    started = time.monotonic()
+    with open(output_path, 'a', encoding='utf-8') as out:
+        # Nach einem Abbruch fehlt evtl. der Zeilenumbruch der letzten (halben) Zeile
+        if out.tell() > 0:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    out.write('\n')
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_transcribe_file, p) for p in todo]
+            for count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+
+                if record['error']:
+                    summary['failed'] += 1
+                elif record['no_speech']:
+                    summary['no_speech'] += 1
+                else:
+                    summary['transcribed'] += 1
+                summary['audio_seconds'] += record['audio_seconds']
+                if progress:
+                    progress(record)
+                if count % PROGRESS_EVERY == 0:
+                    elapsed = time.monotonic() - started
+                    logger.info(f"Batch: {count}/{len(todo)} - {summary['audio_seconds'] / elapsed:.1f} "
+                                f"Audio-s pro s")
+
+    summary['wall_seconds'] = round(time.monotonic() - started, 3)
+    summary['audio_seconds'] = round(summary['audio_seconds'], 3)
+    if summary['wall_seconds'] > 0:
+        summary['throughput'] = round(summary['audio_seconds'] / summary['wall_seconds'], 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallele Transkription gespeicherter Aufnahmen (Vosk)")
+    parser.add_argument('inputs', nargs='*', default=[DEFAULT_INPUT], help="Dateien, Verzeichnisse oder Globs")
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN, help="Dateimuster in Verzeichnissen")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--workers', type=int, help="Prozesse (Standard: CPU-Zahl)")
+    parser.add_argument('--no-retry-failed', action='store_true', help="früher fehlgeschlagene Dateien nicht wiederholen")
+    args = parser.parse_args()
+
+    paths = find_recordings(args.inputs, args.pattern)
+    if not paths:
+        parser.error(f"Keine Aufnahmen gefunden ({args.pattern} in {', '.join(args.inputs)})")
+    summary = batch_transcribe(paths, args.output, args.workers, not args.no_retry_failed)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# backend/context_packer.py
+import re
+import threading
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Zuschlag pro Nachricht (Rollen- und Steuer-Tokens im Chat-Template)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Die letzten Nachrichten werden immer mitgeschickt, auch über dem Budget
+MIN_RECENT_MESSAGES = 2
+# Glättung für die Kalibrierung an den echten prompt_tokens der API
+CALIBRATION_ALPHA = 0.2
+
+# Wörter, Zahlen und einzelne Satzzeichen - grobe Annäherung an einen BPE/SentencePiece-Tokenizer
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_lock = threading.Lock()
+_calibration = 1.0   # echte Tokens / geschätzte Tokens (gleitender Mittelwert)
+_stats = {'packs': 0, 'packed_tokens_total': 0, 'last_packed_tokens': 0, 'max_packed_tokens': 0,
+          'dropped_messages': 0, 'over_budget': 0, 'calibration_samples': 0}
+
+
+@functools.lru_cache(maxsize=4096)
+def _estimate_raw(text):
+    """Geschätzte Tokenzahl ohne Kalibrierung (pro Text gecacht - Historie wird jede Runde neu gepackt)."""
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        # Lange Wörter zerfallen in mehrere Teilstücke; Französisch ~ 4 Zeichen pro Stück
+        tokens += 1 + (len(piece) - 1) // 4 if len(piece) > 4 else 1
+    return tokens
+
+
+def count_tokens(text):
+    """Kalibrierte Tokenschätzung für einen Text."""
+    return int(round(_estimate_raw(text or '') * _calibration))
+
+
+def message_tokens(message):
+    return count_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+
+def calibrate(messages, prompt_tokens):
+    """
+    Gleicht die Schätzung an die von der API gemeldeten prompt_tokens an.
+
+    Args:
+        messages (list): Die gesendeten Nachrichten
+        prompt_tokens (int): usage.prompt_tokens aus der Antwort
+    """
+    global _calibration
+    estimated = sum(_estimate_raw(m['content']) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    if not estimated or not prompt_tokens:
+        return
+    with _lock:
+        ratio = prompt_tokens / estimated
+        _calibration = (1 - CALIBRATION_ALPHA) * _calibration + CALIBRATION_ALPHA * ratio
+        _stats['calibration_samples'] += 1
+
+
+def pack_messages(system_prompt, history, prompt, budget):
+    """
+    Baut die Messages-Liste innerhalb eines Token-Budgets: System-Prompt und
+    aktuelle Nachricht immer, dazu so viele der neuesten Historien-Nachrichten
+    wie hineinpassen (mindestens MIN_RECENT_MESSAGES).
+
+    Args:
+        system_prompt (str): Szenario-System-Prompt
+        history (list): [{'role', 'content'}, ...] älteste zuerst
+        prompt (str): Aktuelle Nachricht des Studenten
+        budget (int): Token-Budget für den gesamten Prompt
+
+    Returns:
+        list: Messages für die Chat-API
+    """
+    system_message = {"role": "system", "content": system_prompt}
+    user_message = {"role": "user", "content": prompt}
+    used = message_tokens(system_message) + message_tokens(user_message)
+
+    kept = []
+    for item in reversed(history or []):
+        cost = message_tokens(item)
+        if used + cost > budget and len(kept) >= MIN_RECENT_MESSAGES:
+            break
+        kept.append({"role": item['role'], "content": item['content']})
+        used += cost
+    kept.reverse()
+
+    with _lock:
+        _stats['packs'] += 1
+        _stats['packed_tokens_total'] += used
+        _stats['last_packed_tokens'] = used
+        _stats['max_packed_tokens'] = max(_stats['max_packed_tokens'], used)
+        _stats['dropped_messages'] += len(history or []) - len(kept)
+        if used > budget:
+            _stats['over_budget'] += 1
+
+    return [system_message] + kept + [user_message]
+
+
+def packer_stats():
+    """Kennzahlen für /health: gepackte Prompt-Größe und Kalibrierung."""
+    with _lock:
+        packs = _stats['packs']
+        return dict(_stats,
+                    avg_packed_tokens=round(_stats['packed_tokens_total'] / packs) if packs else 0,
+                    calibration=round(_calibration, 3),
+                    cached_texts=_estimate_raw.cache_info().currsize)
@@ -0,0 +1,135 @@
+# backend/deadline.py
+import os
+import time
+import threading
+import contextvars
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Gesamtbudget für einen Gesprächszug (/api/respond, /api/start_conversation, /api/transcribe);
+# /api/respond_stream bekommt es pro Stufe (LLM-Stream, jede Satz-Synthese)
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 12))
+# Unterhalb dieser Restzeit wird gar kein Provider-Aufruf mehr gestartet
+MIN_STAGE_SECONDS = 0.3
+
+
+class DeadlineExceeded(Exception):
+    """Das Zeitbudget des Requests reicht für diese Stufe nicht mehr aus."""
+
+
+class Deadline:
+    """Absoluter Zeitpunkt, bis zu dem ein Request fertig sein muss (monotone Uhr)."""
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def wait_seconds(self):
+        """Restzeit als Timeout für wait()/Event.wait(); None, wenn unbegrenzt."""
+        return None if self.budget == float('inf') else self.remaining()
+
+    def elapsed(self):
+        return self.budget - (self.expires_at - time.monotonic())
+
+    def timeout(self, cap, stage='Provider'):
+        """
+        Timeout für eine Stufe: höchstens cap, höchstens die Restzeit.
+
+        Raises:
+            DeadlineExceeded: Wenn weniger als MIN_STAGE_SECONDS übrig sind
+        """
+        remaining = self.remaining()
+        if remaining < MIN_STAGE_SECONDS:
+            record_degradation('deadline_exceeded')
+            raise DeadlineExceeded(f"Kein Zeitbudget mehr für {stage} ({remaining:.2f}s übrig)")
+        return min(cap, remaining)
+
+
+_NO_DEADLINE = Deadline(float('inf'))
+_current_deadline = contextvars.ContextVar('request_deadline', default=_NO_DEADLINE)
+
+
+def start_deadline(seconds=REQUEST_DEADLINE_SECONDS):
+    """Setzt die Deadline für den aktuellen Request (wird über contextvars an Worker-Threads vererbt)."""
+    deadline = Deadline(seconds)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def clear_deadline():
+    """Hebt die Deadline für den aktuellen Request auf (Streams, Long-Polls, statische Dateien)."""
+    _current_deadline.set(_NO_DEADLINE)
+
+
+def current_deadline():
+    """Deadline des aktuellen Requests; außerhalb eines Requests unbegrenzt."""
+    return _current_deadline.get()
+
+
+def stage_timeout(cap, stage='Provider'):
+    """Kurzform: Timeout für eine Stufe aus der aktuellen Deadline."""
+    return current_deadline().timeout(cap, stage)
+
+
+# === Degradationsstufen ===
+# Wie viel Restzeit eine Stufe mindestens braucht, um noch regulär zu laufen
+LLM_FULL_BUDGET_SECONDS = 6.0    # darunter: kürzere Antwort (weniger max_tokens)
+LLM_MIN_BUDGET_SECONDS = 2.5     # darunter: vorbereitete Antwort statt LLM
+TTS_MIN_BUDGET_SECONDS = 1.5     # darunter: nur Text, kein Audio (außer Cache-Treffer)
+SHORT_REPLY_MAX_TOKENS = 60
+
+DEGRADE_NONE = None
+DEGRADE_SHORT_REPLY = 'short_reply'
+DEGRADE_CANNED_REPLY = 'canned_reply'
+DEGRADE_TEXT_ONLY = 'text_only'
+
+_ladder_stats = {DEGRADE_SHORT_REPLY: 0, DEGRADE_CANNED_REPLY: 0, DEGRADE_TEXT_ONLY: 0, 'deadline_exceeded': 0}
+_ladder_lock = threading.Lock()
+
+
+def llm_budget_seconds():
+    """Zeit, die dem LLM bleibt: Restzeit abzüglich der Reserve für die TTS-Stufe danach."""
+    return current_deadline().remaining() - TTS_MIN_BUDGET_SECONDS
+
+
+def plan_llm_stage(default_max_tokens):
+    """
+    Wählt die LLM-Stufe anhand der Zeit, die dem LLM noch bleibt. Wird vor dem
+    ersten Aufruf und erneut vor jeder Wiederholung aufgerufen - nach einem
+    langsamen Fehlversuch greifen so die unteren Stufen.
+
+    Returns:
+        tuple: (degradation, max_tokens) - degradation ist None, 'short_reply' oder 'canned_reply'
+    """
+    remaining = llm_budget_seconds()
+    if remaining >= LLM_FULL_BUDGET_SECONDS:
+        return DEGRADE_NONE, default_max_tokens
+    if remaining >= LLM_MIN_BUDGET_SECONDS:
+        record_degradation(DEGRADE_SHORT_REPLY)
+        return DEGRADE_SHORT_REPLY, min(default_max_tokens, SHORT_REPLY_MAX_TOKENS)
+    record_degradation(DEGRADE_CANNED_REPLY)
+    return DEGRADE_CANNED_REPLY, 0
+
+
+def llm_allowed():
+    """False, wenn für einen (weiteren) LLM-Aufruf keine Zeit mehr bleibt - dann die vorbereitete Antwort."""
+    return llm_budget_seconds() >= LLM_MIN_BUDGET_SECONDS
+
+
+def tts_allowed():
+    """False, wenn für eine Provider-Synthese keine Zeit mehr bleibt (nur noch Text/Cache)."""
+    return current_deadline().remaining() >= TTS_MIN_BUDGET_SECONDS
+
+
+def record_degradation(step):
+    with _ladder_lock:
+        _ladder_stats[step] = _ladder_stats.get(step, 0) + 1
+
+
+def ladder_stats():
+    with _ladder_lock:
+        return dict(_ladder_stats, budget_seconds=REQUEST_DEADLINE_SECONDS)
@@ -0,0 +1,112 @@
+# backend/history_summarizer.py
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import start_deadline
+from resilience import start_retry_budget
+from utils import HISTORY_LOCK
+
+logger = logging.getLogger(__name__)
+
+# Ab dieser Anzahl Dialog-Nachrichten werden die älteren zusammengefasst
+SUMMARY_TRIGGER_MESSAGES = int(os.environ.get('SUMMARY_TRIGGER_MESSAGES', 12))
+# So viele der neuesten Nachrichten bleiben wörtlich in der Historie
+SUMMARY_KEEP_RECENT = int(os.environ.get('SUMMARY_KEEP_RECENT', 6))
+# Zeitbudget für einen Zusammenfassungs-Aufruf im Hintergrund
+SUMMARY_SECONDS = 30
+
+
+def is_summary(item):
+    """Die laufende Zusammenfassung steht als System-Nachricht am Anfang der Historie."""
+    return item.get('role') == 'system'
+
+
+class HistorySummarizer:
+    """
+    Fasst ältere Gesprächsrunden einer Session im Hintergrund zu einer laufenden
+    Zusammenfassung zusammen, damit die Prompt-Größe pro Runde nicht mit der
+    Sitzungsdauer wächst.
+
+    Die Zusammenfassung ersetzt die gefalteten Nachrichten als System-Nachricht
+    am Anfang von session['history'] (add_to_history behält diese bei). Hat sich
+    die Historie während des LLM-Aufrufs verändert (Neustart, Kürzung), wird das
+    Ergebnis verworfen.
+    """
+
+    def __init__(self, summarize, trigger=SUMMARY_TRIGGER_MESSAGES, keep_recent=SUMMARY_KEEP_RECENT, sessions=None):
+        """
+        Args:
+            summarize (callable): (previous_summary, messages) -> str, wirft bei Fehlern
+            sessions (SessionStore): Session während der Zusammenfassung vor dem Auslagern schützen
+        """
+        self.summarize = summarize
+        self.sessions = sessions
+        self.trigger = trigger
+        self.keep_recent = keep_recent
+        # Ein Worker reicht: Zusammenfassungen sind selten und nicht zeitkritisch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='history-summary')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stats = {'scheduled': 0, 'summaries': 0, 'folded_messages': 0, 'failed': 0, 'stale': 0}
+
+    def request(self, user_id, session):
+        """Plant eine Zusammenfassung ein, wenn die Historie lang genug ist (nicht blockierend)."""
+        history = session.get('history') or []
+        dialog = history[1:] if history and is_summary(history[0]) else history
+        if len(dialog) <= self.trigger:
+            return False
+        with self._lock:
+            if user_id in self._in_flight:
+                return False
+            self._in_flight.add(user_id)
+            self._stats['scheduled'] += 1
+        pinned = self.sessions.pin(user_id, session) if self.sessions else False
+        self._executor.submit(self._run, user_id, session, pinned)
+        return True
+
+    def _run(self, user_id, session, pinned=False):
+        start_deadline(SUMMARY_SECONDS)
+        start_retry_budget()
+        try:
+            with HISTORY_LOCK:
+                history = list(session.get('history') or [])
+            previous = history[0]['content'] if history and is_summary(history[0]) else None
+            dialog = history[1:] if previous is not None else history
+            folded = dialog[:-self.keep_recent]
+            if not folded:
+                return
+
+            summary = (self.summarize(previous, folded) or '').strip()
+            if not summary:
+                raise ValueError("leere Zusammenfassung")
+
+            with HISTORY_LOCK:
+                current = session.get('history') or []
+                # Identitätsvergleich: die gefalteten Nachrichten müssen noch in der Historie stehen
+                last = folded[-1]
+                position = next((i for i, item in enumerate(current) if item is last), None)
+                if position is None:
+                    with self._lock:
+                        self._stats['stale'] += 1
+                    return
+                session['history'] = [{"role": "system", "content": summary}] + current[position + 1:]
+
+            with self._lock:
+                self._stats['summaries'] += 1
+                self._stats['folded_messages'] += len(folded)
+            logger.info(f"[{user_id}] {len(folded)} Nachrichten zusammengefasst ({len(summary)} Zeichen)")
+        except Exception as e:
+            with self._lock:
+                self._stats['failed'] += 1
+            logger.warning(f"[{user_id}] Zusammenfassung der Historie fehlgeschlagen: {e}")
+        finally:
+            if pinned:
+                self.sessions.release(user_id, session)
+            with self._lock:
+                self._in_flight.discard(user_id)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._in_flight))
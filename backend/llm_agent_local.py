@@ -1,16 +1,417 @@
 # backend/llm_agent_local.py Tinyllama
 import os
-from llama_cpp import Llama
+import time
+import queue
+import threading
+import itertools
+import multiprocessing
+import logging
+from collections import OrderedDict
+
+from deadline import stage_timeout, DeadlineExceeded
+from llm_autotune import load_tuning
+import llm_agent_mistral as remote_llm
+from llm_agent_mistral import (build_scenario_messages, build_summary_messages, get_scenario_system_prompt,
+                               SUMMARY_MAX_TOKENS, get_initial_llm_response_for_scenario as _initial_with_fallback)
+
+logger = logging.getLogger(__name__)
 
 # Pfad zum lokal gespeicherten gguf-Modell
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "llm", "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+MODEL_PATH = os.environ.get('LOCAL_LLM_MODEL_PATH') or os.path.join(
+    os.path.dirname(__file__), "models", "llm", "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+
+# Standardwerte ohne Autotuning (llm_autotune.py); gesetzte Umgebungsvariablen haben Vorrang vor beidem
+LOCAL_LLM_N_CTX = 2048
+LOCAL_LLM_THREADS = os.cpu_count() or 4
+LOCAL_LLM_BATCH = 256
+_ENV_OVERRIDES = {'n_ctx': 'LOCAL_LLM_N_CTX', 'n_threads': 'LOCAL_LLM_THREADS',
+                  'n_threads_batch': 'LOCAL_LLM_THREADS_BATCH', 'n_batch': 'LOCAL_LLM_BATCH'}
+# Wartende Anfragen; darüber wird sofort abgelehnt statt endlos zu stauen
+LOCAL_LLM_QUEUE_SIZE = int(os.environ.get('LOCAL_LLM_QUEUE_SIZE', 8))
+# Gespeicherte KV-Zustände (je Session) und ihr Speicherbudget im Worker-Prozess
+LOCAL_LLM_KV_SESSIONS = int(os.environ.get('LOCAL_LLM_KV_SESSIONS', 8))
+LOCAL_LLM_KV_CACHE_MB = int(os.environ.get('LOCAL_LLM_KV_CACHE_MB', 512))
+# Obergrenze pro Anfrage (die Request-Deadline kann sie verkürzen)
+LOCAL_LLM_TIMEOUT_SECONDS = 60
+# Ist das lokale LLM nicht nutzbar (kein llama_cpp/Modell, Worker abgestürzt, Warteschlange voll),
+# antworten Szenario-Anfragen über Mistral; 0 = Fehler an den Aufrufer weitergeben
+LOCAL_LLM_REMOTE_FALLBACK = os.environ.get('LOCAL_LLM_REMOTE_FALLBACK', '1') != '0'
+# KV-Zustand auch nach Anfragen ohne erzeugte Tokens speichern (abgelaufen, leere Antwort) - meist unnötige Kopie
+LOCAL_LLM_SAVE_EMPTY_STATE = os.environ.get('LOCAL_LLM_SAVE_EMPTY_STATE', '0') == '1'
+# Reserve im Kontextfenster neben Prompt und Antwort (Chat-Template, Tokenizer-Abweichung)
+CONTEXT_MARGIN_TOKENS = 64
+
+KV_RESIDENT = 'resident'   # Zustand der Session lag noch im Kontext
+KV_RESTORED = 'restored'   # gespeicherter Zustand wurde geladen
+KV_COLD = 'cold'           # kein Zustand - nur gemeinsamer Präfix (z.B. System-Prompt) wird wiederverwendet
+
+
+def default_settings():
+    """Standardwerte, überschrieben vom gespeicherten Autotuning und dann von Umgebungsvariablen."""
+    settings = {
+        'model_path': MODEL_PATH,
+        'n_ctx': LOCAL_LLM_N_CTX,
+        'n_threads': LOCAL_LLM_THREADS,
+        'n_threads_batch': LOCAL_LLM_THREADS,
+        'n_batch': LOCAL_LLM_BATCH,
+        'kv_sessions': LOCAL_LLM_KV_SESSIONS,
+        'kv_max_bytes': LOCAL_LLM_KV_CACHE_MB * 1024 * 1024,
+        'tuning': 'default',
+        'save_empty_state': LOCAL_LLM_SAVE_EMPTY_STATE,
+    }
+    tuned = load_tuning(MODEL_PATH)
+    if tuned:
+        settings.update({k: tuned[k] for k in _ENV_OVERRIDES if k in tuned})
+        settings['tuning'] = 'autotune'
+    for key, env_name in _ENV_OVERRIDES.items():
+        if os.environ.get(env_name):
+            settings[key] = int(os.environ[env_name])
+            settings['tuning'] = 'env'
+    return settings
+
+
+# === Worker-Prozess ===
+
+class _SessionStates:
+    """LRU der gespeicherten KV-Zustände (llama_cpp.LlamaState) pro Session."""
+
+    def __init__(self, max_sessions, max_bytes):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._states = OrderedDict()  # session_id -> (state, size)
+        self._total_bytes = 0
+
+    def get(self, session_id):
+        entry = self._states.get(session_id)
+        if entry is None:
+            return None
+        self._states.move_to_end(session_id)
+        return entry[0]
+
+    def put(self, session_id, state):
+        size = state.llama_state_size + getattr(state.scores, 'nbytes', 0)
+        self.drop(session_id)
+        self._states[session_id] = (state, size)
+        self._total_bytes += size
+        while len(self._states) > 1 and (len(self._states) > self.max_sessions or self._total_bytes > self.max_bytes):
+            self.drop(next(iter(self._states)))
+
+    def drop(self, session_id):
+        entry = self._states.pop(session_id, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
 
-# Initialisierung (nur einmal laden)
-llm = Llama(model_path=MODEL_PATH, n_ctx=512, n_threads=4)
+    def __len__(self):
+        return len(self._states)
 
-def query_llm_local(prompt):
+
+def _worker_main(requests, responses, settings):
+    """
+    Läuft im eigenen Prozess: lädt das Modell einmal und arbeitet die Anfragen
+    nacheinander ab. Vor jeder Anfrage wird der KV-Zustand der Session geladen,
+    danach wieder gespeichert - System-Prompt und frühere Runden müssen so nicht
+    bei jeder Runde neu ausgewertet werden. llama_cpp verwendet dabei den längsten
+    gemeinsamen Token-Präfix aus dem geladenen Zustand.
+    """
     try:
-        output = llm(prompt, max_tokens=200, stop=["\n"])
-        return output["choices"][0]["text"].strip()
+        from llama_cpp import Llama
+
+        llm = Llama(model_path=settings['model_path'], n_ctx=settings['n_ctx'], n_threads=settings['n_threads'],
+                    n_threads_batch=settings['n_threads_batch'], n_batch=settings['n_batch'], verbose=False)
     except Exception as e:
-        return f"[LLM Fehler: {e}]"
+        # Ohne Paket oder Modell hilft auch ein Neustart nicht
+        responses.put(('unavailable', None, f"{type(e).__name__}: {e}"))
+        return
+    states = _SessionStates(settings['kv_sessions'], settings['kv_max_bytes'])
+    resident = None  # Session, deren Zustand gerade im Kontext liegt
+    responses.put(('ready', None, {'n_ctx': llm.n_ctx()}))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, session_id, messages, params, expires_at, stream = request
+        if time.monotonic() > expires_at:
+            responses.put(('error', request_id, 'expired'))
+            continue
+        try:
+            if session_id is not None and session_id == resident:
+                kv_mode = KV_RESIDENT
+            elif session_id is not None and states.get(session_id) is not None:
+                llm.load_state(states.get(session_id))
+                kv_mode = KV_RESTORED
+            else:
+                kv_mode = KV_COLD
+
+            started = time.monotonic()
+            first_token_at = None
+            parts = []
+            for chunk in llm.create_chat_completion(messages=messages, max_tokens=params['max_tokens'],
+                                                    temperature=params['temperature'], seed=params['seed'],
+                                                    stream=True):
+                delta = chunk['choices'][0].get('delta', {}).get('content')
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                parts.append(delta)
+                if stream:
+                    responses.put(('token', request_id, delta))
+                if time.monotonic() > expires_at:
+                    break  # Aufrufer wartet nicht mehr
+            finished = time.monotonic()
+
+            if session_id is not None and (parts or settings.get('save_empty_state')):
+                states.put(session_id, llm.save_state())
+            resident = session_id
+
+            responses.put(('done', request_id, {
+                'text': ''.join(parts).strip(),
+                'kv': kv_mode,
+                'ttft': (first_token_at or finished) - started,
+                'seconds': finished - started,
+                'tokens': len(parts),
+                'kv_sessions': len(states),
+            }))
+        except Exception as e:
+            # Zustand im Kontext ist unbestimmt - beim nächsten Mal neu laden
+            resident = None
+            if session_id is not None:
+                states.drop(session_id)
+            responses.put(('error', request_id, str(e)))
+
+
+# === Steuerung im Web-Prozess ===
+
+class LocalLLMEngine:
+    """
+    Lokales LLM (llama.cpp) in einem eigenen Worker-Prozess mit Warteschlange.
+
+    Der Web-Prozess bleibt reaktionsfähig, das Modell wird nur einmal geladen und
+    Anfragen laufen strikt nacheinander (llama.cpp nutzt ohnehin alle Threads).
+    Abgelaufene Anfragen verwirft der Worker, ohne sie zu rechnen.
+    """
+
+    def __init__(self, settings=None, queue_size=LOCAL_LLM_QUEUE_SIZE):
+        self.settings = settings or default_settings()
+        self.queue_size = queue_size
+        self.n_ctx = self.settings['n_ctx']
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._owner_pid = None
+        self._unavailable = None  # Grund, falls der Worker das Modell nicht laden konnte
+        self._pending = {}  # request_id -> queue.Queue
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'completed': 0, 'failed': 0, 'expired': 0, 'rejected': 0, 'restarts': 0,
+                       'kv_resident': 0, 'kv_restored': 0, 'kv_cold': 0, 'kv_sessions': 0,
+                       'last_ttft': None, 'avg_ttft': None, 'tokens_per_second': None}
+
+    def start(self):
+        """
+        Startet den Worker-Prozess (pro Web-Prozess; ein abgestürzter Worker wird neu gestartet,
+        einer ohne llama_cpp oder Modell nicht).
+        """
+        if self._unavailable or (self._owner_pid == os.getpid() and self._process and self._process.is_alive()):
+            return
+        with self._lock:
+            if self._unavailable or (self._owner_pid == os.getpid() and self._process and self._process.is_alive()):
+                return
+            if self._owner_pid == os.getpid() and self._process is not None:
+                self._stats['restarts'] += 1
+            # spawn statt fork: der Web-Prozess hat bereits Threads
+            ctx = multiprocessing.get_context('spawn')
+            self._requests = ctx.Queue(maxsize=self.queue_size)
+            self._responses = ctx.Queue()
+            self._process = ctx.Process(target=_worker_main, args=(self._requests, self._responses, self.settings),
+                                        name='local-llm', daemon=True)
+            self._process.start()
+            self._owner_pid = os.getpid()
+            threading.Thread(target=self._dispatch_loop, args=(self._process, self._responses),
+                             name='local-llm-dispatch', daemon=True).start()
+        logger.info(f"Lokales LLM: Worker-Prozess gestartet (PID {self._process.pid}, "
+                    f"n_ctx={self.settings['n_ctx']}, n_threads={self.settings['n_threads']})")
+
+    def _dispatch_loop(self, process, responses):
+        """Verteilt Antworten des Workers an die wartenden Aufrufer."""
+        while True:
+            try:
+                kind, request_id, data = responses.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():
+                    self._fail_pending("Lokaler LLM-Worker beendet")
+                    return
+                continue
+            except (EOFError, OSError):
+                self._fail_pending("Lokaler LLM-Worker nicht erreichbar")
+                return
+            if kind == 'ready':
+                self.n_ctx = data['n_ctx']
+                logger.info("Lokales LLM: Modell geladen")
+                continue
+            if kind == 'unavailable':
+                self._unavailable = data
+                logger.error(f"Lokales LLM nicht verfügbar ({data}) - "
+                             f"{'Antworten über Mistral' if LOCAL_LLM_REMOTE_FALLBACK else 'Anfragen schlagen fehl'}")
+                self._fail_pending(f"nicht verfügbar ({data})")
+                return
+            with self._lock:
+                waiter = self._pending.get(request_id)
+                if kind in ('done', 'error'):
+                    self._pending.pop(request_id, None)
+                    self._record_locked(kind, data)
+            if waiter is not None:
+                waiter.put((kind, data))
+
+    def _record_locked(self, kind, data):
+        if kind == 'error':
+            self._stats['expired' if data == 'expired' else 'failed'] += 1
+            return
+        stats = self._stats
+        stats['completed'] += 1
+        stats['kv_' + data['kv']] += 1
+        stats['last_ttft'] = round(data['ttft'], 3)
+        stats['avg_ttft'] = round(data['ttft'] if stats['avg_ttft'] is None
+                                  else 0.9 * stats['avg_ttft'] + 0.1 * data['ttft'], 3)
+        generation_seconds = data['seconds'] - data['ttft']
+        if data['tokens'] > 1 and generation_seconds > 0:
+            stats['tokens_per_second'] = round((data['tokens'] - 1) / generation_seconds, 1)
+        stats['kv_sessions'] = data['kv_sessions']
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._stats['failed'] += len(pending)
+        for waiter in pending.values():
+            waiter.put(('error', reason))
+
+    def _submit(self, session_id, messages, max_tokens, temperature, seed, stream, timeout):
+        self.start()
+        if self._unavailable:
+            raise ConnectionError(f"Lokales LLM nicht verfügbar ({self._unavailable})")
+        request_id = next(self._ids)
+        waiter = queue.Queue()
+        with self._lock:
+            self._pending[request_id] = waiter
+            self._stats['requests'] += 1
+        request = (request_id, session_id, messages,
+                   {'max_tokens': max_tokens, 'temperature': temperature, 'seed': seed},
+                   time.monotonic() + timeout, stream)
+        try:
+            self._requests.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._stats['rejected'] += 1
+            raise ConnectionError("Lokales LLM ausgelastet (Warteschlange voll).")
+        return request_id, waiter
+
+    def _next(self, request_id, waiter, expires_at):
+        try:
+            return waiter.get(timeout=max(expires_at - time.monotonic(), 0))
+        except queue.Empty:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise DeadlineExceeded("Lokales LLM: Zeitbudget überschritten")
+
+    def complete(self, messages, max_tokens=160, temperature=0.7, seed=42, session_id=None):
+        """
+        Returns:
+            str: Antworttext (wirft bei Fehlern, voller Warteschlange oder Deadline)
+        """
+        timeout = stage_timeout(LOCAL_LLM_TIMEOUT_SECONDS, 'Lokales LLM')
+        expires_at = time.monotonic() + timeout
+        request_id, waiter = self._submit(session_id, messages, max_tokens, temperature, seed, False, timeout)
+        kind, data = self._next(request_id, waiter, expires_at)
+        if kind == 'error':
+            raise ConnectionError(f"Lokales LLM: {data}")
+        return data['text']
+
+    def stream(self, messages, max_tokens=160, temperature=0.7, seed=42, session_id=None):
+        """Wie complete, liefert die Antwort aber fragmentweise als Generator."""
+        timeout = stage_timeout(LOCAL_LLM_TIMEOUT_SECONDS, 'Lokales LLM')
+        expires_at = time.monotonic() + timeout
+        request_id, waiter = self._submit(session_id, messages, max_tokens, temperature, seed, True, timeout)
+        while True:
+            kind, data = self._next(request_id, waiter, expires_at)
+            if kind == 'token':
+                yield data
+            elif kind == 'error':
+                raise ConnectionError(f"Lokales LLM: {data}")
+            else:
+                return
+
+    def context_budget(self, max_tokens):
+        """Token-Budget für den Prompt innerhalb des Kontextfensters."""
+        return self.n_ctx - max_tokens - CONTEXT_MARGIN_TOKENS
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats,
+                        alive=bool(self._process and self._process.is_alive()),
+                        unavailable=self._unavailable,
+                        queued=len(self._pending),
+                        n_ctx=self.n_ctx, n_threads=self.settings['n_threads'],
+                        n_threads_batch=self.settings['n_threads_batch'], n_batch=self.settings['n_batch'],
+                        tuning=self.settings['tuning'])
+
+
+engine = LocalLLMEngine()
+
+
+# === Gleiche Schnittstelle wie llm_agent_mistral ===
+
+def query_llm_local(messages, max_tokens=160, temperature=0.7, random_seed=42, session_id=None):
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return engine.complete(messages, max_tokens, temperature, random_seed, session_id)
+
+
+def query_llm_for_scenario(prompt, scenario="libre", history=None, max_tokens=160, session_id=None):
+    """
+    Wie llm_agent_mistral.query_llm_for_scenario, aber lokal. session_id (z.B. die
+    User-ID) ordnet die Anfrage einem gespeicherten KV-Zustand zu.
+    """
+    messages, config = build_scenario_messages(prompt, scenario, history,
+                                               context_tokens=engine.context_budget(max_tokens))
+    try:
+        return query_llm_local(messages, min(max_tokens, config["max_tokens"]), config["temperature"],
+                               session_id=session_id)
+    except ConnectionError as e:
+        if not LOCAL_LLM_REMOTE_FALLBACK:
+            raise
+        logger.warning(f"{e} - Antwort über Mistral")
+        return remote_llm.query_llm_for_scenario(prompt, scenario, history, max_tokens=max_tokens)
+
+
+def query_llm_for_scenario_stream(prompt, scenario="libre", history=None, max_tokens=160, session_id=None):
+    messages, config = build_scenario_messages(prompt, scenario, history,
+                                               context_tokens=engine.context_budget(max_tokens))
+    started = False
+    try:
+        for token in engine.stream(messages, min(max_tokens, config["max_tokens"]), config["temperature"],
+                                   session_id=session_id):
+            started = True
+            yield token
+    except ConnectionError as e:
+        # Nach dem ersten Token nicht mehr wechseln - der Client hat die Teilantwort schon
+        if started or not LOCAL_LLM_REMOTE_FALLBACK:
+            raise
+        logger.warning(f"{e} - Antwort über Mistral")
+        yield from remote_llm.query_llm_for_scenario_stream(prompt, scenario, history, max_tokens=max_tokens)
+
+
+def query_initial_llm_response(scenario, random_seed=42):
+    system_prompt = get_scenario_system_prompt(scenario)["system_prompt_content"]
+    return query_llm_local([{"role": "system", "content": system_prompt}], max_tokens=150, temperature=0.7,
+                           random_seed=random_seed)
+
+
+def get_initial_llm_response_for_scenario(scenario, user_id=None):
+    return _initial_with_fallback(scenario, user_id, query_initial=query_initial_llm_response)
+
+
+def summarize_conversation(previous_summary, messages):
+    return query_llm_local(build_summary_messages(previous_summary, messages),
+                           max_tokens=SUMMARY_MAX_TOKENS, temperature=0.3)
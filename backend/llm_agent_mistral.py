@@ -4,11 +4,23 @@ import os
 import requests
 import logging
 import json
+import random
+from provider_clients import get_http_session
+from resilience import get_breaker, retry_pause
+from deadline import stage_timeout, plan_llm_stage, DeadlineExceeded, DEGRADE_CANNED_REPLY
+from single_flight import get_single_flight, payload_key
+from context_packer import pack_messages, calibrate
+from llm_cache import LLMResponseCache, response_cache_key
 
 logger = logging.getLogger(__name__)
 
 # LLM URL
 MISTRAL_BASE_URL = "https://api.mistral.ai/v1/chat/completions"
+# Zusätzliche Versuche bei vorübergehenden Fehlern (zählen gegen das Request-Retry-Budget)
+LLM_MAX_RETRIES = 1
+
+# Antworten mit festem Seed sind reproduzierbar - gleiche Anfrage, gleiche Antwort aus dem Cache
+response_cache = LLMResponseCache()
 
 def get_scenario_system_prompt(scenario):
     """
@@ -131,24 +143,33 @@ def get_scenario_system_prompt(scenario):
         "starter_example_text": current_scenario_detail['starter_example']
     }
 
-def get_initial_llm_response_for_scenario(scenario, user_id=None):
+def query_initial_llm_response(scenario, random_seed=42):
+    """
+    Erste LLM-Antwort für ein Szenario ohne Fallback (wirft bei Fehlern).
+    Ein anderer random_seed ergibt eine andere Eröffnung - genutzt vom Eröffnungs-Pool.
+    """
+    system_prompt = get_scenario_system_prompt(scenario)["system_prompt_content"]
+    messages = [
+        {"role": "system", "content": system_prompt}
+    ]
+    # Nur der Standard-Seed wiederholt sich - Pool-Einträge mit Zufalls-Seed nicht cachen
+    return query_llm(messages, max_tokens=150, temperature=0.7, random_seed=random_seed,
+                     cacheable=random_seed == 42)
+
+def get_initial_llm_response_for_scenario(scenario, user_id=None, query_initial=None):
     """
     Generiert die erste LLM-Antwort für ein Szenario, um die Konversation zu starten.
     Nutzt den umfassenden System-Prompt, um die erste Antwort des LLM zu steuern.
+    query_initial ersetzt die Mistral-Abfrage (z.B. durch das lokale LLM), die Fallbacks bleiben gleich.
     """
     logger.info(f"Starte initiale LLM-Antwort für Szenario: {scenario}")
     try:
         # Rufe get_scenario_system_prompt auf, um das Dictionary zu erhalten
         prompt_data = get_scenario_system_prompt(scenario)
-        system_prompt = prompt_data["system_prompt_content"]
         starter_fallback_text = prompt_data["starter_example_text"] # Direkter Zugriff auf den Fallback-Text
         
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        
         # Versuche, die LLM-Antwort zu erhalten
-        response_text = query_llm(messages, max_tokens=150, temperature=0.7)
+        response_text = (query_initial or query_initial_llm_response)(scenario)
         
         if not response_text.strip():
             logger.warning(f"LLM generierte leere Startantwort für {scenario}. Fallback auf statischen Starter.")
@@ -172,7 +193,37 @@ def get_initial_llm_response_for_scenario(scenario, user_id=None):
 
 # Die Funktion query_llm bleibt wie im letzten Schritt mit den erweiterten Loggings.
 # Sie ist die generische Funktion für die LLM-Interaktion.
-def query_llm(messages, max_tokens=160, temperature=0.7):
+def query_llm(messages, max_tokens=160, temperature=0.7, random_seed=42, cacheable=True):
+    """
+    Nicht-streamende Anfrage an Mistral. Gleichzeitige identische Anfragen (gleiche
+    Nachrichten, gleiche Parameter, fester Seed - z.B. der Szenario-Start) teilen sich
+    einen einzigen API-Aufruf; bereits beantwortete kommen aus dem Antwort-Cache.
+
+    cacheable=False umgeht den Antwort-Cache (Szenario-Opt-out, zufälliger Seed).
+    """
+    payload = {
+        "model": "mistral-tiny", # Oder Ihr gewähltes Modell
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "random_seed": random_seed
+    }
+    use_cache = cacheable and response_cache.enabled
+    if use_cache:
+        cached = response_cache.get(response_cache_key(payload))
+        if cached is not None:
+            logger.info("Mistral-Antwort aus dem Antwort-Cache")
+            return cached
+    elif response_cache.enabled:
+        response_cache.record_bypass()
+
+    llm_content = get_single_flight('llm:mistral').do(payload_key(payload), _send_chat_completion, payload)
+    # Nach einem Fehlversuch ggf. gekürzt (_send_chat_completion) - solche Antworten nicht cachen
+    if use_cache and llm_content and payload['max_tokens'] == max_tokens:
+        response_cache.put(response_cache_key(payload), llm_content)
+    return llm_content
+
+def _send_chat_completion(payload):
     mistral_api_key = os.environ.get("MISTRAL_API_KEY")
     mistral_base_url = MISTRAL_BASE_URL
     
@@ -192,22 +243,56 @@ def query_llm(messages, max_tokens=160, temperature=0.7):
         "Authorization": f"Bearer {mistral_api_key}"
     }
 
-    payload = {
-        "model": "mistral-tiny", # Oder Ihr gewähltes Modell
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-        "random_seed": 42
-    }
+    breaker = get_breaker('llm:mistral')
+    attempt = 0
+    while True:
+        # Bekannter Ausfall: sofort scheitern, der Aufrufer nutzt seinen Fallback-Text
+        if not breaker.allow():
+            logger.warning("Mistral Circuit offen - Anfrage wird nicht gesendet.")
+            raise ConnectionError("Mistral API temporarily unavailable (circuit open).")
+        try:
+            logger.info(f"Sending request to Mistral API with payload: {json.dumps(payload)}")
+            # Timeout: höchstens 30 s, höchstens die Restzeit des Requests
+            timeout = stage_timeout(30, 'Mistral')
+            response = get_http_session('mistral').post(f"{mistral_base_url}", headers=headers, json=payload, timeout=timeout)
+            response.raise_for_status()
+        except DeadlineExceeded:
+            # Kein Fehler von Mistral - nur die reservierte Half-Open-Probe freigeben
+            breaker.release_probe()
+            raise
+        except requests.exceptions.RequestException as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            # Nur Timeouts, Verbindungsfehler, 429 und 5xx sind vorübergehend
+            transient = status is None or status == 429 or status >= 500
+            if transient:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if transient and attempt < LLM_MAX_RETRIES and retry_pause(attempt, "Mistral"):
+                attempt += 1
+                # Der Fehlversuch hat Zeit gekostet - Stufe neu planen (kürzer oder gar nicht mehr)
+                degradation, max_tokens = plan_llm_stage(payload['max_tokens'])
+                if degradation == DEGRADE_CANNED_REPLY:
+                    raise DeadlineExceeded("Mistral: Restzeit reicht nach Fehlversuch nicht mehr für eine Antwort")
+                payload['max_tokens'] = max_tokens
+                continue
+            if isinstance(e, requests.exceptions.Timeout):
+                logger.error("Request to Mistral API timed out.")
+                raise ConnectionError("Mistral API request timed out.")
+            logger.error(f"Network or API error communicating with Mistral: {e}")
+            raise ConnectionError(f"Failed to connect to Mistral API: {e}")
+        breaker.record_success()
+        break
 
     try:
-        logger.info(f"Sending request to Mistral API with payload: {json.dumps(payload)}")
-        response = requests.post(f"{mistral_base_url}", headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
         response_json = response.json()
         logger.info(f"Received raw response from Mistral API: {json.dumps(response_json)}")
 
+        # Echte Prompt-Größe nachführen, damit die Token-Schätzung des Packers kalibriert bleibt
+        prompt_tokens = (response_json.get('usage') or {}).get('prompt_tokens')
+        if prompt_tokens:
+            calibrate(payload['messages'], prompt_tokens)
+
         if 'choices' in response_json and len(response_json['choices']) > 0:
             llm_content = response_json['choices'][0]['message']['content'].strip()
             if not llm_content:
@@ -218,12 +303,6 @@ def query_llm(messages, max_tokens=160, temperature=0.7):
             logger.error(f"Unexpected response structure from Mistral API: {response_json}")
             raise ValueError("Unexpected response from LLM provider.")
 
-    except requests.exceptions.Timeout:
-        logger.error("Request to Mistral API timed out.")
-        raise ConnectionError("Mistral API request timed out.")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Network or API error communicating with Mistral: {e}")
-        raise ConnectionError(f"Failed to connect to Mistral API: {e}")
     except json.JSONDecodeError:
         logger.error(f"Failed to decode JSON response from Mistral API. Raw response: {response.text}")
         raise ValueError("Invalid JSON response from LLM provider.")
@@ -231,30 +310,186 @@ def query_llm(messages, max_tokens=160, temperature=0.7):
         logger.critical(f"An unexpected error occurred in query_llm: {e}", exc_info=True)
         raise
 
-# query_llm_for_scenario bleibt ebenfalls bestehen und nutzt query_llm intern.
-# Stellen Sie sicher, dass diese Funktion den System-Prompt korrekt in die Messages-Liste einfügt.
-def query_llm_for_scenario(prompt, scenario="libre", history=None, max_tokens=160):
-    scenario_configs = {
-        "restaurant": {"max_tokens": 120, "temperature": 0.6},
-        "faire_les_courses": {"max_tokens": 120, "temperature": 0.6},
-        "visite_chez_le_médecin": {"max_tokens": 120, "temperature": 0.6},
-        "loisirs": {"max_tokens": 160, "temperature": 0.8},
-        "travail": {"max_tokens": 140, "temperature": 0.5},
-        "voyage": {"max_tokens": 150, "temperature": 0.7},
-        "libre": {"max_tokens": 150, "temperature": 0.7}
+def query_llm_stream(messages, max_tokens=160, temperature=0.7, cacheable=True):
+    """
+    Streaming-Variante von query_llm (stream: true).
+    Liefert die Text-Fragmente (Tokens) als Generator, sobald Mistral sie sendet.
+    Ein Treffer im Antwort-Cache wird als ein einziges Fragment geliefert.
+    """
+    payload = {
+        "model": "mistral-tiny",
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "random_seed": 42,
+        "stream": True
     }
-    
-    config = scenario_configs.get(scenario, scenario_configs["libre"])
+    use_cache = cacheable and response_cache.enabled
+    cache_key = response_cache_key(payload) if use_cache else None
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Mistral-Antwort (Stream) aus dem Antwort-Cache")
+            yield cached
+            return
+    elif response_cache.enabled:
+        response_cache.record_bypass()
+
+    mistral_api_key = os.environ.get("MISTRAL_API_KEY")
+    if not mistral_api_key:
+        logger.error("MISTRAL_API_KEY environment variable not set.")
+        raise ValueError("Mistral API Key is not configured.")
+
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+        "Authorization": f"Bearer {mistral_api_key}"
+    }
+
+    breaker = get_breaker('llm:mistral')
+    if not breaker.allow():
+        logger.warning("Mistral Circuit offen - Streaming-Anfrage wird nicht gesendet.")
+        raise ConnectionError("Mistral API temporarily unavailable (circuit open).")
+
+    try:
+        # timeout=(Verbindung, Lesen zwischen zwei Chunks) statt Gesamtzeit, begrenzt durch die Request-Deadline
+        timeout = (stage_timeout(5, 'Mistral'), stage_timeout(30, 'Mistral'))
+        with get_http_session('mistral').post(MISTRAL_BASE_URL, headers=headers, json=payload, stream=True, timeout=timeout) as response:
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                if response.status_code == 429 or response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            breaker.record_success()
+            parts = []
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    # Nur vollständige Antworten cachen - ein abgebrochener Stream kommt hier nicht an
+                    if use_cache and ''.join(parts).strip():
+                        response_cache.put(cache_key, ''.join(parts).strip())
+                    break
+                chunk = json.loads(data)
+                choices = chunk.get('choices') or []
+                if not choices:
+                    continue
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+    except DeadlineExceeded:
+        breaker.release_probe()
+        raise
+    except requests.exceptions.Timeout:
+        breaker.record_failure()
+        logger.error("Streaming request to Mistral API timed out.")
+        raise ConnectionError("Mistral API request timed out.")
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"API error communicating with Mistral (stream): {e}")
+        raise ConnectionError(f"Failed to connect to Mistral API: {e}")
+    except requests.exceptions.RequestException as e:
+        breaker.record_failure()
+        logger.error(f"Network or API error communicating with Mistral (stream): {e}")
+        raise ConnectionError(f"Failed to connect to Mistral API: {e}")
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to decode streamed JSON chunk from Mistral API: {e}")
+        raise ValueError("Invalid JSON chunk from LLM provider.")
+
+# Vorbereitete Antworten, wenn das Zeitbudget für einen LLM-Aufruf nicht mehr reicht.
+# Feste Texte - das Audio dazu kommt in der Regel direkt aus dem TTS-Cache.
+CANNED_REPLIES = [
+    "Intéressant ! Pouvez-vous m'en dire un peu plus ?",
+    "D'accord. Pouvez-vous reformuler votre idée avec d'autres mots ?",
+    "Je vois. Et qu'est-ce que vous en pensez, vous ?",
+]
+
+def get_canned_reply():
+    """Liefert eine vorbereitete Relance-Antwort (Degradationsstufe ohne LLM)."""
+    return random.choice(CANNED_REPLIES)
+
+# context_tokens: Token-Budget für den gesamten Prompt (System-Prompt + Historie + Nachricht)
+# response_cache: False schaltet den Antwort-Cache für das Szenario ab (Standard: an)
+SCENARIO_CONFIGS = {
+    "restaurant": {"max_tokens": 120, "temperature": 0.6, "context_tokens": 1200},
+    "faire_les_courses": {"max_tokens": 120, "temperature": 0.6, "context_tokens": 1200},
+    "visite_chez_le_médecin": {"max_tokens": 120, "temperature": 0.6, "context_tokens": 1200},
+    "loisirs": {"max_tokens": 160, "temperature": 0.8, "context_tokens": 1500, "response_cache": False},
+    "travail": {"max_tokens": 140, "temperature": 0.5, "context_tokens": 1400},
+    "voyage": {"max_tokens": 150, "temperature": 0.7, "context_tokens": 1400},
+    "libre": {"max_tokens": 150, "temperature": 0.7, "context_tokens": 1600}
+}
+
+def build_scenario_messages(prompt, scenario="libre", history=None, context_tokens=None):
+    """
+    Baut die Messages-Liste (System-Prompt + Historie + aktuelle Nachricht) und
+    liefert sie zusammen mit der Szenario-Konfiguration zurück.
+    Die Historie wird nach Token-Budget des Szenarios gepackt: ältere Nachrichten
+    fallen weg, System-Prompt und die neuesten Nachrichten bleiben immer erhalten.
+    context_tokens kann das Budget weiter verkleinern (z.B. Kontextfenster des lokalen Modells).
+    """
+    config = SCENARIO_CONFIGS.get(scenario, SCENARIO_CONFIGS["libre"])
     logger.info(f"LLM-Konfiguration für Szenario '{scenario}': {config}")
 
     # Hier ist es entscheidend, dass der System-Prompt bei JEDER Abfrage mitgesendet wird.
-    system_prompt = get_scenario_system_prompt(scenario)
-    messages = [{"role": "system", "content": system_prompt}]
+    system_prompt = get_scenario_system_prompt(scenario)["system_prompt_content"]
 
-    if history:
-        for item in history:
-            messages.append({"role": item['role'], "content": item['content']})
-    
-    messages.append({"role": "user", "content": prompt})
-    
-    return query_llm(messages, config["max_tokens"], config["temperature"])
\ No newline at end of file
+    history = list(history or [])
+    # Laufende Zusammenfassung älterer Runden (history_summarizer) gehört zum System-Prompt
+    if history and history[0]['role'] == 'system':
+        system_prompt += "\n\nRÉSUMÉ DE LA CONVERSATION JUSQU'ICI:\n" + history[0]['content']
+        history = history[1:]
+    # Die aktuelle Nachricht steht meist schon am Ende der Historie - nicht doppelt senden
+    if history and history[-1]['role'] == 'user' and history[-1]['content'] == prompt:
+        history = history[:-1]
+
+    budget = config["context_tokens"] if context_tokens is None else min(context_tokens, config["context_tokens"])
+    messages = pack_messages(system_prompt, history, prompt, budget)
+    return messages, config
+
+SUMMARY_MAX_TOKENS = 200
+
+def build_summary_messages(previous_summary, messages):
+    """Messages für das Falten älterer Nachrichten (und einer vorhandenen Zusammenfassung)."""
+    transcript = "\n".join(
+        f"{'Étudiant' if item['role'] == 'user' else 'Professeur'}: {item['content']}" for item in messages
+    )
+    instructions = ("Résume cette conversation entre un professeur de français et un étudiant en 5 phrases "
+                    "maximum. Garde les faits importants (noms, choix, préférences, sujets abordés) et les "
+                    "erreurs récurrentes de l'étudiant. Réponds uniquement avec le résumé, en français.")
+    content = f"Résumé précédent:\n{previous_summary}\n\nSuite de la conversation:\n{transcript}" \
+        if previous_summary else f"Conversation:\n{transcript}"
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": content},
+    ]
+
+def summarize_conversation(previous_summary, messages):
+    """
+    Faltet ältere Nachrichten in eine neue, kompakte Zusammenfassung.
+    Wird vom history_summarizer im Hintergrund aufgerufen.
+
+    Returns:
+        str: Die neue Zusammenfassung (wirft bei Fehlern)
+    """
+    return query_llm(build_summary_messages(previous_summary, messages), max_tokens=SUMMARY_MAX_TOKENS,
+                     temperature=0.3, cacheable=False)
+
+# query_llm_for_scenario bleibt ebenfalls bestehen und nutzt query_llm intern.
+def query_llm_for_scenario(prompt, scenario="libre", history=None, max_tokens=160, session_id=None):
+    # session_id wird nur vom lokalen Backend genutzt (KV-Zustand pro Session)
+    messages, config = build_scenario_messages(prompt, scenario, history)
+    # max_tokens des Aufrufers kann das Szenario-Limit nur verkürzen (Degradationsstufe)
+    return query_llm(messages, min(max_tokens, config["max_tokens"]), config["temperature"],
+                     cacheable=config.get("response_cache", True))
+
+def query_llm_for_scenario_stream(prompt, scenario="libre", history=None, max_tokens=160, session_id=None):
+    """Wie query_llm_for_scenario, liefert die Antwort aber tokenweise als Generator."""
+    messages, config = build_scenario_messages(prompt, scenario, history)
+    return query_llm_stream(messages, min(max_tokens, config["max_tokens"]), config["temperature"],
+                            cacheable=config.get("response_cache", True))
\ No newline at end of file
@@ -0,0 +1,256 @@
+# backend/llm_autotune.py
+"""
+Benchmark und Autotuning für das lokale LLM (llama.cpp) auf dem aktuellen Rechner.
+
+    python backend/llm_autotune.py                 # messen, beste Konfiguration speichern
+    python backend/llm_autotune.py --report-only   # nur Szenario-Bericht mit gespeicherter Konfiguration
+
+Gemessen werden Prompt-Auswertung und Generierung (Tokens/s) für verschiedene
+Thread-Zahlen, Batch-Größen und Kontextgrößen. Das Ergebnis landet in
+TUNING_PATH und wird von llm_agent_local beim Start geladen.
+"""
+import os
+import json
+import time
+import platform
+import argparse
+import statistics
+import logging
+
+logger = logging.getLogger(__name__)
+
+TUNING_PATH = os.environ.get('LOCAL_LLM_TUNING_PATH') or os.path.join(
+    os.path.dirname(__file__), "models", "llm", "autotune.json")
+
+# Benchmark-Prompt: typische Länge eines gepackten Szenario-Prompts
+BENCH_PROMPT_TOKENS = 400
+BENCH_GENERATE_TOKENS = 48
+BENCH_REPEATS = 2
+# Eine Konfiguration innerhalb dieser Toleranz zum Besten gilt als gleich schnell (dann die sparsamere)
+TOLERANCE = 0.05
+
+SAMPLE_HISTORY = [
+    {"role": "assistant", "content": "Bonjour ! Bienvenue. Vous avez choisi ce que vous voulez ?"},
+    {"role": "user", "content": "Oui, je voudrais une soupe à l'oignon et ensuite un steak-frites, s'il vous plaît."},
+    {"role": "assistant", "content": "Très bien. Quelle cuisson pour votre steak ? Et qu'est-ce que vous buvez ?"},
+]
+SAMPLE_PROMPT = "À point, s'il vous plaît. Et une carafe d'eau. Est-ce que le dessert est compris dans le menu ?"
+
+
+def host_fingerprint():
+    """Merkmale, an denen eine gespeicherte Konfiguration hängt (anderer Rechner = neu messen)."""
+    return {'cpu_count': os.cpu_count(), 'machine': platform.machine(), 'processor': platform.processor()}
+
+
+def load_tuning(model_path, path=TUNING_PATH):
+    """
+    Lädt die gespeicherte Konfiguration, wenn sie zu Modell und Rechner passt.
+
+    Returns:
+        dict: {'n_threads', 'n_threads_batch', 'n_batch', 'n_ctx'} oder None
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            tuning = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if tuning.get('model') != os.path.basename(model_path) or tuning.get('host') != host_fingerprint():
+        logger.warning(f"Autotuning-Ergebnis {path} gehört zu anderem Modell/Rechner - wird ignoriert")
+        return None
+    return tuning.get('config')
+
+
+def save_tuning(model_path, config, measurements, scenarios, path=TUNING_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tuning = {
+        'model': os.path.basename(model_path),
+        'host': host_fingerprint(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': config,
+        'measurements': measurements,
+        'scenarios': scenarios,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(tuning, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _thread_candidates():
+    cpus = os.cpu_count() or 4
+    candidates = {1, cpus}
+    n = 2
+    while n < cpus:
+        candidates.add(n)
+        n *= 2
+    # Physische Kerne (ohne Hyperthreading) sind für die Generierung oft am schnellsten
+    if cpus >= 4:
+        candidates.add(cpus // 2)
+    return sorted(candidates)
+
+
+def _load(model_path, config):
+    from llama_cpp import Llama
+    return Llama(model_path=model_path, n_ctx=config['n_ctx'], n_threads=config['n_threads'],
+                 n_threads_batch=config['n_threads_batch'], n_batch=config['n_batch'], verbose=False)
+
+
+def _bench_prompt(llm, n_tokens):
+    """Französischer Fließtext in etwa der gewünschten Tokenlänge."""
+    sentence = "Le serveur apporte la carte et explique les plats du jour aux clients qui hésitent encore. "
+    tokens = llm.tokenize(sentence.encode('utf-8'), add_bos=False)
+    repeats = max(1, n_tokens // max(len(tokens), 1))
+    return sentence * repeats
+
+
+def _time_completion(run):
+    """
+    Misst einen gestreamten Aufruf.
+
+    Returns:
+        (time_to_first_token, generated_tokens, generation_seconds)
+    """
+    started = time.perf_counter()
+    first = None
+    generated = 0
+    for chunk in run():
+        if first is None:
+            first = time.perf_counter()
+        generated += 1
+    finished = time.perf_counter()
+    first = first or finished
+    return first - started, generated, finished - first
+
+
+def measure(llm, prompt, generate_tokens=BENCH_GENERATE_TOKENS, repeats=BENCH_REPEATS):
+    """
+    Tokens/s für Prompt-Auswertung und Generierung (Median über repeats, jeweils ohne KV-Wiederverwendung).
+    """
+    prompt_tokens = len(llm.tokenize(prompt.encode('utf-8')))
+    prompt_rates, generation_rates = [], []
+    for _ in range(repeats):
+        llm.reset()
+        ttft, generated, generation_seconds = _time_completion(
+            lambda: llm.create_completion(prompt, max_tokens=generate_tokens, temperature=0.0, stream=True))
+        prompt_rates.append(prompt_tokens / ttft if ttft > 0 else 0.0)
+        if generated > 1 and generation_seconds > 0:
+            generation_rates.append((generated - 1) / generation_seconds)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'prompt_tps': round(statistics.median(prompt_rates), 1),
+        'generation_tps': round(statistics.median(generation_rates), 1) if generation_rates else 0.0,
+    }
+
+
+def _best(results, key, cost):
+    """Schnellste Konfiguration; bei Gleichstand (TOLERANCE) die mit den geringsten Kosten."""
+    top = max(r[key] for r in results)
+    return min((r for r in results if r[key] >= top * (1 - TOLERANCE)), key=cost)
+
+
+def autotune(model_path, ctx_candidates=(1024, 2048, 4096), batch_candidates=(64, 128, 256, 512),
+             thread_candidates=None):
+    """
+    Koordinatensuche: erst Threads (getrennt für Generierung und Prompt-Auswertung),
+    dann Batch-Größe. Als Kontextgröße gilt die kleinste, die für alle Szenario-Budgets
+    reicht; die übrigen werden nur zum Vergleich gemessen.
+
+    Returns:
+        (config, measurements)
+    """
+    from llm_agent_mistral import SCENARIO_CONFIGS
+    from llm_agent_local import CONTEXT_MARGIN_TOKENS
+
+    thread_candidates = thread_candidates or _thread_candidates()
+    measurements = []
+    needed_ctx = max(c['context_tokens'] + c['max_tokens'] for c in SCENARIO_CONFIGS.values()) + CONTEXT_MARGIN_TOKENS
+    base_ctx = min([c for c in ctx_candidates if c >= needed_ctx] or [max(ctx_candidates)])
+    config = {'n_ctx': base_ctx, 'n_threads': thread_candidates[-1], 'n_threads_batch': thread_candidates[-1],
+              'n_batch': 256}
+
+    def run(**overrides):
+        candidate = dict(config, **overrides)
+        llm = _load(model_path, candidate)
+        try:
+            result = dict(candidate, **measure(llm, _bench_prompt(llm, BENCH_PROMPT_TOKENS)))
+        finally:
+            del llm
+        measurements.append(result)
+        logger.info(f"Autotuning: {result}")
+        return result
+
+    # 1) Threads - gleiche Zahl für beide Phasen, getrennt ausgewertet
+    results = [run(n_threads=t, n_threads_batch=t) for t in thread_candidates]
+    config['n_threads'] = _best(results, 'generation_tps', lambda r: r['n_threads'])['n_threads']
+    config['n_threads_batch'] = _best(results, 'prompt_tps', lambda r: r['n_threads_batch'])['n_threads_batch']
+
+    # 2) Batch-Größe (betrifft nur die Prompt-Auswertung)
+    results = [run(n_batch=b) for b in batch_candidates]
+    config['n_batch'] = _best(results, 'prompt_tps', lambda r: r['n_batch'])['n_batch']
+
+    # 3) Kontextgröße - nur zum Vergleich gemessen: ein größeres Fenster kostet Speicher,
+    #    macht aber nicht schneller. Gewählt wird die kleinste, in die jedes Szenario passt.
+    for c in ctx_candidates:
+        if c != base_ctx:
+            run(n_ctx=c)
+    return config, measurements
+
+
+def scenario_report(model_path, config):
+    """
+    Zeit bis zum ersten Token und Generierungsrate für die echten Szenario-Prompts
+    (kalter Start: ohne gespeicherten KV-Zustand, also der ungünstigste Fall pro Runde).
+    """
+    from llm_agent_mistral import SCENARIO_CONFIGS, build_scenario_messages
+
+    llm = _load(model_path, config)
+    report = {}
+    for scenario, scenario_config in SCENARIO_CONFIGS.items():
+        messages, _ = build_scenario_messages(SAMPLE_PROMPT, scenario, SAMPLE_HISTORY,
+                                              context_tokens=config['n_ctx'] - scenario_config['max_tokens'])
+        llm.reset()
+        ttft, generated, generation_seconds = _time_completion(
+            lambda: llm.create_chat_completion(messages=messages, max_tokens=scenario_config['max_tokens'],
+                                               temperature=scenario_config['temperature'], seed=42, stream=True))
+        report[scenario] = {
+            'ttft_seconds': round(ttft, 3),
+            'generation_tps': round((generated - 1) / generation_seconds, 1) if generated > 1 and generation_seconds > 0 else 0.0,
+            'total_seconds': round(ttft + generation_seconds, 3),
+        }
+        logger.info(f"Szenario '{scenario}': {report[scenario]}")
+    return report
+
+
+def main():
+    from llm_agent_local import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Autotuning für das lokale LLM (llama.cpp)")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output', default=TUNING_PATH)
+    parser.add_argument('--threads', help="z.B. 2,4,8 (Standard: abhängig von der CPU-Zahl)")
+    parser.add_argument('--batch', default='64,128,256,512')
+    parser.add_argument('--ctx', default='1024,2048,4096')
+    parser.add_argument('--report-only', action='store_true', help="nur Szenario-Bericht mit gespeicherter Konfiguration")
+    args = parser.parse_args()
+
+    def ints(value):
+        return [int(v) for v in value.split(',') if v.strip()]
+
+    if args.report_only:
+        config = load_tuning(args.model, args.output)
+        if config is None:
+            parser.error(f"Keine passende Konfiguration in {args.output} - erst ohne --report-only messen")
+        print(json.dumps(scenario_report(args.model, config), indent=2, ensure_ascii=False))
+        return
+
+    config, measurements = autotune(args.model, ints(args.ctx), ints(args.batch),
+                                    ints(args.threads) if args.threads else None)
+    scenarios = scenario_report(args.model, config)
+    save_tuning(args.model, config, measurements, scenarios, args.output)
+    print(json.dumps({'config': config, 'scenarios': scenarios}, indent=2, ensure_ascii=False))
+    print(f"Gespeichert in {args.output}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    main()
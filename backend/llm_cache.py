@@ -0,0 +1,106 @@
+# backend/llm_cache.py
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from single_flight import payload_key
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', '1') != '0'
+# Obergrenzen pro Worker-Prozess
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1000))
+LLM_CACHE_MAX_KB = int(os.environ.get('LLM_CACHE_MAX_KB', 2048))
+# Nach dieser Zeit wird neu gefragt (z.B. nach Prompt- oder Modell-Updates beim Anbieter)
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', 24 * 3600))
+
+
+def response_cache_key(payload):
+    """
+    Kanonischer Schlüssel einer Chat-Anfrage (Modell, Nachrichten, max_tokens,
+    temperature, random_seed). 'stream' zählt nicht - gestreamte und normale
+    Anfragen teilen sich die Einträge.
+    """
+    return payload_key({k: v for k, v in payload.items() if k != 'stream'})
+
+
+class LLMResponseCache:
+    """
+    LRU-Cache für LLM-Antworten mit festem random_seed.
+
+    Bei gleichem Seed und gleichen Parametern liefert das Modell dieselbe Antwort -
+    typisch für die Begrüßung und kurze Standard-Eingaben ("Bonjour", "Je ne
+    comprends pas") am Gesprächsanfang. Einträge verfallen nach ttl Sekunden.
+    """
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_KB * 1024,
+                 ttl=LLM_CACHE_TTL_SECONDS, enabled=LLM_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (created_at, text, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+        self.bypassed = 0
+
+    def get(self, key):
+        """Returns: gecachte Antwort oder None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._drop_locked(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, text):
+        if not text:
+            return
+        size = len(key) + len(text.encode('utf-8'))
+        with self._lock:
+            self._drop_locked(key)
+            self._entries[key] = (time.time(), text, size)
+            self._total_bytes += size
+            self.stores += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                self._drop_locked(next(iter(self._entries)))
+                self.evictions += 1
+
+    def record_bypass(self):
+        """Zählt Anfragen, die den Cache bewusst umgehen (Szenario-Opt-out, zufälliger Seed)."""
+        with self._lock:
+            self.bypassed += 1
+
+    def _drop_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'size_kb': self._total_bytes // 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'bypassed': self.bypassed,
+            }
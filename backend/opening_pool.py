@@ -0,0 +1,153 @@
+# backend/opening_pool.py
+import os
+import time
+import random
+import threading
+import logging
+from collections import deque
+
+from deadline import start_deadline
+from resilience import start_retry_budget
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ('restaurant', 'faire_les_courses', 'visite_chez_le_médecin', 'loisirs', 'travail', 'voyage', 'libre')
+
+# Vorrat an Eröffnungssätzen pro Szenario
+OPENING_POOL_SIZE = int(os.environ.get('OPENING_POOL_SIZE', 3))
+# Wie oft ein Eröffnungssatz ausgeliefert wird, bevor er durch einen neuen ersetzt wird
+OPENING_MAX_USES = int(os.environ.get('OPENING_MAX_USES', 3))
+# Zeitbudget für das Erzeugen eines Eintrags (LLM + TTS) im Hintergrund
+OPENING_GENERATION_SECONDS = 45
+# Wartezeit nach einem Fehlschlag (verdoppelt sich bis zum Maximum)
+REFILL_BACKOFF_SECONDS = 5
+REFILL_BACKOFF_MAX_SECONDS = 300
+
+
+class OpeningLine:
+    """Ein vorbereiteter Eröffnungssatz mit fertig synthetisiertem Audio je Format."""
+
+    def __init__(self, text):
+        self.text = text
+        self.audio = {}  # audio_format -> bytes
+        self.uses = 0
+        self.created_at = time.time()
+
+    def audio_for(self, formats):
+        """Erstes vorhandenes Audio in Wunschreihenfolge. Returns: (bytes, audio_format) oder (None, None)"""
+        for audio_format in formats or ():
+            if audio_format in self.audio:
+                return self.audio[audio_format], audio_format
+        return None, None
+
+
+class OpeningPool:
+    """
+    Hält pro Szenario einige fertige Eröffnungen (Text + Audio) bereit, damit
+    /api/start_conversation ohne LLM- und TTS-Aufruf antworten kann.
+
+    Ein Hintergrund-Thread füllt nach; jeder Eintrag wird höchstens max_uses-mal
+    ausgeliefert und dabei rotiert, damit nicht alle dieselbe Begrüßung hören.
+    """
+
+    def __init__(self, generate_text, synthesize, audio_formats, scenarios=SCENARIOS,
+                 size=OPENING_POOL_SIZE, max_uses=OPENING_MAX_USES):
+        """
+        Args:
+            generate_text (callable): (scenario, random_seed) -> str, wirft bei Fehlern
+            synthesize (callable): (text, audio_format) -> (bytes, audio_format) oder (None, None)
+            audio_formats (list): Formate, die vorab synthetisiert werden (z.B. ['vorbis', 'mp3'])
+        """
+        self.generate_text = generate_text
+        self.synthesize = synthesize
+        self.audio_formats = list(audio_formats)
+        self.size = size
+        self.max_uses = max_uses
+        self._pools = {scenario: deque() for scenario in scenarios}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._owner_pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'generated': 0, 'failed': 0, 'retired': 0}
+
+    def start(self):
+        """Startet das Nachfüllen (pro Prozess - ein vor dem Fork gestarteter Thread lebt im Kind nicht weiter)."""
+        if self._owner_pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._owner_pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._owner_pid = os.getpid()
+            self._thread = threading.Thread(target=self._refill_loop, name='opening-pool', daemon=True)
+            self._thread.start()
+
+    def take(self, scenario):
+        """
+        Liefert einen vorbereiteten Eröffnungssatz oder None (Szenario leer/unbekannt).
+        """
+        self.start()
+        with self._lock:
+            pool = self._pools.get(scenario)
+            if not pool:
+                self._stats['misses'] += 1
+                self._wakeup.set()
+                return None
+            entry = pool.popleft()
+            entry.uses += 1
+            if entry.uses < self.max_uses:
+                pool.append(entry)  # ans Ende - der nächste Start bekommt einen anderen Satz
+            else:
+                self._stats['retired'] += 1
+                self._wakeup.set()
+            self._stats['hits'] += 1
+            return entry
+
+    def _next_scenario(self):
+        with self._lock:
+            missing = [(len(pool), scenario) for scenario, pool in self._pools.items() if len(pool) < self.size]
+        return min(missing)[1] if missing else None
+
+    def _refill_loop(self):
+        backoff = REFILL_BACKOFF_SECONDS
+        while True:
+            scenario = self._next_scenario()
+            if scenario is None:
+                self._wakeup.wait(timeout=60)
+                self._wakeup.clear()
+                continue
+            try:
+                entry = self._generate(scenario)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failed'] += 1
+                logger.warning(f"Eröffnungssatz für '{scenario}' konnte nicht erzeugt werden: {e} - neuer Versuch in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, REFILL_BACKOFF_MAX_SECONDS)
+                continue
+            backoff = REFILL_BACKOFF_SECONDS
+            with self._lock:
+                self._pools[scenario].append(entry)
+                self._stats['generated'] += 1
+
+    def _generate(self, scenario):
+        # Hintergrund-Arbeit: eigenes Zeit- und Retry-Budget statt des Request-Budgets
+        start_deadline(OPENING_GENERATION_SECONDS)
+        start_retry_budget()
+        # Anderer Seed pro Eintrag, sonst liefert das LLM bei festem Seed immer denselben Satz
+        text = self.generate_text(scenario, random.randint(1, 2 ** 31 - 1))
+        if not text or not text.strip():
+            raise ValueError("leere LLM-Antwort")
+        entry = OpeningLine(text.strip())
+        for audio_format in self.audio_formats:
+            audio_bytes, delivered_format = self.synthesize(entry.text, audio_format)
+            if audio_bytes is not None:
+                entry.audio[delivered_format] = audio_bytes
+        logger.info(f"Eröffnungssatz für '{scenario}' vorbereitet ({', '.join(entry.audio) or 'ohne Audio'})")
+        return entry
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats,
+                        hit_rate=round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+                        filled={scenario: len(pool) for scenario, pool in self._pools.items()})
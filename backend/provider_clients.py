@@ -0,0 +1,152 @@
+# backend/provider_clients.py
+import os
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Größe der Keep-Alive-Pools (pro Worker-Prozess)
+POOL_CONNECTIONS = int(os.environ.get('PROVIDER_POOL_CONNECTIONS', 4))   # Anzahl Hosts
+POOL_MAXSIZE = int(os.environ.get('PROVIDER_POOL_MAXSIZE', 10))          # Verbindungen pro Host
+
+_lock = threading.Lock()
+_clients = {}
+_owner_pid = os.getpid()
+_stats = {'created': {}, 'reused': {}}
+
+
+def _reset_after_fork():
+    """
+    Verwirft alle geerbten Clients im Kindprozess (Gunicorn --preload).
+    Sockets und gRPC-Kanäle dürfen nicht zwischen Prozessen geteilt werden,
+    daher werden sie nicht geschlossen, sondern nur vergessen und neu aufgebaut.
+    """
+    global _lock, _owner_pid
+    _lock = threading.Lock()
+    _clients.clear()
+    _stats['created'].clear()
+    _stats['reused'].clear()
+    _owner_pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(name, factory):
+    """
+    Liefert den prozessweiten Client 'name' und erzeugt ihn beim ersten Zugriff
+    mit factory() (lazy, thread-sicher).
+    """
+    if os.getpid() != _owner_pid:
+        _reset_after_fork()
+
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                logger.info(f"Erzeuge persistenten Provider-Client: {name}")
+                client = factory()
+                _clients[name] = client
+                _stats['created'][name] = _stats['created'].get(name, 0) + 1
+                return client
+    _stats['reused'][name] = _stats['reused'].get(name, 0) + 1
+    return client
+
+
+def get_http_session(name):
+    """requests.Session mit Keep-Alive-Pool für HTTP-Provider (Mistral, Minimax)."""
+    def factory():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    return get_client(f"http:{name}", factory)
+
+
+def get_polly_client():
+    """boto3 Polly-Client; Credentials und Region werden nur einmal aufgelöst."""
+    import boto3
+    from botocore.config import Config
+
+    aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
+    aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+    aws_region = os.getenv("AWS_REGION", "eu-west-1")
+
+    def factory():
+        return boto3.client(
+            'polly',
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            region_name=aws_region,
+            config=Config(max_pool_connections=POOL_MAXSIZE, tcp_keepalive=True)
+        )
+    return get_client(f"polly:{aws_region}", factory)
+
+
+def get_openai_client(api_key):
+    """OpenAI-Client mit eigenem httpx-Keep-Alive-Pool."""
+    from openai import OpenAI
+
+    def factory():
+        try:
+            import httpx
+            from openai import DefaultHttpxClient
+            http_client = DefaultHttpxClient(
+                limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+            )
+        except ImportError:
+            http_client = None  # Standard-Pool des SDK verwenden
+        return OpenAI(api_key=api_key, http_client=http_client)
+    return get_client("openai", factory)
+
+
+def get_google_tts_client():
+    """Google TextToSpeechClient; der gRPC-Kanal bleibt offen."""
+    from google.cloud import texttospeech
+    return get_client("google_tts", texttospeech.TextToSpeechClient)
+
+
+def _urllib3_pool_counts(pool_manager):
+    """Summiert (neue Verbindungen, Requests) über alle Host-Pools eines PoolManagers."""
+    connections = requests_count = 0
+    for pool in list(pool_manager.pools._container.values()):
+        connections += getattr(pool, 'num_connections', 0)
+        requests_count += getattr(pool, 'num_requests', 0)
+    return connections, requests_count
+
+
+def stats():
+    """
+    Kennzahlen für /health: erzeugte/wiederverwendete Clients sowie pro HTTP-Pool,
+    wie viele Requests über bereits offene Verbindungen liefen (= gesparte Handshakes).
+    """
+    pools = {}
+    for name, client in list(_clients.items()):
+        try:
+            if isinstance(client, requests.Session):
+                manager = client.get_adapter('https://').poolmanager
+            elif name.startswith('polly:'):
+                manager = client._endpoint.http_session._manager
+            else:
+                continue
+            connections, requests_count = _urllib3_pool_counts(manager)
+            pools[name] = {
+                'connections_opened': connections,
+                'requests': requests_count,
+                'reused_connections': max(requests_count - connections, 0),
+            }
+        except Exception as e:
+            logger.debug(f"Pool-Statistik für {name} nicht verfügbar: {e}")
+
+    return {
+        'pid': _owner_pid,
+        'clients_created': dict(_stats['created']),
+        'clients_reused': dict(_stats['reused']),
+        'pools': pools,
+    }
@@ -0,0 +1,221 @@
+# backend/resilience.py
+import os
+import time
+import random
+import threading
+import contextvars
+import logging
+
+from deadline import current_deadline, DeadlineExceeded, MIN_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Circuit Breaker: nach so vielen Fehlern in Folge wird der Provider gesperrt ...
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 3))
+# ... und erst nach dieser Zeit mit einer einzelnen Probe-Anfrage (half-open) erneut versucht
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', 30))
+
+# Retry-Budget pro eingehendem Request (über alle LLM- und TTS-Aufrufe hinweg)
+RETRY_BUDGET_MAX_RETRIES = int(os.environ.get('RETRY_BUDGET_MAX_RETRIES', 3))
+RETRY_BUDGET_MAX_SECONDS = float(os.environ.get('RETRY_BUDGET_MAX_SECONDS', 3.0))
+
+# Exponentielles Backoff mit vollem Jitter
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 2.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Der Provider ist als ausgefallen bekannt; der Aufruf wurde gar nicht erst versucht."""
+
+
+class CircuitBreaker:
+    """
+    Klassischer Circuit Breaker (closed -> open -> half-open -> closed).
+
+    closed:    Aufrufe laufen normal, Fehler in Folge werden gezählt.
+    open:      Aufrufe schlagen sofort fehl, bis reset_seconds abgelaufen sind.
+    half-open: genau eine Probe-Anfrage; Erfolg schließt, Fehler öffnet erneut.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Prüft, ob ein Aufruf jetzt erlaubt ist (reserviert ggf. die Half-Open-Probe)."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def is_available(self):
+        """Wie allow(), aber ohne Seiteneffekte - für Ranking und Statusanzeigen."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_seconds
+            return self.state == CLOSED or not self._probe_in_flight
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit '{self.name}' wieder geschlossen")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened_count += 1
+                    logger.warning(f"Circuit '{self.name}' geöffnet nach {self.consecutive_failures} Fehlern")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """
+        Gibt eine reservierte Half-Open-Probe frei, ohne ein Ergebnis zu zählen - für
+        Aufrufe, die vor einer Antwort des Providers abbrechen (z.B. Request-Deadline).
+        Ohne Freigabe bliebe der Breaker für immer half-open mit belegter Probe.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        """Führt func über den Breaker aus."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} ist vorübergehend gesperrt (Circuit offen)")
+        try:
+            result = func(*args, **kwargs)
+        except DeadlineExceeded:
+            self.release_probe()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opened_count': self.opened_count,
+                'rejected': self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Prozessweiter Circuit Breaker pro Provider (z.B. 'tts:AMAZON_POLLY', 'llm:mistral')."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breaker_stats():
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SECONDS, cap=BACKOFF_MAX_SECONDS):
+    """Exponentielles Backoff mit vollem Jitter: zufällig in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Begrenzt Wiederholungen eines eingehenden Requests insgesamt - egal ob LLM,
+    TTS oder Satz-Pipeline. Ist das Budget aufgebraucht, wird nicht mehr
+    wiederholt, sondern direkt auf den Fallback gewechselt.
+    """
+
+    def __init__(self, max_retries=RETRY_BUDGET_MAX_RETRIES, max_seconds=RETRY_BUDGET_MAX_SECONDS):
+        self.max_retries = max_retries
+        self.max_seconds = max_seconds
+        self.retries_used = 0
+        self.seconds_used = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, delay):
+        """Reserviert eine Wiederholung mit der gegebenen Wartezeit; False wenn das Budget erschöpft ist."""
+        with self._lock:
+            if self.retries_used >= self.max_retries or self.seconds_used + delay > self.max_seconds:
+                return False
+            self.retries_used += 1
+            self.seconds_used += delay
+            return True
+
+
+_current_budget = contextvars.ContextVar('retry_budget', default=None)
+
+
+def start_retry_budget():
+    """Legt ein neues Budget für den aktuellen Request (Kontext) an."""
+    budget = RetryBudget()
+    _current_budget.set(budget)
+    return budget
+
+
+def current_retry_budget():
+    """Budget des aktuellen Requests; außerhalb eines Requests ein frisches Standardbudget."""
+    budget = _current_budget.get()
+    if budget is None:
+        budget = start_retry_budget()
+    return budget
+
+
+def retry_pause(attempt, what):
+    """
+    Wartet vor der nächsten Wiederholung (Backoff mit Jitter), sofern das
+    Request-Budget es zulässt.
+
+    Returns:
+        bool: True, wenn wiederholt werden darf
+    """
+    delay = backoff_delay(attempt)
+    # Eine Wiederholung, die nach der Request-Deadline endet, lohnt sich nicht
+    if current_deadline().remaining() < delay + MIN_STAGE_SECONDS:
+        logger.info(f"Deadline zu knapp - keine weitere Wiederholung für {what}")
+        return False
+    if not current_retry_budget().acquire(delay):
+        logger.info(f"Retry-Budget erschöpft - keine weitere Wiederholung für {what}")
+        return False
+    time.sleep(delay)
+    return True
+
+
+def submit_with_context(executor, func, *args, **kwargs):
+    """
+    executor.submit mit Übernahme des aktuellen contextvars-Kontexts, damit
+    Hintergrund-Threads dasselbe Request-Budget sehen.
+    """
+    context = contextvars.copy_context()
+    return executor.submit(context.run, func, *args, **kwargs)
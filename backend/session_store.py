@@ -0,0 +1,324 @@
+# backend/session_store.py
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+import logging
+from datetime import datetime
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Obergrenze für Sessions im RAM (pro Worker-Prozess)
+SESSION_MAX_ENTRIES = int(os.environ.get('SESSION_MAX_ENTRIES', 500))
+# Speicherbudget für alle Sessions im RAM (geschätzt, pro Worker-Prozess)
+SESSION_MAX_MB = int(os.environ.get('SESSION_MAX_MB', 16))
+# So lange ohne Request bleibt eine Session im RAM, danach wird sie ausgelagert bzw. verworfen
+SESSION_IDLE_SECONDS = int(os.environ.get('SESSION_IDLE_SECONDS', 1800))
+# Inaktive Sessions komprimiert auf die Platte auslagern statt sie zu verwerfen
+SESSION_SPILL_ENABLED = os.environ.get('SESSION_SPILL_ENABLED', '1') != '0'
+# Ausgelagerte Sessions verfallen nach dieser Zeit
+SESSION_SPILL_TTL_SECONDS = int(os.environ.get('SESSION_SPILL_TTL_SECONDS', 86400))
+# Inaktive Sessions höchstens so oft suchen (nicht bei jedem Request)
+SWEEP_INTERVAL_SECONDS = 30
+# Abgelaufene ausgelagerte Sessions so oft von der Platte löschen
+SPILL_PURGE_INTERVAL_SECONDS = 3600
+# Grundkosten einer Session (dict, Liste, Zeitstempel) zusätzlich zum Text
+SESSION_OVERHEAD_BYTES = 512
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def estimate_size(session):
+    """Grobe Größe einer Session im RAM: Text der Historie plus Verwaltungsaufwand."""
+    history = session.get('history') or []
+    return SESSION_OVERHEAD_BYTES + sum(MESSAGE_OVERHEAD_BYTES + len(m.get('content') or '') * 2 for m in history)
+
+
+def _serialize(user_id, session):
+    data = dict(session)
+    if isinstance(data.get('created_at'), datetime):
+        data['created_at'] = data['created_at'].isoformat()
+    return zlib.compress(json.dumps({'user_id': user_id, 'session': data}, ensure_ascii=False).encode('utf-8'))
+
+
+def _deserialize(blob):
+    payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    session = payload['session']
+    if session.get('created_at'):
+        session['created_at'] = datetime.fromisoformat(session['created_at'])
+    return payload['user_id'], session
+
+
+class _Entry:
+    __slots__ = ('session', 'size', 'last_active', 'pins')
+
+    def __init__(self, session):
+        self.session = session
+        self.size = estimate_size(session)
+        self.last_active = time.time()
+        self.pins = 0  # laufende Requests/Hintergrundjobs, die das dict noch verändern
+
+
+class SessionStore:
+    """
+    Begrenzter Speicher für Benutzer-Sessions ({'history', 'scenario', 'created_at'}).
+
+    Sessions, die länger als idle_seconds ruhen, werden komprimiert nach spill_dir
+    ausgelagert (ohne spill_dir verworfen) und beim nächsten Request der Benutzer
+    transparent wieder geladen. Bei zu vielen Einträgen oder überschrittenem
+    Speicherbudget trifft es die am längsten nicht genutzten zuerst. Die Größe
+    einer Session wird bei jedem Zugriff und bei jeder Leerlauf-Suche neu geschätzt.
+
+    Gepinnte Sessions (get_or_create(pin=True) / pin() bis release()) werden nie
+    ausgelagert: ein laufender Request oder die Zusammenfassung im Hintergrund
+    schreibt noch in das dict, die ausgelagerte Kopie wäre veraltet.
+    """
+
+    def __init__(self, spill_dir=None, max_entries=SESSION_MAX_ENTRIES, max_bytes=SESSION_MAX_MB * 1024 * 1024,
+                 idle_seconds=SESSION_IDLE_SECONDS, spill_ttl=SESSION_SPILL_TTL_SECONDS):
+        self.spill_dir = spill_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.spill_ttl = spill_ttl
+        self._entries = OrderedDict()  # user_id -> _Entry, zuletzt genutzte am Ende
+        self._loading = {}  # user_id -> threading.Event, solange die Session von der Platte geladen wird
+        self._memory_bytes = 0
+        self._last_sweep = self._last_purge = time.time()
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'hits': 0, 'restored': 0, 'spilled': 0, 'spill_errors': 0,
+                       'evicted_idle': 0, 'evicted_max_entries': 0, 'evicted_memory': 0, 'expired_spill': 0}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._purge_stale_spill_files()
+
+    def _spill_path(self, user_id):
+        # user_id kommt vom Client - nie direkt als Dateiname verwenden
+        return os.path.join(self.spill_dir, hashlib.sha256(str(user_id).encode('utf-8')).hexdigest()[:32] + '.json.z')
+
+    def _purge_stale_spill_files(self):
+        """Entfernt ausgelagerte Sessions, deren TTL abgelaufen ist (auch von früheren Prozessen)."""
+        cutoff = time.time() - self.spill_ttl
+        removed = 0
+        for entry in os.scandir(self.spill_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        if removed:
+            with self._lock:
+                self._stats['expired_spill'] += removed
+
+    def get_or_create(self, user_id, scenario='libre', pin=False):
+        """
+        Session von user_id - aus dem RAM, von der Platte oder neu angelegt.
+
+        Args:
+            pin (bool): Session bis release(user_id, session) vor dem Auslagern schützen
+
+        Returns:
+            dict: die Session (wird vom Aufrufer direkt verändert)
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    self._entries.move_to_end(user_id)
+                    self._memory_bytes += estimate_size(entry.session) - entry.size
+                    entry.size = estimate_size(entry.session)
+                    entry.last_active = time.time()
+                    if pin:
+                        entry.pins += 1
+                    self._stats['hits'] += 1
+                    session = entry.session
+                    break
+                loading = self._loading.get(user_id)
+                leader = loading is None
+                if leader:
+                    loading = self._loading[user_id] = threading.Event()
+
+            if not leader:
+                # Paralleler Request lädt die Session gerade von der Platte (und löscht die Datei) -
+                # auf ihn warten statt eine leere Session anzulegen
+                loading.wait()
+                continue
+
+            try:
+                session = self._restore(user_id)
+                with self._lock:
+                    if session is None:
+                        session = {'history': [], 'scenario': scenario, 'created_at': datetime.now()}
+                        self._stats['created'] += 1
+                    else:
+                        self._stats['restored'] += 1
+                    entry = _Entry(session)
+                    entry.pins = int(pin)
+                    self._entries[user_id] = entry
+                    self._memory_bytes += entry.size
+            finally:
+                with self._lock:
+                    del self._loading[user_id]
+                loading.set()
+            break
+
+        self._enforce_limits()
+        return session
+
+    def pin(self, user_id, session):
+        """
+        Schützt die Session (noch im RAM) vor dem Auslagern, bis release() aufgerufen wird.
+
+        Returns:
+            bool: True, wenn gepinnt - nur dann release() aufrufen
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.session is not session:
+                return False
+            entry.pins += 1
+            return True
+
+    def release(self, user_id, session):
+        """Hebt einen Pin von get_or_create(pin=True) oder pin() auf."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            # Nach reset() gehört user_id eine neue Session - deren Pins bleiben unberührt
+            if entry is not None and entry.session is session and entry.pins:
+                entry.pins -= 1
+                entry.last_active = time.time()
+
+    def _restore(self, user_id):
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(user_id)
+        try:
+            expired = time.time() - os.path.getmtime(path) > self.spill_ttl
+            with open(path, 'rb') as f:
+                blob = f.read()
+            os.remove(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"[{user_id}] Ausgelagerte Session nicht lesbar: {e}")
+            return None
+        if expired:
+            with self._lock:
+                self._stats['expired_spill'] += 1
+            return None
+        try:
+            stored_user_id, session = _deserialize(blob)
+        except (ValueError, zlib.error, KeyError) as e:
+            logger.warning(f"[{user_id}] Ausgelagerte Session beschädigt - neue Session: {e}")
+            return None
+        if stored_user_id != user_id:
+            return None
+        logger.info(f"[{user_id}] Session von der Platte geladen ({len(session.get('history') or [])} Nachrichten)")
+        return session
+
+    def reset(self, user_id):
+        """Verwirft die Session von user_id (RAM und Platte). Returns: True, wenn es eine gab"""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._memory_bytes -= entry.size
+        removed_file = False
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(user_id))
+                removed_file = True
+            except OSError:
+                pass
+        return entry is not None or removed_file
+
+    def _enforce_limits(self):
+        now = time.time()
+        victims = []
+        purge = False
+        with self._lock:
+            if self.spill_dir and now - self._last_purge >= SPILL_PURGE_INTERVAL_SECONDS:
+                self._last_purge = now
+                purge = True
+            if now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+                self._last_sweep = now
+                # Historien wachsen nach dem Zugriff weiter - Größen auffrischen
+                for entry in self._entries.values():
+                    size = estimate_size(entry.session)
+                    self._memory_bytes += size - entry.size
+                    entry.size = size
+                for user_id in [k for k, e in self._entries.items()
+                                if not e.pins and now - e.last_active > self.idle_seconds]:
+                    victims.append((user_id, self._pop_locked(user_id), 'evicted_idle'))
+            # Gepinnte Sessions zählen mit, werden aber übersprungen - notfalls bleibt das Limit kurz überschritten
+            while len(self._entries) > self.max_entries:
+                user_id = self._oldest_unpinned_locked()
+                if user_id is None:
+                    break
+                victims.append((user_id, self._pop_locked(user_id), 'evicted_max_entries'))
+            while self._memory_bytes > self.max_bytes and len(self._entries) > 1:
+                user_id = self._oldest_unpinned_locked()
+                if user_id is None:
+                    break
+                victims.append((user_id, self._pop_locked(user_id), 'evicted_memory'))
+            for _, _, reason in victims:
+                self._stats[reason] += 1
+
+        # Schreiben außerhalb des Locks - Requests anderer Benutzer warten nicht auf die Platte
+        for user_id, session, _ in victims:
+            self._spill(user_id, session)
+        if purge:
+            self._purge_stale_spill_files()
+
+    def _oldest_unpinned_locked(self):
+        # Die zuletzt genutzte Session gehört zum aktuellen Request, auch wenn er sie nicht gepinnt hat
+        newest = next(reversed(self._entries), None)
+        return next((k for k, e in self._entries.items() if not e.pins and k != newest), None)
+
+    def _pop_locked(self, user_id):
+        entry = self._entries.pop(user_id)
+        self._memory_bytes -= entry.size
+        return entry.session
+
+    def _spill(self, user_id, session):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(user_id)
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(_serialize(user_id, session))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"[{user_id}] Session konnte nicht ausgelagert werden - verworfen: {e}")
+            with self._lock:
+                self._stats['spill_errors'] += 1
+            return
+        with self._lock:
+            self._stats['spilled'] += 1
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        spilled_on_disk = None
+        if self.spill_dir:
+            try:
+                spilled_on_disk = sum(1 for e in os.scandir(self.spill_dir) if e.name.endswith('.json.z'))
+            except OSError:
+                pass
+        with self._lock:
+            return dict(self._stats,
+                        entries=len(self._entries),
+                        pinned=sum(1 for e in self._entries.values() if e.pins),
+                        max_entries=self.max_entries,
+                        memory_kb=self._memory_bytes // 1024,
+                        max_kb=self.max_bytes // 1024,
+                        on_disk=spilled_on_disk)
@@ -0,0 +1,98 @@
+# backend/single_flight.py
+import json
+import hashlib
+import threading
+import logging
+
+from deadline import current_deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+def payload_key(*parts):
+    """Stabiler Schlüssel aus JSON-serialisierbaren Teilen (sortierte Keys, ohne Leerraum)."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Fasst gleichzeitige, identische Aufrufe zusammen: Der erste Aufrufer (Leader)
+    führt func aus, alle weiteren mit demselben Schlüssel warten auf sein Ergebnis
+    (oder seine Exception). Nach Abschluss wird nichts aufbewahrt - das ist kein Cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            # Nicht länger warten, als das eigene Request-Budget erlaubt
+            if not call.done.wait(current_deadline().wait_seconds()):
+                raise DeadlineExceeded(f"{self.name}: Wartezeit auf identische Anfrage überschritten")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"{self.name}: Ergebnis an {call.waiters} wartende Anfrage(n) verteilt")
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.leaders,
+                'coalesced': self.coalesced,
+                'coalesced_rate': round(self.coalesced / total, 3) if total else 0.0,
+            }
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name):
+    """Prozessweite SingleFlight-Gruppe pro Aufrufart (z.B. 'llm:mistral', 'tts')."""
+    flight = _flights.get(name)
+    if flight is None:
+        with _flights_lock:
+            flight = _flights.setdefault(name, SingleFlight(name))
+    return flight
+
+
+def single_flight_stats():
+    return {name: flight.stats() for name, flight in list(_flights.items())}
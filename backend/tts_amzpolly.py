@@ -1,19 +1,142 @@
 # backend/tts_amzpolly.py
 import os
-import boto3
+import time
+import threading
 import logging
 from botocore.exceptions import ClientError, BotoCoreError
+from provider_clients import get_polly_client
 
 logger = logging.getLogger(__name__)
 
+# Französische Stimmen in Amazon Polly:
+# - Céline (Standard, weiblich)
+# - Mathieu (Standard, männlich) 
+# - Léa (Neural, weiblich) - Höhere Qualität
+# - Rémi (Neural, männlich) - Höhere Qualität
+# Versuche zuerst Neural-Stimme (bessere Qualität), dann Standard als Fallback
+VOICE_CONFIGS = [
+    {'VoiceId': 'Lea', 'Engine': 'neural', 'LanguageCode': 'fr-FR'},        # Neural, weiblich
+    {'VoiceId': 'Remi', 'Engine': 'neural', 'LanguageCode': 'fr-FR'},       # Neural, männlich
+    {'VoiceId': 'Celine', 'Engine': 'standard', 'LanguageCode': 'fr-FR'},   # Standard, weiblich
+    {'VoiceId': 'Mathieu', 'Engine': 'standard', 'LanguageCode': 'fr-FR'},  # Standard, männlich
+]
+
+# Fehlgeschlagene Stimmen werden für diese Zeit übersprungen
+VOICE_COOLDOWN_SECONDS = 600
+# Fehlercodes, die auf die Stimme/Engine selbst zurückgehen (nicht auf den Dienst)
+VOICE_SPECIFIC_ERRORS = ('InvalidParameterValue', 'EngineNotSupportedException',
+                         'LanguageNotSupportedException', 'InvalidSampleRateException')
+
+# Aktuell verwendete Stimme - Teil des TTS-Cache-Schlüssels.
+# Wird angepasst, sobald eine andere Stimme als funktionierend gelernt wurde.
+TTS_VOICE_PROFILE = {'voice': 'Lea', 'engine': 'neural', 'audio_format': 'mp3'}
+
+# Ausgabeformate (erstes = Standard). Polly kennt kein Opus, aber Ogg/Vorbis.
+SUPPORTED_AUDIO_FORMATS = ('mp3', 'vorbis')
+POLLY_OUTPUT_FORMATS = {'mp3': 'mp3', 'vorbis': 'ogg_vorbis'}
+
+_voice_lock = threading.Lock()
+_preferred_voice = None      # zuletzt erfolgreiche Stimme (Index in VOICE_CONFIGS)
+_voice_cooldowns = {}        # Index -> Zeitstempel, bis zu dem die Stimme übersprungen wird
+_voice_stats = {'requests': 0, 'fallbacks': 0, 'failed_attempts': 0, 'skipped_cooldown': 0, 'used': {}}
+
+
+def _voice_label(config):
+    return f"{config['VoiceId']}/{config['Engine']}"
+
+
+def _remember_voice(index):
+    global _preferred_voice
+    with _voice_lock:
+        changed = _preferred_voice != index
+        _preferred_voice = index
+        _voice_cooldowns.pop(index, None)
+    if changed:
+        config = VOICE_CONFIGS[index]
+        TTS_VOICE_PROFILE['voice'] = config['VoiceId']
+        TTS_VOICE_PROFILE['engine'] = config['Engine']
+        logger.info(f"Polly-Stimme gemerkt: {_voice_label(config)}")
+
+
+def _voice_order():
+    """Gemerkte Stimme zuerst, danach die übrigen ohne aktive Sperre in Konfigurationsreihenfolge."""
+    now = time.time()
+    with _voice_lock:
+        order = list(range(len(VOICE_CONFIGS)))
+        if _preferred_voice is not None:
+            order.remove(_preferred_voice)
+            order.insert(0, _preferred_voice)
+        available = [i for i in order if _voice_cooldowns.get(i, 0) <= now]
+        _voice_stats['skipped_cooldown'] += len(order) - len(available)
+    # Sind alle gesperrt, trotzdem alle versuchen statt sofort aufzugeben
+    return available or order
+
+
+def warm_up_voice_selection():
+    """
+    Ermittelt beim Start per describe_voices, welche Stimme/Engine in der Region
+    verfügbar ist, und merkt sich die erste passende. Nicht unterstützte
+    Kombinationen werden gesperrt, damit kein Request daran scheitert.
+    """
+    voices = get_available_voices()
+    if not voices:
+        return None
+    engines_by_voice = {v['Id']: v.get('SupportedEngines', []) for v in voices}
+    chosen = None
+    now = time.time()
+    for index, config in enumerate(VOICE_CONFIGS):
+        if config['Engine'] in engines_by_voice.get(config['VoiceId'], []):
+            if chosen is None:
+                chosen = index
+        else:
+            with _voice_lock:
+                _voice_cooldowns[index] = now + VOICE_COOLDOWN_SECONDS
+    if chosen is not None:
+        _remember_voice(chosen)
+        return VOICE_CONFIGS[chosen]
+    return None
+
+
+def get_voice_stats():
+    """Kennzahlen zur Stimmenauswahl für /health."""
+    now = time.time()
+    with _voice_lock:
+        preferred = VOICE_CONFIGS[_preferred_voice] if _preferred_voice is not None else None
+        return {
+            'preferred_voice': _voice_label(preferred) if preferred else None,
+            'cooling_down': [_voice_label(VOICE_CONFIGS[i]) for i, until in _voice_cooldowns.items() if until > now],
+            'requests': _voice_stats['requests'],
+            'fallbacks': _voice_stats['fallbacks'],
+            'failed_attempts': _voice_stats['failed_attempts'],
+            'skipped_cooldown': _voice_stats['skipped_cooldown'],
+            'used': dict(_voice_stats['used']),
+        }
+
 def synthesize_speech_amzpolly(text: str, output_path: str):
     """
-    Synthetisiert Sprache mit Amazon Polly TTS
+    Synthetisiert Sprache mit Amazon Polly TTS in eine Datei
     
     Args:
         text (str): Text zum Synthetisieren
         output_path (str): Pfad für die Ausgabedatei
     
+    Raises:
+        Exception: Bei Konfiguration- oder API-Fehlern
+    """
+    audio_bytes = synthesize_bytes_amzpolly(text)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'wb') as audio_file:
+        audio_file.write(audio_bytes)
+
+
+def synthesize_bytes_amzpolly(text: str, audio_format: str = 'mp3') -> bytes:
+    """
+    Synthetisiert Sprache mit Amazon Polly TTS und gibt die Audiodaten zurück (ohne Datei)
+    
+    Args:
+        text (str): Text zum Synthetisieren
+        audio_format (str): 'mp3' oder 'vorbis' (Ogg)
+    
     Raises:
         Exception: Bei Konfiguration- oder API-Fehlern
     """
@@ -38,56 +161,24 @@ def synthesize_speech_amzpolly(text: str, output_path: str):
     try:
         logger.info(f"Sending TTS request to Amazon Polly for text: {text[:50]}...")
 
-        # Polly Client initialisieren
-        polly_client = boto3.client(
-            'polly',
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region
-        )
+        # Persistenter Polly Client (Keep-Alive, einmalige Credential-Auflösung)
+        polly_client = get_polly_client()
 
-        # TTS-Parameter konfigurieren
-        # Französische Stimmen in Amazon Polly:
-        # - Céline (Standard, weiblich)
-        # - Mathieu (Standard, männlich) 
-        # - Léa (Neural, weiblich) - Höhere Qualität
-        # - Rémi (Neural, männlich) - Höhere Qualität
-        
-        # Versuche zuerst Neural-Stimme (bessere Qualität), dann Standard als Fallback
-        voice_configs = [
-            {
-                'VoiceId': 'Lea',  # Neural, weiblich, Französisch
-                'Engine': 'neural',
-                'LanguageCode': 'fr-FR'
-            },
-            {
-                'VoiceId': 'Remi',  # Neural, männlich, Französisch  
-                'Engine': 'neural',
-                'LanguageCode': 'fr-FR'
-            },
-            {
-                'VoiceId': 'Celine',  # Standard, weiblich, Französisch
-                'Engine': 'standard',
-                'LanguageCode': 'fr-FR'
-            },
-            {
-                'VoiceId': 'Mathieu',  # Standard, männlich, Französisch
-                'Engine': 'standard', 
-                'LanguageCode': 'fr-FR'
-            }
-        ]
-
-        # Versuche jede Stimme bis eine funktioniert
+        # Versuche jede Stimme bis eine funktioniert - gemerkte Stimme zuerst, gesperrte nicht
         response = None
         used_voice = None
+        voice_order = _voice_order()
+        with _voice_lock:
+            _voice_stats['requests'] += 1
         
-        for voice_config in voice_configs:
+        for attempt, voice_index in enumerate(voice_order):
+            voice_config = VOICE_CONFIGS[voice_index]
             try:
                 logger.info(f"Trying voice: {voice_config['VoiceId']} ({voice_config['Engine']})")
                 
                 response = polly_client.synthesize_speech(
                     Text=text,
-                    OutputFormat='mp3',
+                    OutputFormat=POLLY_OUTPUT_FORMATS[audio_format],
                     VoiceId=voice_config['VoiceId'],
                     Engine=voice_config['Engine'],
                     LanguageCode=voice_config['LanguageCode'],
@@ -98,18 +189,25 @@ def synthesize_speech_amzpolly(text: str, output_path: str):
                 
                 used_voice = voice_config
                 logger.info(f"Successfully using voice: {voice_config['VoiceId']}")
+                _remember_voice(voice_index)
+                with _voice_lock:
+                    label = _voice_label(voice_config)
+                    _voice_stats['used'][label] = _voice_stats['used'].get(label, 0) + 1
+                    if attempt > 0:
+                        _voice_stats['fallbacks'] += 1
                 break
                 
             except ClientError as e:
                 error_code = e.response['Error']['Code']
+                with _voice_lock:
+                    _voice_stats['failed_attempts'] += 1
+                # Dienstfehler (Throttling, 5xx, Zugangsdaten) betreffen alle Stimmen - sofort melden
+                if error_code not in VOICE_SPECIFIC_ERRORS:
+                    raise
                 logger.warning(f"Voice {voice_config['VoiceId']} failed with {error_code}, trying next...")
-                
-                # Bestimmte Fehler sofort weiterwerfen (keine Berechtigung, etc.)
-                if error_code in ['InvalidParameterValue', 'AccessDenied', 'UnauthorizedOperation']:
-                    continue
-                else:
-                    # Bei anderen Fehlern auch nächste Stimme versuchen
-                    continue
+                with _voice_lock:
+                    _voice_cooldowns[voice_index] = time.time() + VOICE_COOLDOWN_SECONDS
+                continue
         
         if not response:
             raise Exception("Alle konfigurierten Stimmen fehlgeschlagen")
@@ -118,19 +216,13 @@ def synthesize_speech_amzpolly(text: str, output_path: str):
         if 'AudioStream' not in response:
             raise Exception("Keine Audio-Daten in Polly-Antwort erhalten")
 
-        # Verzeichnis erstellen falls nötig
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # AudioStream ist ein StreamingBody, muss gelesen werden
+        audio_bytes = response['AudioStream'].read()
 
-        # Audio-Daten in Datei schreiben
-        with open(output_path, 'wb') as audio_file:
-            # AudioStream ist ein StreamingBody, muss gelesen werden
-            audio_file.write(response['AudioStream'].read())
-
-        # Validierung der erstellten Datei
-        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            raise Exception("Amazon Polly TTS-Ausgabe ist leer oder konnte nicht gespeichert werden.")
-        #neu zentral in app.py:
-        #logger.info(f"Audio erfolgreich mit {used_voice['VoiceId']} ({used_voice['Engine']}) gespeichert: {output_path} ({os.path.getsize(output_path)} bytes)")
+        # Validierung der Audiodaten
+        if not audio_bytes:
+            raise Exception("Amazon Polly TTS-Ausgabe ist leer.")
+        return audio_bytes
 
     except ClientError as e:
         error_code = e.response['Error']['Code']
@@ -174,12 +266,7 @@ def get_available_voices():
         return []
 
     try:
-        polly_client = boto3.client(
-            'polly',
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region
-        )
+        polly_client = get_polly_client()
         
         # Alle verfügbaren Stimmen abrufen
         response = polly_client.describe_voices(LanguageCode='fr-FR')
@@ -229,12 +316,7 @@ def synthesize_speech_amzpolly_ssml(ssml_text: str, output_path: str, voice_id:
         ssml_text = f'<speak>{ssml_text}</speak>'
     
     try:
-        polly_client = boto3.client(
-            'polly',
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region
-        )
+        polly_client = get_polly_client()
         
         response = polly_client.synthesize_speech(
             Text=ssml_text,
@@ -0,0 +1,193 @@
+# backend/tts_cache.py
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Standard-Cache-Verzeichnis neben temp_audio im Projekt-Root
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tts_cache')
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+# Neutrale Endung: Einträge desselben Caches können MP3, Ogg oder WAV sein (Format steckt im Schlüssel)
+CACHE_SUFFIX = '.audio'
+
+
+def normalize_text(text):
+    """
+    Normalisiert Text für den Cache-Schlüssel: Unicode NFC, Whitespace zusammenfassen,
+    typografische Apostrophe vereinheitlichen. Groß-/Kleinschreibung und Satzzeichen
+    bleiben erhalten, da sie die Aussprache beeinflussen.
+    """
+    text = unicodedata.normalize('NFC', text or '')
+    text = text.replace('\u2019', "'").replace('\u00a0', ' ')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def make_cache_key(provider, text, voice=None, engine=None, audio_format='mp3'):
+    """
+    Erzeugt einen inhaltsadressierten Schlüssel aus (Provider, Stimme, Engine, Format, Text).
+
+    Returns:
+        str: SHA-256 Hex-Digest
+    """
+    parts = [str(provider), str(voice or ''), str(engine or ''), str(audio_format or ''), normalize_text(text)]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class TTSAudioCache:
+    """
+    Größenbegrenzter LRU-Cache für synthetisierte Audiodateien auf der Festplatte.
+
+    Die Dateien liegen unter <cache_dir>/<key[:2]>/<key>.audio und werden von allen
+    Gunicorn-Workern gemeinsam genutzt. Jeder Worker führt einen eigenen LRU-Index,
+    fremde Einträge werden beim ersten Zugriff übernommen.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> Dateigröße in Bytes
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + CACHE_SUFFIX)
+
+    def _load_index(self):
+        """Liest vorhandene Einträge ein, älteste (nach mtime) zuerst."""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if not name.endswith(CACHE_SUFFIX):
+                    # Einträge älterer Versionen (<key>.mp3, evtl. mit falschem Inhalt) verwerfen
+                    if name.endswith(('.mp3', '.ogg', '.wav')):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name.rsplit('.', 1)[0], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        if found:
+            logger.info(f"TTS-Cache geladen: {len(found)} Einträge, {self._total_bytes // 1024} KB")
+        self._evict_locked()
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path_for(key))
+            except OSError:
+                pass
+
+    def _lookup(self, keys):
+        """Sucht den ersten vorhandenen Schlüssel und zählt Treffer/Fehlschlag. Returns: (key, path) oder (None, None)"""
+        with self._lock:
+            for key in keys:
+                path = self._path_for(key)
+                if not os.path.exists(path):
+                    if key in self._entries:
+                        self._total_bytes -= self._entries.pop(key)
+                    continue
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                else:
+                    # Von einem anderen Worker geschrieben
+                    size = os.path.getsize(path)
+                    self._entries[key] = size
+                    self._total_bytes += size
+                    self._evict_locked()
+                self.hits += 1
+                return key, path
+            self.misses += 1
+            return None, None
+
+    def _undo_hit(self):
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+
+    def fetch_first_bytes(self, keys):
+        """
+        Probiert mehrere Schlüssel (z.B. je TTS-Anbieter) in Reihenfolge und zählt
+        das Ganze als einen einzigen Lookup; liefert die Audiodaten im Speicher.
+
+        Returns:
+            tuple: (key, bytes) oder (None, None)
+        """
+        hit_key, cached_path = self._lookup(keys)
+        if hit_key is None:
+            return None, None
+        try:
+            with open(cached_path, 'rb') as f:
+                data = f.read()
+            os.utime(cached_path)
+            return hit_key, data
+        except OSError as e:
+            logger.warning(f"TTS-Cache: Eintrag {hit_key[:12]} konnte nicht gelesen werden: {e}")
+            self._undo_hit()
+            return None, None
+
+    def store_bytes(self, key, data):
+        """Übernimmt frisch synthetisierte Audiodaten in den Cache."""
+        size = len(data)
+        if size == 0 or size > self.max_bytes:
+            return
+
+        cached_path = self._path_for(key)
+        tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cached_path)  # atomar, falls mehrere Worker gleichzeitig schreiben
+        except OSError as e:
+            logger.warning(f"TTS-Cache: Speichern von {key[:12]} fehlgeschlagen: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._total_bytes += size
+            self.stores += 1
+            self._evict_locked()
+
+    def stats(self):
+        """Kennzahlen für /health."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_kb': self._total_bytes // 1024,
+                'max_kb': self.max_bytes // 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+            }
@@ -2,9 +2,18 @@
 import os
 from google.cloud import texttospeech
 import logging
+from provider_clients import get_google_tts_client
+from deadline import stage_timeout
 
 logger = logging.getLogger(__name__)
 
+# Stimme - Teil des TTS-Cache-Schlüssels
+TTS_VOICE_PROFILE = {'voice': 'fr-FR-Wavenet-A', 'engine': 'wavenet', 'audio_format': 'mp3'}
+
+# Ausgabeformate (erstes = Standard); Opus mit 24 kHz reicht für Sprache
+SUPPORTED_AUDIO_FORMATS = ('mp3', 'opus')
+GOOGLE_OPUS_SAMPLE_RATE = 24000
+
 # Stellen Sie sicher, dass die Umgebungsvariable GOOGLE_APPLICATION_CREDENTIALS gesetzt ist
 # oder die 'google_credentials.json' im selben Verzeichnis wie die App liegt.
 # Alternativ können Sie den Pfad hier direkt angeben:
@@ -13,10 +22,21 @@ logger = logging.getLogger(__name__)
 
 def synthesize_speech_google(text: str, output_path: str):
     """
-    Synthesisiert Sprache mit Google Cloud Text-to-Speech API
+    Synthesisiert Sprache mit Google Cloud Text-to-Speech API in eine Datei
+    """
+    audio_bytes = synthesize_bytes_google(text)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as out:
+        out.write(audio_bytes)
+    logger.info(f"Audio erfolgreich gespeichert: {output_path} ({len(audio_bytes)} bytes)")
+
+
+def synthesize_bytes_google(text: str, audio_format: str = 'mp3') -> bytes:
+    """
+    Synthesisiert Sprache mit Google Cloud Text-to-Speech API und gibt die Audiodaten zurück ('mp3' oder 'opus')
     """
     try:
-        client = texttospeech.TextToSpeechClient()
+        client = get_google_tts_client()
 
         synthesis_input = texttospeech.SynthesisInput(text=text)
 
@@ -29,22 +49,27 @@ def synthesize_speech_google(text: str, output_path: str):
             ssml_gender=texttospeech.SsmlVoiceGender.FEMALE # Weibliche Stimme
         )
 
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.0,  # Sprechgeschwindigkeit (0.25 - 4.0)
-            pitch=0.0           # Tonhöhe (-20.0 - 20.0)
-        )
+        if audio_format == 'opus':
+            audio_config = texttospeech.AudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.OGG_OPUS,
+                sample_rate_hertz=GOOGLE_OPUS_SAMPLE_RATE,
+                speaking_rate=1.0,
+                pitch=0.0
+            )
+        else:
+            audio_config = texttospeech.AudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.MP3,
+                speaking_rate=1.0,  # Sprechgeschwindigkeit (0.25 - 4.0)
+                pitch=0.0           # Tonhöhe (-20.0 - 20.0)
+            )
 
         logger.info(f"Sending TTS request to Google Cloud for text: {text[:50]}...")
         response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
+            input=synthesis_input, voice=voice, audio_config=audio_config,
+            timeout=stage_timeout(30, 'Google TTS')
         )
 
-        # Die synthetisierte Audioausgabe speichern
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "wb") as out:
-            out.write(response.audio_content)
-            logger.info(f"Audio erfolgreich gespeichert: {output_path} ({os.path.getsize(output_path)} bytes)")
+        return response.audio_content
 
     except Exception as e:
         logger.error(f"Google Cloud TTS Fehler: {str(e)}")
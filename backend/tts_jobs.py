@@ -0,0 +1,168 @@
+# backend/tts_jobs.py
+import os
+import glob
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import start_deadline
+from resilience import start_retry_budget
+
+logger = logging.getLogger(__name__)
+
+# Hintergrund-Worker für TTS-Jobs pro Prozess
+TTS_JOB_WORKERS = int(os.environ.get('TTS_JOB_WORKERS', 4))
+# Wie lange ein abgeschlossener Job im Speicher bleibt
+JOB_TTL_SECONDS = 600
+# Maximale Wartezeit eines Long-Poll-Requests
+MAX_LONG_POLL_SECONDS = 20
+
+PENDING_SUFFIX = '.pending'
+FAILED_SUFFIX = '.failed'
+# Halb geschriebene Audiodateien (safe_synthesize_tts schreibt atomar über .part)
+PART_SUFFIX = '.part'
+
+STATUS_PENDING = 'pending'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+
+
+class TTSJob:
+    def __init__(self, job_id, output_stem):
+        self.job_id = job_id
+        self.output_stem = output_stem  # Pfad ohne Endung - die folgt dem gelieferten Format
+        self.output_path = None
+        self.status = STATUS_PENDING
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+
+
+class TTSJobQueue:
+    """
+    Führt TTS im Hintergrund aus, damit /api/respond den Text sofort zurückgeben kann.
+
+    Der Status ist zusätzlich im Dateisystem abgelegt, damit jeder Gunicorn-Worker
+    ihn beantworten kann: während der Synthese existiert <stem>.pending, danach
+    die fertige Datei <stem>.<ext> oder ein <stem>.failed-Marker.
+    """
+
+    def __init__(self, workers=TTS_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, job_id, synthesize, text, output_stem, user_id):
+        """
+        Plant eine Synthese ein.
+
+        Args:
+            job_id (str): Eindeutige Job-ID
+            synthesize (callable): (text, output_stem, user_id) -> Pfad der geschriebenen Datei oder None
+            output_stem (str): Zielpfad der fertigen Audiodatei ohne Endung
+        """
+        job = TTSJob(job_id, output_stem)
+        # Marker sofort anlegen, damit auch andere Worker den Job als laufend sehen
+        os.makedirs(os.path.dirname(output_stem), exist_ok=True)
+        open(output_stem + PENDING_SUFFIX, 'wb').close()
+        with self._lock:
+            self._purge_locked()
+            self._jobs[job_id] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job, synthesize, text, user_id)
+        return job
+
+    def _run(self, job, synthesize, text, user_id):
+        # Eigene Deadline und eigenes Retry-Budget - der auslösende Request ist längst beantwortet
+        start_deadline()
+        start_retry_budget()
+        ok = False
+        try:
+            try:
+                # Schreibt atomar nach <stem>.<ext> - sobald die Datei existiert, ist sie vollständig
+                job.output_path = synthesize(text, job.output_stem, user_id)
+                ok = bool(job.output_path)
+            except Exception as e:
+                logger.error(f"[{user_id}] TTS-Job {job.job_id} fehlgeschlagen: {e}")
+                ok = False
+            try:
+                os.remove(job.output_stem + PENDING_SUFFIX)
+            except OSError:
+                pass
+            if not ok:
+                try:
+                    open(job.output_stem + FAILED_SUFFIX, 'wb').close()
+                except OSError as e:
+                    # z.B. Verzeichnis inzwischen vom Janitor entfernt - der Status im Speicher genügt
+                    logger.warning(f"[{user_id}] TTS-Job {job.job_id}: Fehler-Marker nicht geschrieben: {e}")
+        finally:
+            # Long-Poller dürfen nie bis zu ihrem Timeout hängen bleiben
+            with self._lock:
+                job.status = STATUS_READY if ok else STATUS_FAILED
+                job.finished_at = time.time()
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            job.done.set()
+
+    def wait(self, job_id, output_stem, timeout):
+        """
+        Wartet (Long-Poll) bis zu timeout Sekunden auf den Job.
+
+        Returns:
+            str: 'ready', 'failed' oder 'pending'
+        """
+        timeout = min(max(timeout, 0), MAX_LONG_POLL_SECONDS)
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+            return job.status
+
+        # Job läuft in einem anderen Worker-Prozess: Dateisystem abfragen
+        end = time.monotonic() + timeout
+        while True:
+            status = file_status(output_stem)
+            if status != STATUS_PENDING or time.monotonic() >= end:
+                return status
+            time.sleep(0.2)
+
+    def _purge_locked(self):
+        now = time.time()
+        expired = [jid for jid, job in self._jobs.items()
+                   if job.finished_at and now - job.finished_at > JOB_TTL_SECONDS]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'in_flight': sum(1 for job in self._jobs.values() if job.status == STATUS_PENDING),
+            }
+
+
+def job_audio_path(output_stem):
+    """Fertige Audiodatei eines Jobs (<stem>.<ext>, Endung je nach Format) oder None."""
+    for path in glob.glob(glob.escape(output_stem) + '.*'):
+        if not path.endswith((PENDING_SUFFIX, FAILED_SUFFIX, PART_SUFFIX)):
+            return path
+    return None
+
+
+def file_status(output_stem):
+    """Job-Status allein aus dem Dateisystem (prozessübergreifend)."""
+    if job_audio_path(output_stem):
+        return STATUS_READY
+    if os.path.exists(output_stem + FAILED_SUFFIX):
+        return STATUS_FAILED
+    if os.path.exists(output_stem + PENDING_SUFFIX):
+        return STATUS_PENDING
+    return STATUS_FAILED  # unbekannt oder bereits aufgeräumt
@@ -3,12 +3,32 @@ import os
 import requests
 import logging
 import json #  json Modul importieren
+from deadline import stage_timeout
+from provider_clients import get_http_session
 
 logger = logging.getLogger(__name__)
 
+# Stimme und Modell - Teil des TTS-Cache-Schlüssels
+TTS_VOICE_PROFILE = {'voice': 'Friendly_Person', 'engine': 'speech-02-hd', 'audio_format': 'mp3'}
+
+# Minimax liefert kein Ogg/Opus - dafür MP3 mit für Sprache ausreichender Bitrate (statt 128 kbps)
+SUPPORTED_AUDIO_FORMATS = ('mp3',)
+MINIMAX_MP3_BITRATE = int(os.environ.get('MINIMAX_MP3_BITRATE', 64000))
+MINIMAX_SAMPLE_RATE = int(os.environ.get('MINIMAX_SAMPLE_RATE', 24000))
+
 def synthesize_speech_minimax(text: str, output_path: str):
     """
-    Synthesisiert Sprache mit Minimax TTS API
+    Synthesisiert Sprache mit Minimax TTS API in eine Datei
+    """
+    audio_bytes = synthesize_bytes_minimax(text)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(audio_bytes)
+    logger.info(f"Audio erfolgreich gespeichert: {output_path} ({len(audio_bytes)} bytes)")
+
+def synthesize_bytes_minimax(text: str, audio_format: str = 'mp3') -> bytes:
+    """
+    Synthesisiert Sprache mit Minimax TTS API und gibt die MP3-Daten zurück
     """
     api_key = os.getenv("MINIMAX_API_KEY")
     if not api_key:
@@ -49,8 +69,8 @@ def synthesize_speech_minimax(text: str, output_path: str):
             "pitch":0  
         },  
         "audio_setting":{    
-            "sample_rate":32000, 
-            "bitrate":128000,    
+            "sample_rate":MINIMAX_SAMPLE_RATE, 
+            "bitrate":MINIMAX_MP3_BITRATE,    
             "format":"mp3",    
             "channel":1  
         }
@@ -62,7 +82,7 @@ def synthesize_speech_minimax(text: str, output_path: str):
     try:
         logger.info(f"Sending TTS request to Minimax for text: {text[:50]}...")
         # Payload als 'data' senden, da es bereits ein JSON-String ist
-        response = requests.post(url, headers=headers, data=payload_json, timeout=45) 
+        response = get_http_session('minimax').post(url, headers=headers, data=payload_json, timeout=stage_timeout(45, 'Minimax')) 
         
         # Debug-Informationen
         logger.info(f"Minimax Response Status: {response.status_code}")
@@ -100,24 +120,14 @@ def synthesize_speech_minimax(text: str, output_path: str):
                 error_msg = f"Fehler beim Parsen der JSON-Antwort: {response.text}"
             raise Exception(f"Minimax API Fehler ({response.status_code}): {error_msg}. Erwartet: audio/mpeg, Erhalten: {content_type}")
         
-        # Verzeichnis erstellen falls nicht vorhanden
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # Audio-Datei speichern
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-        
-        # Validieren dass Datei geschrieben wurde
-        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            raise Exception("Audio-Datei wurde nicht korrekt gespeichert")
-        
+        audio_bytes = response.content
+
         # Audio-Format validieren (erste Bytes prüfen)
-        with open(output_path, "rb") as f:
-            header = f.read(4)
-            if not (header.startswith(b'ID3') or header[1:4] == b'MP3' or header.startswith(b'\xff\xfb')):
-                logger.warning("Audio-Datei scheint kein gültiges MP3 zu sein")
-            
-        logger.info(f"Audio erfolgreich gespeichert: {output_path} ({os.path.getsize(output_path)} bytes)")
+        header = audio_bytes[:4]
+        if not (header.startswith(b'ID3') or header[1:4] == b'MP3' or header.startswith(b'\xff\xfb')):
+            logger.warning("Audio-Daten scheinen kein gültiges MP3 zu sein")
+
+        return audio_bytes
             
     except requests.exceptions.Timeout:
         raise Exception("Minimax API Timeout - Anfrage dauerte zu lange")
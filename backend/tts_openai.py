@@ -1,19 +1,36 @@
 # backend/tts_openai.py
 import os
-from openai import OpenAI
 import logging
+from provider_clients import get_openai_client
+from deadline import stage_timeout
 
 logger = logging.getLogger(__name__)
 
+# Stimme und Modell - Teil des TTS-Cache-Schlüssels
+TTS_VOICE_PROFILE = {'voice': 'nova', 'engine': 'gpt-4o-mini-tts', 'audio_format': 'mp3'}
+
+# Ausgabeformate (erstes = Standard); 'opus' kommt als Ogg/Opus
+SUPPORTED_AUDIO_FORMATS = ('mp3', 'opus')
+
 def synthesize_speech_openai(text: str, output_path: str):
     """
-    Synthesisiert Sprache mit OpenAI TTS API
+    Synthesisiert Sprache mit OpenAI TTS API in eine Datei
+    """
+    audio_bytes = synthesize_bytes_openai(text)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(audio_bytes)
+    logger.info(f"Audio erfolgreich gespeichert: {output_path} ({len(audio_bytes)} bytes)")
+
+def synthesize_bytes_openai(text: str, audio_format: str = 'mp3') -> bytes:
+    """
+    Synthesisiert Sprache mit OpenAI TTS API und gibt die Audiodaten zurück ('mp3' oder 'opus')
     """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise Exception("OPENAI_API_KEY Umgebungsvariable fehlt")
 
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client(api_key)
 
     # Text validieren und truncaten, falls zu lang
     if not text or len(text.strip()) == 0:
@@ -35,17 +52,14 @@ def synthesize_speech_openai(text: str, output_path: str):
             model="gpt-4o-mini-tts",  # Oder "tts-1", oder "tts-1-hd" für höhere Qualität
             voice="nova",   # Eine der verfügbaren Stimmen: 'coral, 'alloy', 'echo', 'fable', 'mira', 'nova', 'onyx'
             input=text,
-            response_format="mp3"
+            response_format=audio_format,
+            timeout=stage_timeout(30, 'OpenAI TTS')
         )
 
-        # Audioinhalt speichern
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        response.stream_to_file(output_path)
-
-        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            raise Exception("OpenAI TTS-Ausgabe ist leer oder konnte nicht gespeichert werden.")
-
-        logger.info(f"Audio erfolgreich gespeichert: {output_path} ({os.path.getsize(output_path)} bytes)")
+        audio_bytes = response.content
+        if not audio_bytes:
+            raise Exception("OpenAI TTS-Ausgabe ist leer.")
+        return audio_bytes
 
     except Exception as e:
         logger.error(f"OpenAI TTS Fehler: {str(e)}")
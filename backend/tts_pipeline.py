@@ -0,0 +1,180 @@
+# backend/tts_pipeline.py
+import os
+import re
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from resilience import submit_with_context
+
+logger = logging.getLogger(__name__)
+
+# Anzahl paralleler TTS-Anfragen pro Worker-Prozess
+TTS_PIPELINE_WORKERS = int(os.environ.get('TTS_PIPELINE_WORKERS', 4))
+# Wie lange ein fertiger Stream für Wiederholungen (Replay/Seek) abrufbar bleibt
+STREAM_TTL_SECONDS = 300
+# Kurze Fragmente ("Oui.", "Bien !") werden mit dem nächsten Satz zusammengefasst
+MIN_SENTENCE_CHARS = 25
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+# Abkürzungen, nach denen kein Satzende vorliegt
+_ABBREVIATIONS = ('M.', 'Mme.', 'Mlle.', 'Dr.', 'Pr.', 'St.', 'etc.', 'p.ex.', 'cf.')
+
+_executor = ThreadPoolExecutor(max_workers=TTS_PIPELINE_WORKERS, thread_name_prefix='tts-pipeline')
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS):
+    """
+    Teilt einen Antworttext in Sätze für die TTS-Pipeline auf.
+
+    Args:
+        text (str): Vollständiger LLM-Antworttext
+        min_chars (int): Mindestlänge eines Abschnitts; kürzere werden angehängt
+
+    Returns:
+        list: Liste von Satz-Strings in Originalreihenfolge
+    """
+    pieces = [p.strip() for p in _SENTENCE_END.split(text or '') if p.strip()]
+
+    sentences = []
+    buffer = ''
+    for piece in pieces:
+        buffer = f"{buffer} {piece}".strip() if buffer else piece
+        if buffer.endswith(_ABBREVIATIONS) or len(buffer) < min_chars:
+            continue
+        sentences.append(buffer)
+        buffer = ''
+    if buffer:
+        if sentences and len(buffer) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {buffer}"
+        else:
+            sentences.append(buffer)
+    return sentences
+
+
+class SentenceAccumulator:
+    """
+    Sammelt gestreamte LLM-Tokens und gibt vollständige Sätze zurück, sobald
+    ein Satzende erkannt ist. Der unvollständige Rest bleibt im Puffer.
+    """
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ''
+
+    def feed(self, token):
+        """Fügt ein Token hinzu und liefert die dadurch abgeschlossenen Sätze."""
+        self._buffer += token
+        # Das letzte Stück kann noch weiterwachsen und wird nicht ausgegeben
+        parts = _SENTENCE_END.split(self._buffer)
+        if len(parts) < 2:
+            return []
+        complete, rest = parts[:-1], parts[-1]
+
+        sentences = []
+        pending = ''
+        for piece in complete:
+            pending = f"{pending} {piece.strip()}".strip() if pending else piece.strip()
+            if pending.endswith(_ABBREVIATIONS) or len(pending) < self.min_chars:
+                continue
+            sentences.append(pending)
+            pending = ''
+        self._buffer = f"{pending} {rest}" if pending else rest
+        return sentences
+
+    def flush(self):
+        """Gibt den Rest nach Ende des Streams zurück."""
+        rest, self._buffer = self._buffer.strip(), ''
+        return [rest] if rest else []
+
+
+def submit_synthesis(synthesize, text, output_stem, user_id):
+    """
+    Plant eine einzelne Satz-Synthese im gemeinsamen Thread-Pool ein.
+    Das Future liefert den Pfad der geschriebenen Datei (Endung je nach Format) oder None.
+    """
+    return submit_with_context(_executor, synthesize, text, output_stem, user_id)
+
+
+class SentenceAudioStream:
+    """
+    Synthetisiert die Sätze eines Textes parallel und liefert die Audiodaten
+    in der richtigen Reihenfolge, sobald der jeweils nächste Satz fertig ist.
+
+    MP3-Frames lassen sich direkt aneinanderhängen, daher kann der Browser die
+    Teile als einen fortlaufenden audio/mpeg-Stream abspielen. Teile in einem
+    anderen Format (Wechsel auf einen Anbieter ohne MP3) werden übersprungen.
+    """
+
+    def __init__(self, sentences, synthesize, output_dir, user_id, extension='mp3'):
+        self.user_id = user_id
+        self.created_at = time.time()
+        self.extension = extension
+        self.futures = []
+        prefix = f"llm_part_{int(self.created_at)}_{uuid.uuid4().hex[:6]}"
+        for index, sentence in enumerate(sentences):
+            stem = os.path.join(output_dir, f"{prefix}_{index}")
+            self.futures.append(submit_synthesis(synthesize, sentence, stem, user_id))
+
+    def iter_chunks(self, chunk_size=16 * 1024):
+        """Gibt die Audiodaten Satz für Satz zurück; fehlgeschlagene Sätze werden übersprungen."""
+        for index, future in enumerate(self.futures):
+            try:
+                path = future.result()
+            except Exception as e:
+                logger.warning(f"[{self.user_id}] TTS für Satz {index} fehlgeschlagen: {e}")
+                continue
+            if not path or not os.path.exists(path):
+                continue
+            if not path.endswith(f".{self.extension}"):
+                logger.warning(f"[{self.user_id}] Satz {index} nicht als {self.extension} geliefert - übersprungen")
+                continue
+            with open(path, 'rb') as f:
+                while True:
+                    data = f.read(chunk_size)
+                    if not data:
+                        break
+                    yield data
+
+    def is_done(self):
+        return all(f.done() for f in self.futures)
+
+
+def start_sentence_stream(text, synthesize, output_dir, user_id, extension='mp3'):
+    """
+    Startet die parallele Satz-Synthese und registriert den Stream.
+
+    Args:
+        text (str): Zu sprechender Text
+        synthesize (callable): (text, output_stem, user_id) -> Pfad der MP3-Datei oder None
+        output_dir (str): Benutzerverzeichnis für die Teil-Dateien
+        user_id (str): Benutzer-ID für Logging
+
+    Returns:
+        str: Stream-ID für /api/audio_stream/<stream_id>
+    """
+    sentences = split_sentences(text)
+    stream = SentenceAudioStream(sentences, synthesize, output_dir, user_id, extension)
+    stream_id = uuid.uuid4().hex
+    with _streams_lock:
+        _purge_expired_locked()
+        _streams[stream_id] = stream
+    logger.info(f"[{user_id}] Satz-Pipeline gestartet: {len(sentences)} Sätze, Stream {stream_id[:8]}")
+    return stream_id
+
+
+def get_sentence_stream(stream_id):
+    with _streams_lock:
+        return _streams.get(stream_id)
+
+
+def _purge_expired_locked():
+    now = time.time()
+    expired = [sid for sid, s in _streams.items()
+               if now - s.created_at > STREAM_TTL_SECONDS and s.is_done()]
+    for sid in expired:
+        del _streams[sid]
@@ -0,0 +1,241 @@
+# backend/tts_router.py
+import os
+import time
+import tempfile
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from resilience import get_breaker, submit_with_context, CircuitOpenError
+from deadline import current_deadline, DeadlineExceeded, record_degradation
+from audio_formats import choose_audio_format
+
+logger = logging.getLogger(__name__)
+
+STATS_WINDOW = 50            # Anzahl der letzten Anfragen pro Provider für p50/p95/Fehlerquote
+MIN_SAMPLES = 5              # Ab so vielen Messungen gelten p50/p95 als belastbar
+MAX_ERROR_RATE = 0.5         # Darüber gilt ein Provider als ungesund
+HEDGE_DELAY_MIN = 0.3        # Sekunden; untere/obere Grenze für den Hedge-Zeitpunkt
+HEDGE_DELAY_MAX = 5.0
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('TTS_ROUTER_WORKERS', 8)),
+                               thread_name_prefix='tts-router')
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class ProviderStats:
+    """Rollierende Latenz- und Fehlerstatistik eines TTS-Providers."""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True = Erfolg
+        self.requests = 0
+        self.hedged_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+
+    def p50(self):
+        with self._lock:
+            return _percentile(self.latencies, 0.5) if len(self.latencies) >= MIN_SAMPLES else None
+
+    def p95(self):
+        with self._lock:
+            return _percentile(self.latencies, 0.95) if len(self.latencies) >= MIN_SAMPLES else None
+
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self):
+        p50, p95 = self.p50(), self.p95()
+        return {
+            'requests': self.requests,
+            'p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000) if p95 is not None else None,
+            'error_rate': round(self.error_rate(), 3),
+            'hedged_wins': self.hedged_wins,
+        }
+
+
+class TTSProvider:
+    """
+    Ein TTS-Backend mit Name, Synthesefunktion (text, output_path), Stimmprofil,
+    optional einer Variante synthesize_bytes(text, audio_format) -> bytes ohne Datei
+    und den Ausgabeformaten, die es liefern kann (erstes = Standard).
+    """
+
+    def __init__(self, name, synthesize, profile, synthesize_bytes=None, formats=None):
+        self.name = name
+        self.synthesize = synthesize
+        self.profile = profile
+        self.formats = tuple(formats) if formats and synthesize_bytes else (profile.get('audio_format', 'mp3'),)
+        self.synthesize_bytes = synthesize_bytes or self._bytes_via_file
+        self.stats = ProviderStats()
+        self.breaker = get_breaker(f"tts:{name}")
+
+    def _bytes_via_file(self, text, audio_format=None):
+        """Fallback für Provider, die nur in Dateien schreiben können."""
+        fd, path = tempfile.mkstemp(suffix=f".{self.profile.get('audio_format', 'mp3')}")
+        os.close(fd)
+        try:
+            self.synthesize(text, path)
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+class TTSRouter:
+    """
+    Verteilt TTS-Anfragen auf mehrere Provider: wählt den schnellsten gesunden
+    (nach rollierendem p50), weicht bei Fehlern auf den nächsten aus und startet
+    optional eine zweite, abgesicherte Anfrage (Hedge), wenn die erste ihr p95 überschreitet.
+    Provider mit offenem Circuit Breaker werden übersprungen.
+    """
+
+    def __init__(self, providers, hedge=True):
+        self.providers = list(providers)
+        self.hedge = hedge and len(self.providers) > 1
+        self.hedges_fired = 0
+
+    def ranked(self):
+        """Provider nach Gesundheit und p50 sortiert; ungemessene Ersatz-Provider zuletzt."""
+        def sort_key(item):
+            index, provider = item
+            unhealthy = provider.stats.error_rate() > MAX_ERROR_RATE
+            p50 = provider.stats.p50()
+            if p50 is None:
+                # Primärer Provider ohne Messwerte zuerst, andere erst nach gemessenen
+                p50 = 0.0 if index == 0 else float('inf')
+            return (unhealthy, p50, index)
+        return [p for _, p in sorted(enumerate(self.providers), key=sort_key)]
+
+    def _run(self, provider, text, audio_format):
+        """Synthetisiert im Speicher und misst die Latenz."""
+        start = time.monotonic()
+        try:
+            audio_bytes = provider.synthesize_bytes(text, audio_format)
+            ok = bool(audio_bytes)
+            if not ok:
+                raise Exception(f"{provider.name} lieferte keine Audiodaten")
+            provider.breaker.record_success()
+            return audio_bytes
+        except DeadlineExceeded:
+            # Zeitbudget des Requests aufgebraucht - kein Fehler des Providers, nicht mitzählen,
+            # aber eine reservierte Half-Open-Probe freigeben
+            ok = None
+            provider.breaker.release_probe()
+            raise
+        except Exception:
+            ok = False
+            provider.breaker.record_failure()
+            raise
+        finally:
+            if ok is not None:
+                provider.stats.record(time.monotonic() - start, ok)
+
+    def _hedge_delay(self, provider):
+        p95 = provider.stats.p95()
+        if p95 is None:
+            return None
+        return min(max(p95, HEDGE_DELAY_MIN), HEDGE_DELAY_MAX)
+
+    def synthesize(self, text, output_path):
+        """
+        Synthetisiert text nach output_path (atomar über eine .part-Datei).
+
+        Returns:
+            TTSProvider: Der Provider, dessen Audio verwendet wurde
+
+        Raises:
+            Exception: Wenn alle Provider fehlschlagen
+        """
+        audio_bytes, provider, _ = self.synthesize_bytes(text)
+        part_path = f"{output_path}.part"
+        with open(part_path, 'wb') as f:
+            f.write(audio_bytes)
+        os.replace(part_path, output_path)
+        return provider
+
+    def synthesize_bytes(self, text, formats=None):
+        """
+        Synthetisiert text im Speicher.
+
+        Args:
+            formats (list): Gewünschte Ausgabeformate in Reihenfolge; None = Standard des Providers
+
+        Returns:
+            tuple: (bytes, TTSProvider, str) - Audiodaten, liefernder Provider und tatsächliches Format
+
+        Raises:
+            Exception: Wenn alle Provider fehlschlagen
+        """
+        candidates = [p for p in self.ranked() if p.breaker.is_available()]
+        if not candidates:
+            raise CircuitOpenError("Alle TTS-Provider sind vorübergehend gesperrt (Circuit offen)")
+        last_error = None
+
+        while candidates:
+            primary = candidates.pop(0)
+            if not primary.breaker.allow():
+                continue
+            running = {submit_with_context(_executor, self._run, primary, text,
+                                           choose_audio_format(primary.formats, formats)): primary}
+
+            delay = self._hedge_delay(primary) if self.hedge and candidates else None
+            if delay is not None:
+                done, _ = wait(running, timeout=delay)
+                backup = candidates[0] if candidates else None
+                if not done and backup.breaker.allow():
+                    candidates.pop(0)
+                    self.hedges_fired += 1
+                    logger.info(f"TTS-Hedge: {primary.name} > {delay:.2f}s, starte zusätzlich {backup.name}")
+                    running[submit_with_context(_executor, self._run, backup, text,
+                                                choose_audio_format(backup.formats, formats))] = backup
+
+            while running:
+                # Nicht länger warten, als die Request-Deadline erlaubt (gilt auch für Polly ohne eigenen Timeout)
+                done, _ = wait(running, timeout=current_deadline().wait_seconds(), return_when=FIRST_COMPLETED)
+                if not done:
+                    record_degradation('deadline_exceeded')
+                    raise DeadlineExceeded("TTS-Deadline überschritten")
+                for future in done:
+                    provider = running.pop(future)
+                    try:
+                        audio_bytes = future.result()
+                    except Exception as e:
+                        logger.warning(f"TTS-Provider {provider.name} fehlgeschlagen: {e}")
+                        last_error = e
+                        continue
+                    if provider is not primary:
+                        provider.stats.hedged_wins += 1
+                    # Verlierer laufen im Hintergrund zu Ende, ihr Ergebnis wird verworfen
+                    return audio_bytes, provider, choose_audio_format(provider.formats, formats)
+
+        if last_error is None:
+            raise CircuitOpenError("Alle TTS-Provider sind vorübergehend gesperrt (Circuit offen)")
+        raise Exception(f"Alle TTS-Provider fehlgeschlagen: {last_error}")
+
+    def stats(self):
+        return {
+            'ranking': [p.name for p in self.ranked()],
+            'hedging': self.hedge,
+            'hedges_fired': self.hedges_fired,
+            'providers': {p.name: dict(p.stats.snapshot(), circuit=p.breaker.snapshot()['state'])
+                          for p in self.providers},
+        }
+
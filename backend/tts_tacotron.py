@@ -7,6 +7,9 @@ MODEL_DIR = "backend/models/tts/tts_models-fr-mai-tacotron2-DDC"
 TACOTRON_MODEL_PATH = f"{MODEL_DIR}/model_file.pth"
 TACOTRON_CONFIG_PATH = f"{MODEL_DIR}/config.json"
 
+# Lokales Modell - Teil des TTS-Cache-Schlüssels (schreibt WAV-Daten)
+TTS_VOICE_PROFILE = {'voice': 'mai', 'engine': 'tacotron2-DDC', 'audio_format': 'wav'}
+
 synthesizer = None  # Lazy Initialization
 
 def load_model():
@@ -28,6 +31,7 @@ def synthesize_speech(text, output_path):
 import torch
 from TTS.utils.synthesizer import Synthesizer
 from datetime import datetime
+from audio_formats import available_wav_encodings, encode_samples
 
 MODEL_DIR = "backend/models/tts/tts_models-fr-mai-tacotron2-DDC"
 TACOTRON_MODEL_PATH = f"{MODEL_DIR}/model_file.pth"
@@ -49,7 +53,17 @@ def load_model():
         )
         log("✅ Tacotron2-DDC Modell erfolgreich geladen.")
 
-def synthesize_speech(text, output_path):
+# Ausgabeformate: WAV immer, komprimierte Formate, sofern soundfile/libsndfile sie kodieren kann (MP3 bevorzugt)
+SUPPORTED_AUDIO_FORMATS = tuple(sorted(available_wav_encodings(), key=lambda f: f != 'mp3'))
+TTS_VOICE_PROFILE['audio_format'] = SUPPORTED_AUDIO_FORMATS[0]
+
+def synthesize_speech_bytes(text, audio_format=None):
+    """Wie synthesize_speech, liefert die Audiodaten aber im Speicher - bei Bedarf komprimiert."""
     load_model()
     wav = synthesizer.tts(text)
-    synthesizer.save_wav(wav, output_path)
\ No newline at end of file
+    return encode_samples(wav, synthesizer.output_sample_rate, audio_format or SUPPORTED_AUDIO_FORMATS[0])
+
+def synthesize_speech(text, output_path):
+    # Schreibt im Standardformat - bisher landeten hier rohe WAV-Daten unter dem Namen .mp3
+    with open(output_path, 'wb') as f:
+        f.write(synthesize_speech_bytes(text))
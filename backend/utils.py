@@ -4,18 +4,16 @@ import uuid
 import shutil # Hinzugefügt für robustere Verzeichnisbereinigung
 import time   # Hinzugefügt für Zeitstempel in Verzeichnisnamen
 import logging # Hinzugefügt für Logging
+import threading
 
 logger = logging.getLogger(__name__) # Logger initialisieren
 
-# Importiere MAX_HISTORY_LENGTH aus app.py
-# Dies setzt voraus, dass utils.py im selben Verzeichnis oder einem zugänglichen Pfad wie app.py liegt.
-# Eine Alternative wäre, MAX_HISTORY_LENGTH als Parameter an add_to_history zu übergeben.
-try:
-    from app import MAX_HISTORY_LENGTH
-except ImportError:
-    # Fallback, falls der Import fehlschlägt (z.B. bei unabhängigem Testen von utils.py)
-    logger.warning("Konnte MAX_HISTORY_LENGTH nicht aus app.py importieren. Verwende Standardwert.")
-    MAX_HISTORY_LENGTH = 20 # Standardwert
+# Obergrenze der gespeicherten Dialoghistorie pro Session. Bewusst kein `from app import ...`:
+# unter Gunicorn (backend.app:app) würde das app.py ein zweites Mal als Modul 'app' ausführen.
+MAX_HISTORY_LENGTH = int(os.environ.get('MAX_HISTORY_LENGTH', 40))
+
+# Schützt session['history'] gegen gleichzeitiges Umschreiben (Request vs. Hintergrund-Zusammenfassung)
+HISTORY_LOCK = threading.RLock()
 
 def get_user_temp_dir(user_id=None, base_dir=None):
     """
@@ -53,7 +51,7 @@ def get_user_temp_dir(user_id=None, base_dir=None):
     # KEIN timestamp mehr im Return-Wert
     return user_dir_path, user_id
 
-def cleanup_temp_dir(dir_path, exclude_file=None):  # momentan nicht verwendet
+def cleanup_temp_dir(dir_path, exclude_file=None):  # vom AudioJanitor für verwaiste Verzeichnisse genutzt
     """
     Löscht alle Dateien und leere Unterverzeichnisse in einem gegebenen Pfad rekursiv,
     mit Ausnahme einer spezifischen Datei.
@@ -120,34 +118,35 @@ def add_to_history(session, role, content):
     Fügt eine Nachricht zur Historie hinzu und begrenzt deren Länge basierend auf MAX_HISTORY_LENGTH.
     System-Nachrichten am Anfang der Historie werden dabei beibehalten.
     """
-    # Stelle sicher, dass der 'history'-Schlüssel in der Session existiert
-    if 'history' not in session:
-        session['history'] = []
-
-    # Füge die neue Nachricht hinzu
-    session['history'].append({"role": role, "content": content})
-
-    # Ermittle, ob eine System-Nachricht vorhanden ist (und sie sollte die erste sein)
-    system_message = None
-    if session['history'] and session['history'][0]['role'] == 'system':
-        system_message = session['history'][0]
-        # Entferne die System-Nachricht temporär für die Längenbegrenzung des restlichen Dialogs
-        dialog_history = session['history'][1:] 
-    else:
-        dialog_history = session['history']
+    with HISTORY_LOCK:
+        # Stelle sicher, dass der 'history'-Schlüssel in der Session existiert
+        if 'history' not in session:
+            session['history'] = []
+
+        # Füge die neue Nachricht hinzu
+        session['history'].append({"role": role, "content": content})
+
+        # Ermittle, ob eine System-Nachricht vorhanden ist (und sie sollte die erste sein)
+        system_message = None
+        if session['history'] and session['history'][0]['role'] == 'system':
+            system_message = session['history'][0]
+            # Entferne die System-Nachricht temporär für die Längenbegrenzung des restlichen Dialogs
+            dialog_history = session['history'][1:] 
+        else:
+            dialog_history = session['history']
     
-    # Begrenze die Dialoghistorie (ohne System-Nachricht) auf MAX_HISTORY_LENGTH Einträge
-    if len(dialog_history) > MAX_HISTORY_LENGTH:
-        logger.info(f"Historie für Benutzer {session.get('user_id', 'unbekannt')} ist zu lang "
-                    f"({len(dialog_history)} Nachrichten, Limit: {MAX_HISTORY_LENGTH}). "
-                    f"Kürze sie, um die neuesten Interaktionen zu behalten.")
-        # Behalte die letzten MAX_HISTORY_LENGTH Nachrichten der Dialoghistorie
-        dialog_history = dialog_history[-MAX_HISTORY_LENGTH:]
-
-    # Setze die gesamte Historie neu zusammen: System-Nachricht (falls vorhanden) + gekürzte Dialoghistorie
-    if system_message:
-        session['history'] = [system_message] + dialog_history
-    else:
-        session['history'] = dialog_history
+        # Begrenze die Dialoghistorie (ohne System-Nachricht) auf MAX_HISTORY_LENGTH Einträge
+        if len(dialog_history) > MAX_HISTORY_LENGTH:
+            logger.info(f"Historie für Benutzer {session.get('user_id', 'unbekannt')} ist zu lang "
+                        f"({len(dialog_history)} Nachrichten, Limit: {MAX_HISTORY_LENGTH}). "
+                        f"Kürze sie, um die neuesten Interaktionen zu behalten.")
+            # Behalte die letzten MAX_HISTORY_LENGTH Nachrichten der Dialoghistorie
+            dialog_history = dialog_history[-MAX_HISTORY_LENGTH:]
+
+        # Setze die gesamte Historie neu zusammen: System-Nachricht (falls vorhanden) + gekürzte Dialoghistorie
+        if system_message:
+            session['history'] = [system_message] + dialog_history
+        else:
+            session['history'] = dialog_history
 
     logger.debug(f"Aktuelle Historie-Länge nach Hinzufügen und Kürzen: {len(session['history'])}")
@@ -0,0 +1,92 @@
+# backend/vad.py
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rahmenlänge für die Energiemessung
+FRAME_MS = 30
+# Sprache liegt so viele dB über dem Grundrauschen der Aufnahme ...
+VAD_MARGIN_DB = float(os.environ.get('VAD_MARGIN_DB', 12))
+# ... und mindestens über diesem absoluten Pegel (dBFS) - gegen reines Rauschen
+VAD_MIN_DBFS = float(os.environ.get('VAD_MIN_DBFS', -45))
+# Vor und nach erkannter Sprache bleibt so viel Ton erhalten (Wortanfänge/-enden sind leise)
+PADDING_MS = 200
+# Pausen ab dieser Länge trennen Abschnitte, kürzere bleiben im Abschnitt
+SPLIT_PAUSE_MS = int(os.environ.get('VAD_SPLIT_PAUSE_MS', 700))
+# Kürzere Abschnitte sind Klicks/Geräusche, keine Sprache
+MIN_SPEECH_MS = 150
+
+
+class VadResult:
+    """Sprachabschnitte einer Aufnahme (Sample-Indizes) und die übersprungene Stille."""
+
+    def __init__(self, segments, total_samples, sample_rate):
+        self.segments = segments  # [(start, end), ...]
+        self.sample_rate = sample_rate
+        self.total_seconds = total_samples / sample_rate
+        self.speech_seconds = sum(end - start for start, end in segments) / sample_rate
+        self.skipped_seconds = self.total_seconds - self.speech_seconds
+
+    @property
+    def empty(self):
+        return not self.segments
+
+
+def _runs(mask):
+    """Start/Ende (exklusiv) aller zusammenhängenden True-Bereiche."""
+    import numpy as np
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech(pcm, sample_rate=16000):
+    """
+    Energiebasierte Sprachdetektion (vektorisiert, ohne Schleife über Rahmen).
+
+    Die Schwelle passt sich der Aufnahme an: Grundrauschen (10. Perzentil der
+    Rahmenenergie) plus VAD_MARGIN_DB, mindestens VAD_MIN_DBFS. Liegen 10. und
+    90. Perzentil näher als VAD_MARGIN_DB beieinander, gilt nur VAD_MIN_DBFS -
+    sonst läge die Schwelle über fast allen Rahmen und die Aufnahme wäre "leer".
+
+    Args:
+        pcm (bytes): PCM 16 bit mono
+        sample_rate (int): Abtastrate
+
+    Returns:
+        VadResult
+    """
+    import numpy as np
+
+    samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768
+    frame = sample_rate * FRAME_MS // 1000
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return VadResult([], len(samples), sample_rate)
+
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    noise_floor, loud = np.percentile(energy_db, [10, 90])
+    if loud - noise_floor > VAD_MARGIN_DB:
+        threshold = max(noise_floor + VAD_MARGIN_DB, VAD_MIN_DBFS)
+    else:
+        # Kaum Dynamik (Dauergeräusch, stark komprimiertes Mikrofon, Sprache ohne Pausen):
+        # kein Grundrauschen messbar, nur der absolute Pegel entscheidet
+        threshold = VAD_MIN_DBFS
+    speech = energy_db > threshold
+
+    # Polster um jede Sprachstelle: Dilatation per Faltung
+    pad = PADDING_MS // FRAME_MS
+    speech = np.convolve(speech, np.ones(2 * pad + 1), mode='same') > 0
+
+    # Kurze Pausen schließen, lange trennen die Abschnitte
+    starts, ends = _runs(speech)
+    if len(starts) > 1:
+        gaps = (starts[1:] - ends[:-1]) * FRAME_MS
+        keep = np.concatenate(([True], gaps >= SPLIT_PAUSE_MS))
+        starts, ends = starts[keep], np.concatenate((ends[:-1][keep[1:]], ends[-1:]))
+
+    min_frames = MIN_SPEECH_MS // FRAME_MS
+    segments = [(int(s) * frame, min(int(e) * frame, len(samples)))
+                for s, e in zip(starts, ends) if e - s > min_frames + 2 * pad]
+    return VadResult(segments, len(samples), sample_rate)
@@ -1,28 +1,417 @@
-# backend/vosk_stt.py momentan nicht verwendet
+# backend/vosk_stt.py
+import io
 import os
-import wave
 import json
-from vosk import Model, KaldiRecognizer
+import time
+import wave
+import queue
+import shutil
+import threading
+import subprocess
+import logging
+from contextlib import contextmanager
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "stt", "vosk", "vosk-model-small-fr-0.22")
-model = Model(MODEL_PATH)
+from vad import detect_speech
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.environ.get('VOSK_MODEL_PATH') or os.path.join(
+    os.path.dirname(__file__), "models", "stt", "vosk", "vosk-model-small-fr-0.22")
+
+# Das kleine französische Modell ist auf 16 kHz trainiert - alles wird dorthin umgewandelt
+STT_SAMPLE_RATE = 16000
+# Wiederverwendbare Recognizer pro Prozess (gleichzeitige Transkriptionen)
+STT_RECOGNIZER_POOL_SIZE = int(os.environ.get('STT_RECOGNIZER_POOL_SIZE', 2))
+# Wie lange auf einen freien Recognizer gewartet wird
+STT_RECOGNIZER_WAIT_SECONDS = 10
+# 0,25 s PCM pro AcceptWaveform-Aufruf
+CHUNK_BYTES = STT_SAMPLE_RATE // 4 * 2
+# Stille vor der Erkennung abschneiden (vad.py, braucht numpy)
+VAD_ENABLED = os.environ.get('VAD_ENABLED', '1') != '0'
+
+
+class UnsupportedAudioError(ValueError):
+    """Die Aufnahme kann nicht dekodiert werden (Format unbekannt oder kein Decoder installiert)."""
+
+
+class NoSpeechError(ValueError):
+    """Die Aufnahme enthält keine Sprache (nur Stille/Rauschen) - sie geht gar nicht erst an den Recognizer."""
+
+    def __init__(self, message, audio_seconds=0.0):
+        super().__init__(message)
+        self.audio_seconds = audio_seconds
+
+
+# === Modell (einmal pro Prozess; mit `gunicorn --preload` geladen im Master, per Copy-on-Write geteilt) ===
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from vosk import Model, SetLogLevel
+                SetLogLevel(-1)
+                started = time.monotonic()
+                _model = Model(MODEL_PATH)
+                logger.info(f"Vosk-Modell geladen in {time.monotonic() - started:.1f}s: {MODEL_PATH}")
+    return _model
+
+
+def preload():
+    """Lädt das Modell beim Import der App statt beim ersten Request. Returns: True bei Erfolg"""
+    try:
+        get_model()
+        if not compressed_decoder_available():
+            # Browser nehmen WebM/Opus bzw. MP4/AAC auf - ohne Decoder scheitert jede Aufnahme
+            logger.error("Weder PyAV (av) noch ffmpeg installiert - nur WAV-Aufnahmen sind transkribierbar")
+        return True
+    except ImportError as e:
+        logger.error(f"Paket 'vosk' fehlt - serverseitige Transkription (/api/transcribe, /ws/stt) deaktiviert: {e}")
+    except Exception as e:
+        logger.error(f"Vosk-Modell unter {MODEL_PATH} nicht ladbar (VOSK_MODEL_PATH) - "
+                     f"serverseitige Transkription deaktiviert: {e}")
+    return False
+
+
+class RecognizerPool:
+    """
+    Pool wiederverwendbarer KaldiRecognizer: das Anlegen kostet bei jedem Request
+    spürbar Zeit, ein Reset() nach der Nutzung dagegen fast nichts.
+    """
+
+    def __init__(self, size=STT_RECOGNIZER_POOL_SIZE, sample_rate=STT_SAMPLE_RATE):
+        self.size = size
+        self.sample_rate = sample_rate
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def _create(self):
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(get_model(), self.sample_rate)
+        recognizer.SetWords(True)
+        return recognizer
+
+    @contextmanager
+    def acquire(self, timeout=STT_RECOGNIZER_WAIT_SECONDS):
+        try:
+            recognizer = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+                else:
+                    self.waits += 1
+            if create:
+                try:
+                    recognizer = self._create()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    recognizer = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError("Kein freier Spracherkenner verfügbar")
+        try:
+            yield recognizer
+        finally:
+            try:
+                # Reset() verwirft auch eine abgebrochene Äußerung (Client weg, Fehler) - danach wieder wie neu
+                recognizer.Reset()
+            except Exception as e:
+                logger.warning(f"Spracherkenner nach Fehler verworfen: {e}")
+                with self._lock:
+                    self._created -= 1
+            else:
+                self._idle.put(recognizer)
+
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'created': self._created, 'idle': self._idle.qsize(), 'waits': self.waits}
+
+
+recognizer_pool = RecognizerPool()
+
+
+# === Dekodieren: beliebige Aufnahme -> PCM 16 bit mono 16 kHz (im Speicher) ===
+
+def _pcm_from_wav(data):
+    with wave.open(io.BytesIO(data), 'rb') as wav_file:
+        channels = wav_file.getnchannels()
+        width = wav_file.getsampwidth()
+        rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+    if channels == 1 and width == 2 and rate == STT_SAMPLE_RATE:
+        return frames
+
+    import numpy as np
+    from audio_formats import resample
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise UnsupportedAudioError(f"WAV mit {width * 8} bit wird nicht unterstützt")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != STT_SAMPLE_RATE:
+        samples = resample(samples, rate, STT_SAMPLE_RATE)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+def _pcm_with_pyav(data):
+    import av
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=STT_SAMPLE_RATE)
+    pcm = bytearray()
+    with av.open(io.BytesIO(data)) as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                pcm += resampled.to_ndarray().tobytes()
+    for resampled in resampler.resample(None):  # Resampler leeren
+        pcm += resampled.to_ndarray().tobytes()
+    return bytes(pcm)
+
+
+def _pcm_with_ffmpeg(data):
+    # Über Pipes statt temporärer Dateien - die Aufnahme bleibt im Speicher
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+         '-f', 's16le', '-ac', '1', '-ar', str(STT_SAMPLE_RATE), 'pipe:1'],
+        input=data, capture_output=True, timeout=30)
+    if result.returncode != 0:
+        raise UnsupportedAudioError(f"ffmpeg: {result.stderr.decode('utf-8', 'replace').strip()[:200]}")
+    return result.stdout
+
+
+def compressed_decoder_available():
+    """PyAV oder ffmpeg vorhanden (für alles außer WAV nötig)."""
+    try:
+        import av  # noqa: F401
+        return True
+    except ImportError:
+        return shutil.which('ffmpeg') is not None
 
-def transcribe_audio(audio_path):
-    wf = wave.open(audio_path, "rb")
-    if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() not in [8000, 16000, 44100]:
-        raise ValueError("Audio must be WAV format mono PCM")
 
-    rec = KaldiRecognizer(model, wf.getframerate())
-    rec.SetWords(True)
+def decode_audio(data):
+    """
+    Wandelt eine Aufnahme (WAV, WebM/Opus, MP4/AAC, Ogg ...) in PCM 16 bit mono 16 kHz um.
+    WAV geht immer; alles andere braucht PyAV (bevorzugt) oder ein ffmpeg im PATH.
+
+    Raises:
+        UnsupportedAudioError
+    """
+    if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+        return _pcm_from_wav(data)
+    try:
+        return _pcm_with_pyav(data)
+    except ImportError:
+        pass
+    except Exception as e:
+        raise UnsupportedAudioError(f"Aufnahme nicht dekodierbar: {e}")
+    if shutil.which('ffmpeg'):
+        return _pcm_with_ffmpeg(data)
+    raise UnsupportedAudioError("Kein Decoder für komprimierte Aufnahmen installiert (PyAV oder ffmpeg)")
+
+
+# === Transkription ===
+
+_stats_lock = threading.Lock()
+_stats = {'transcriptions': 0, 'failed': 0, 'no_speech': 0, 'audio_seconds': 0.0, 'processing_seconds': 0.0,
+          'skipped_seconds': 0.0, 'last_latency': None, 'max_latency': 0.0}
+
+
+def transcribe_pcm(pcm, segments=None):
+    """
+    Erkennt Text in PCM 16 bit mono 16 kHz.
+
+    Args:
+        segments (list): Sprachabschnitte [(start, end), ...] in Samples; None = alles.
+            Jeder Abschnitt wird als eigene Äußerung abgeschlossen.
+    """
     results = []
+    with recognizer_pool.acquire() as recognizer:
+        for start, end in segments if segments is not None else [(0, len(pcm) // 2)]:
+            segment = pcm[start * 2:end * 2]
+            for offset in range(0, len(segment), CHUNK_BYTES):
+                if recognizer.AcceptWaveform(segment[offset:offset + CHUNK_BYTES]):
+                    results.append(json.loads(recognizer.Result()).get("text", ""))
+            results.append(json.loads(recognizer.FinalResult()).get("text", ""))
+    return " ".join(r for r in results if r).strip()
+
+
+# Einmal gesetzt, wenn numpy fehlt - dann nur einmal warnen
+_vad_unavailable = False
+
+
+def _speech_segments(pcm):
+    """Sprachabschnitte per VAD oder None (VAD aus oder numpy fehlt)."""
+    global _vad_unavailable
+    if not VAD_ENABLED or _vad_unavailable:
+        return None, 0.0
+    try:
+        vad = detect_speech(pcm, STT_SAMPLE_RATE)
+    except ImportError as e:
+        _vad_unavailable = True
+        logger.warning(f"VAD deaktiviert (numpy fehlt) - Aufnahmen gehen ungekürzt an Vosk: {e}")
+        return None, 0.0
+    if vad.empty:
+        raise NoSpeechError(f"Keine Sprache in {vad.total_seconds:.1f}s Audio", vad.total_seconds)
+    return vad.segments, vad.skipped_seconds
+
+
+def transcribe_bytes(data):
+    """
+    Dekodiert und transkribiert eine Aufnahme aus dem Speicher; misst die Latenz.
+    Stille am Anfang, am Ende und in langen Pausen wird vorher abgeschnitten.
+
+    Returns:
+        str: erkannter Text (leer, wenn nichts erkannt wurde)
+
+    Raises:
+        UnsupportedAudioError, NoSpeechError
+    """
+    return transcribe_bytes_detailed(data)['text']
+
+
+def transcribe_bytes_detailed(data):
+    """
+    Wie transcribe_bytes, liefert zusätzlich die Kennzahlen der Aufnahme.
+
+    Returns:
+        dict: {'text', 'audio_seconds', 'skipped_seconds', 'processing_seconds'}
+    """
+    started = time.monotonic()
+    skipped = 0.0
+    try:
+        pcm = decode_audio(data)
+        segments, skipped = _speech_segments(pcm)
+        text = transcribe_pcm(pcm, segments)
+    except NoSpeechError:
+        with _stats_lock:
+            _stats['no_speech'] += 1
+            _stats['audio_seconds'] += len(pcm) / 2 / STT_SAMPLE_RATE
+            _stats['skipped_seconds'] += len(pcm) / 2 / STT_SAMPLE_RATE
+        raise
+    except Exception:
+        with _stats_lock:
+            _stats['failed'] += 1
+        raise
+    latency = time.monotonic() - started
+    with _stats_lock:
+        _stats['transcriptions'] += 1
+        _stats['audio_seconds'] += len(pcm) / 2 / STT_SAMPLE_RATE
+        _stats['skipped_seconds'] += skipped
+        _stats['processing_seconds'] += latency
+        _stats['last_latency'] = round(latency, 3)
+        _stats['max_latency'] = round(max(_stats['max_latency'], latency), 3)
+    if skipped:
+        logger.info(f"VAD: {skipped:.1f}s Stille übersprungen")
+    return {'text': text, 'audio_seconds': len(pcm) / 2 / STT_SAMPLE_RATE,
+            'skipped_seconds': skipped, 'processing_seconds': latency}
+
+
+def transcribe_audio(audio_path):
+    """Transkribiert eine Audiodatei (beliebiges unterstütztes Format)."""
+    with open(audio_path, 'rb') as f:
+        return transcribe_bytes(f.read())
+
+
+# === Streaming: Audio kommt während der Aufnahme in Stücken (WebSocket) ===
+
+# Obergrenze pro Äußerung - danach wird der Stream beendet
+STT_STREAM_MAX_SECONDS = int(os.environ.get('STT_STREAM_MAX_SECONDS', 60))
+
+_stream_stats = {'streams': 0, 'completed': 0, 'partials': 0, 'audio_seconds': 0.0,
+                 'last_final_latency': None, 'avg_final_latency': None}
+
+
+class StreamingRecognition:
+    """
+    Inkrementelle Erkennung einer Äußerung: PCM-Stücke gehen sofort an
+    AcceptWaveform, Zwischenergebnisse werden zurückgemeldet. Beim Stopp bleibt
+    nur der Rest im Recognizer - der Text steht praktisch sofort fest.
+    """
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.segments = []      # abgeschlossene Teilsätze
+        self.last_partial = ''
+        self.audio_bytes = 0
+        with _stats_lock:
+            _stream_stats['streams'] += 1
+
+    def _text(self, partial=''):
+        return " ".join(t for t in self.segments + [partial] if t).strip()
+
+    def accept(self, pcm):
+        """
+        Nimmt ein PCM-Stück (16 bit mono 16 kHz) an.
+
+        Returns:
+            str oder None: Neuer Zwischenstand (bisheriger Text + laufender Teil), wenn er sich geändert hat
+        """
+        self.audio_bytes += len(pcm)
+        if self.recognizer.AcceptWaveform(pcm):
+            self.segments.append(json.loads(self.recognizer.Result()).get("text", ""))
+            partial = ''
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        text = self._text(partial)
+        if text == self.last_partial:
+            return None
+        self.last_partial = text
+        with _stats_lock:
+            _stream_stats['partials'] += 1
+        return text
+
+    def exceeded(self):
+        return self.audio_bytes > STT_STREAM_MAX_SECONDS * STT_SAMPLE_RATE * 2
+
+    def finish(self):
+        """Endgültiger Text; misst die Zeit vom Stopp bis zum Ergebnis."""
+        started = time.monotonic()
+        self.segments.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        latency = time.monotonic() - started
+        with _stats_lock:
+            _stream_stats['completed'] += 1
+            _stream_stats['audio_seconds'] = round(_stream_stats['audio_seconds'] + self.audio_bytes / 2 / STT_SAMPLE_RATE, 1)
+            _stream_stats['last_final_latency'] = round(latency, 3)
+            previous = _stream_stats['avg_final_latency']
+            _stream_stats['avg_final_latency'] = round(latency if previous is None else 0.9 * previous + 0.1 * latency, 3)
+        return self._text()
+
+
+@contextmanager
+def streaming_recognition():
+    """Hält einen Recognizer aus dem Pool für die Dauer einer gestreamten Äußerung."""
+    with recognizer_pool.acquire() as recognizer:
+        yield StreamingRecognition(recognizer)
 
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            result = json.loads(rec.Result())
-            results.append(result.get("text", ""))
-    results.append(json.loads(rec.FinalResult()).get("text", ""))
 
-    return " ".join(results).strip()
+def stt_stats():
+    """Kennzahlen für /health: Latenz pro Aufnahme und Echtzeitfaktor (Rechenzeit / Audiodauer)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    count = stats['transcriptions']
+    stats['avg_latency'] = round(stats['processing_seconds'] / count, 3) if count else None
+    stats['real_time_factor'] = round(stats['processing_seconds'] / stats['audio_seconds'], 3) \
+        if stats['audio_seconds'] else None
+    stats['skipped_ratio'] = round(stats['skipped_seconds'] / stats['audio_seconds'], 3) \
+        if stats['audio_seconds'] else None
+    stats['audio_seconds'] = round(stats['audio_seconds'], 1)
+    stats['processing_seconds'] = round(stats['processing_seconds'], 1)
+    stats['skipped_seconds'] = round(stats['skipped_seconds'], 1)
+    stats['model_loaded'] = _model is not None
+    stats['recognizers'] = recognizer_pool.stats()
+    with _stats_lock:
+        stats['streaming'] = dict(_stream_stats)
+    return stats
@@ -45,6 +45,24 @@ document.addEventListener('DOMContentLoaded', function() {
   let userId = Date.now().toString(); // Initialisierung der userId
   let currentScenario = 'libre';
   let autoSendAfterRecording = false; // Konfig automatisches Senden der UserAufnahme
+  const responseAudioMode = 'stream'; // Konfig für /api/respond: 'stream' (satzweise), 'async' (Text sofort, Audio-Job) oder 'file'
+  const llmStreamingEnabled = true; // Konfig: /api/respond_stream (SSE) - Tokens und Audio pro Satz
+  const showTextWhileStreaming = false; // Konfig: Text live mitlesen statt "erst hören, dann lesen"
+  const serverSttStreaming = true; // Konfig: Spracherkennung auf dem Server per WebSocket (Teilergebnisse während der Aufnahme)
+  const preferServerStt = false; // Konfig: Server-Erkennung auch dann, wenn der Browser SpeechRecognition kann
+  let sttSocket = null;
+  let sttAudioContext = null;
+  let sttProcessor = null;
+  let sttFinalResolver = null;
+  // Abspielbare Audioformate - der Server wählt daraus das kompakteste (Opus vor MP3)
+  const supportedAudioFormats = (() => {
+    const probe = document.createElement('audio');
+    const formats = [];
+    if (probe.canPlayType('audio/ogg; codecs="opus"')) formats.push('opus');
+    if (probe.canPlayType('audio/ogg; codecs="vorbis"')) formats.push('vorbis');
+    formats.push('mp3');
+    return formats;
+  })();
   let isRecording = false; // Status-Tracker
   let isPaused = false; // Neuer Status für Pause
   let isPlaybackInProgress = false; // Um Audio-Wiedergabestatus zu verfolgen
@@ -525,7 +543,7 @@ function updateShowResponseButton() {
       
       try {
         const permissionsOk = await checkMicrophonePermissions();
-        if (!permissionsOk || !recognition) {
+        if (!permissionsOk || (!recognition && !serverSttStreaming)) {
           showStatus(elements.recordingStatus, '⚠️ Microphone ou reconnaissance vocale non disponibles', 'error');
           return;
         }
@@ -617,6 +635,16 @@ function updateShowResponseButton() {
                 
                 if (uploadResult && uploadResult.audio_path) {
                   showStatus(elements.recordingStatus, '✅ Audio enregistré', 'success');
+
+                  // Ohne SpeechRecognition im Browser: serverseitige Transkription (Vosk) übernehmen
+                  if (!recognition && !finalTranscript.trim() && uploadResult.transcription_ok && uploadResult.transcription) {
+                    finalTranscript = uploadResult.transcription;
+                    if (elements.userText) {
+                      elements.userText.textContent = finalTranscript;
+                      elements.userText.classList.remove('placeholder');
+                      elements.userText.setAttribute('data-is-placeholder', 'false');
+                    }
+                  }
                   
                   if (elements.userAudio) {
                     elements.userAudio.src = uploadResult.audio_path;
@@ -658,9 +686,15 @@ function updateShowResponseButton() {
         console.log('Starting MediaRecorder...');
         mediaRecorder.start(250);
         
-        // Start speech recognition
+        // Start speech recognition: Server-Stream (WebSocket) oder SpeechRecognition des Browsers
         isRecognitionRestarting = false;
-        startRecognition();
+        const serverSttStarted = useServerStt() && await startServerStt(currentAudioStream);
+        if (!serverSttStarted) {
+          if (!recognition) {
+            throw new Error('Reconnaissance vocale non disponible');
+          }
+          startRecognition();
+        }
         
         // Update UI
         updateRecordButton();
@@ -708,7 +742,107 @@ function hasAudioContent(audioBlob) {
   });
 }
     
-  function stopRealTimeSpeech() {
+  // === Gestreamte Spracherkennung (WebSocket /ws/stt) ===
+  function useServerStt() {
+    return serverSttStreaming && (preferServerStt || !recognition);
+  }
+
+  // Float32 (Rate des AudioContext) -> PCM 16 bit mit 16 kHz, wie es das Vosk-Modell erwartet
+  function downsampleToInt16(samples, inputRate, outputRate = 16000) {
+    const ratio = inputRate / outputRate;
+    const output = new Int16Array(Math.floor(samples.length / ratio));
+    for (let i = 0; i < output.length; i++) {
+      const start = Math.floor(i * ratio);
+      const end = Math.min(Math.floor((i + 1) * ratio), samples.length);
+      let sum = 0;
+      for (let j = start; j < end; j++) sum += samples[j];
+      const value = Math.max(-1, Math.min(1, sum / Math.max(end - start, 1)));
+      output[i] = value < 0 ? value * 0x8000 : value * 0x7fff;
+    }
+    return output.buffer;
+  }
+
+  function showLiveTranscript(text) {
+    if (!elements.userText) return;
+    elements.userText.textContent = text;
+    elements.userText.classList.remove('placeholder');
+    elements.userText.dataset.isPlaceholder = 'false';
+  }
+
+  function startServerStt(stream) {
+    return new Promise((resolve) => {
+      const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+      try {
+        sttSocket = new WebSocket(`${protocol}//${window.location.host}/ws/stt?userId=${encodeURIComponent(userId)}`);
+      } catch (e) {
+        console.warn('STT-WebSocket nicht verfügbar:', e);
+        resolve(false);
+        return;
+      }
+      sttSocket.binaryType = 'arraybuffer';
+
+      sttSocket.onopen = () => {
+        sttAudioContext = new (window.AudioContext || window.webkitAudioContext)();
+        const source = sttAudioContext.createMediaStreamSource(stream);
+        // ScriptProcessor statt AudioWorklet: überall verfügbar, ohne separates Modul
+        sttProcessor = sttAudioContext.createScriptProcessor(4096, 1, 1);
+        sttProcessor.onaudioprocess = (event) => {
+          if (isPaused || !sttSocket || sttSocket.readyState !== WebSocket.OPEN) return;
+          sttSocket.send(downsampleToInt16(event.inputBuffer.getChannelData(0), sttAudioContext.sampleRate));
+        };
+        source.connect(sttProcessor);
+        sttProcessor.connect(sttAudioContext.destination);
+        console.log('STT-Stream gestartet');
+        resolve(true);
+      };
+
+      sttSocket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'partial') {
+          finalTranscript = message.text;
+          showLiveTranscript(message.text);
+        } else if (message.type === 'final') {
+          finalTranscript = message.text;
+          if (sttFinalResolver) sttFinalResolver(message.text);
+        } else if (message.type === 'error') {
+          console.error('STT-Stream Fehler:', message.error);
+        }
+      };
+
+      sttSocket.onerror = () => resolve(false);
+      sttSocket.onclose = () => {
+        if (sttFinalResolver) sttFinalResolver(finalTranscript);
+        sttSocket = null;
+      };
+    });
+  }
+
+  // Beendet die Aufnahme-Verarbeitung und wartet auf den endgültigen Text (höchstens timeoutMs)
+  function stopServerStt(timeoutMs = 5000) {
+    if (sttProcessor) {
+      sttProcessor.disconnect();
+      sttProcessor = null;
+    }
+    if (sttAudioContext) {
+      sttAudioContext.close();
+      sttAudioContext = null;
+    }
+    if (!sttSocket || sttSocket.readyState !== WebSocket.OPEN) {
+      return Promise.resolve(finalTranscript);
+    }
+    return new Promise((resolve) => {
+      const timer = setTimeout(() => sttFinalResolver && sttFinalResolver(finalTranscript), timeoutMs);
+      sttFinalResolver = (text) => {
+        clearTimeout(timer);
+        sttFinalResolver = null;
+        if (sttSocket) sttSocket.close();
+        resolve(text);
+      };
+      sttSocket.send(JSON.stringify({ event: 'stop' }));
+    });
+  }
+
+  async function stopRealTimeSpeech() {
     console.log('Stopping real-time speech...');
     
     // Set recording state
@@ -736,6 +870,12 @@ function hasAudioContent(audioBlob) {
       }
     }
     
+    // Gestreamte Erkennung: der Server hat fast alles schon erkannt, nur der Rest fehlt noch
+    if (sttSocket) {
+      showStatus(elements.recordingStatus, '🔍 Transcription...', 'loading');
+      finalTranscript = await stopServerStt();
+    }
+
     // Clean up audio stream
     cleanupAudioStream();
     resetRecordButton();
@@ -795,6 +935,140 @@ function hasAudioContent(audioBlob) {
       }
     }
 
+// === SSE-Streaming: Tokens sofort, Audio Satz für Satz ===
+async function sendMessageStreaming(message) {
+    showProgressStatus(1, '🚀 Message en cours d\'envoi...');
+    elements.sendBtn?.setAttribute('disabled', 'true');
+    elements.recordBtn?.setAttribute('disabled', 'true');
+    elements.stopBtn?.setAttribute('disabled', 'true');
+    elements.showResponseBtn?.classList.add('hidden');
+
+    const audioQueue = [];
+    let streamedText = '';
+    let isPlayingPart = false;
+
+    // Satz-Audios nacheinander abspielen
+    const playNextPart = () => {
+        if (isPlayingPart || audioQueue.length === 0 || !elements.audioPlayback) return;
+        isPlayingPart = true;
+        elements.audioPlayback.oncanplaythrough = null;
+        elements.audioPlayback.onerror = () => { isPlayingPart = false; playNextPart(); };
+        elements.audioPlayback.onended = () => {
+            isPlayingPart = false;
+            if (audioQueue.length === 0 && currentResponse) {
+                audioHasBeenPlayed = true;
+                updateShowResponseButton();
+            }
+            playNextPart();
+        };
+        elements.audioPlayback.src = audioQueue.shift();
+        elements.audioPlayback.classList.remove('hidden');
+        elements.audioPlayback.play().catch((e) => {
+            console.warn('⚠️ Autoplay für Satz-Audio blockiert:', e);
+            isPlayingPart = false;
+        });
+    };
+
+    const handleEvent = (event, data) => {
+        if (event === 'token') {
+            streamedText += data.text;
+            if (showTextWhileStreaming && elements.responseText) {
+                elements.responseText.textContent = streamedText;
+                elements.responseText.classList.remove('hidden');
+                isTextCurrentlyVisible = true;
+            }
+        } else if (event === 'audio') {
+            if (!showTextWhileStreaming && audioQueue.length === 0 && !isPlayingPart) {
+                showProgressStatus(3, '🔊 Lecture en cours...');
+            }
+            audioQueue.push(data.url);
+            playNextPart();
+        } else if (event === 'done') {
+            conversationHistory.push(
+                { role: 'user', content: message },
+                { role: 'assistant', content: data.response }
+            );
+            currentResponse = data.response;
+            if (showTextWhileStreaming) {
+                showResponseText();
+            }
+            updateShowResponseButton();
+        }
+    };
+
+    try {
+        const response = await fetch('/api/respond_stream', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                message: message,
+                userId: userId,
+                scenario: currentScenario,
+                audio_formats: supportedAudioFormats
+            }),
+        });
+
+        if (!response.ok || !response.body) {
+            const errorText = await extractErrorMessage(response);
+            throw new Error(`HTTP error! status: ${response.status} - ${errorText}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, separator);
+                buffer = buffer.slice(separator + 2);
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                }
+                if (data) handleEvent(event, JSON.parse(data));
+            }
+        }
+        if (!currentResponse) {
+            currentResponse = streamedText;
+        }
+        if (!showTextWhileStreaming && audioQueue.length === 0 && !isPlayingPart && !audioHasBeenPlayed) {
+            showProgressStatus(4, '⚠️ Audio non disponible. Texte affichable manuellement.');
+            updateShowResponseButton();
+        }
+    } catch (error) {
+        console.error('❌ Streaming fehlgeschlagen:', error);
+        throw error;
+    } finally {
+        elements.sendBtn?.setAttribute('disabled', 'false');
+        elements.recordBtn?.setAttribute('disabled', 'false');
+        elements.stopBtn?.setAttribute('disabled', 'false');
+        hideStatus(elements.recordingStatus);
+    }
+}
+
+// Wartet per Long-Poll auf einen TTS-Job; liefert die Audio-URL oder null
+async function waitForAudioJob(jobId, maxWaitMs = 60000) {
+    const deadline = Date.now() + maxWaitMs;
+    while (Date.now() < deadline) {
+        try {
+            const response = await fetch(`/api/audio_jobs/${encodeURIComponent(jobId)}?userId=${encodeURIComponent(userId)}&wait=15`);
+            if (!response.ok) return null;
+            const job = await response.json();
+            if (job.status === 'ready') return job.audio_url;
+            if (job.status === 'failed') return null;
+        } catch (e) {
+            console.warn('⚠️ Status des Audio-Jobs nicht abrufbar:', e);
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+    return null;
+}
+
 // Korrigierte sendMessageToBackend() 
 async function sendMessageToBackend(message) {
     console.log('📤 Sending message:', message);
@@ -803,6 +1077,19 @@ async function sendMessageToBackend(message) {
         showStatus(elements.recordingStatus, 'Veuillez entrer un message.', 'warning');
         return;
     }
+
+    if (llmStreamingEnabled && window.ReadableStream) {
+        currentResponse = null;
+        audioHasBeenPlayed = false;
+        try {
+            await sendMessageStreaming(message);
+            return;
+        } catch (e) {
+            // Nur ohne bereits gestreamte Antwort auf den klassischen Weg zurückfallen
+            if (currentResponse) return;
+            console.warn('⚠️ Fallback auf /api/respond:', e);
+        }
+    }
     
     showProgressStatus(1, '🚀 Message en cours d\'envoi...');
     elements.sendBtn?.setAttribute('disabled', 'true');
@@ -821,7 +1108,9 @@ async function sendMessageToBackend(message) {
             body: JSON.stringify({
                 message: message,
                 userId: userId, 
-                scenario: currentScenario
+                scenario: currentScenario,
+                audio_mode: responseAudioMode,
+                audio_formats: supportedAudioFormats
             }),
         });
 
@@ -843,6 +1132,12 @@ async function sendMessageToBackend(message) {
         // KRITISCH: Verwende setResponseSafely() statt showResponseText()
         setResponseSafely(data.response); // Setzt currentResponse und zeigt Hinweis an
 
+        // Asynchroner TTS-Job: Text ist schon da, auf das Audio warten (Long-Poll)
+        if (data.audio_job_id && !data.audio_url) {
+            showProgressStatus(2, '🎧 Audio en préparation...');
+            data.audio_url = await waitForAudioJob(data.audio_job_id);
+        }
+
         if (data.audio_url) {
             elements.audioPlayback?.setAttribute('src', data.audio_url);
             elements.audioPlayback?.load();
@@ -1067,7 +1362,8 @@ elements.startBtn?.addEventListener('click', async () => {
                 body: JSON.stringify({ 
                     scenario: scenario,
                     userId: currentUserId, // KORREKTUR: Verwende currentUserId
-                    force_reset: forceReset
+                    force_reset: forceReset,
+                    audio_formats: supportedAudioFormats
                 })
             });
 
@@ -0,0 +1,42 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# Die Backend-Module importieren sich gegenseitig flach (wie unter gunicorn --chdir backend)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+# app.py ohne Hintergrund-Generierung und Vosk-Modell importieren
+os.environ.setdefault('OPENING_POOL_ENABLED', '0')
+os.environ.setdefault('STT_ENABLED', '0')
+
+import deadline  # noqa: E402
+import resilience  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_request_context():
+    """Deadline und Retry-Budget gelten pro Test, wie im Server pro Request."""
+    deadline_token = deadline._current_deadline.set(deadline._NO_DEADLINE)
+    budget_token = resilience._current_budget.set(None)
+    yield
+    deadline._current_deadline.reset(deadline_token)
+    resilience._current_budget.reset(budget_token)
+
+
+@pytest.fixture
+def flask_app(tmp_path, monkeypatch):
+    """backend/app.py mit temp_audio, Audio-Speicher, Janitor und Sessions unter tmp_path, ohne TTS-Cache."""
+    import app
+    from audio_janitor import AudioJanitor
+    from audio_store import AudioBlobStore
+    from session_store import SessionStore
+
+    root = tmp_path / 'temp_audio'
+    root.mkdir()
+    monkeypatch.setattr(app, 'TEMP_AUDIO_DIR_ROOT', str(root))
+    monkeypatch.setattr(app, 'audio_blob_store', AudioBlobStore(str(root / 'spill')))
+    monkeypatch.setattr(app, 'user_sessions', SessionStore())
+    monkeypatch.setattr(app, 'tts_audio_cache', None)
+    monkeypatch.setattr(app, 'audio_janitor', AudioJanitor(str(root), interval=3600))
+    return app
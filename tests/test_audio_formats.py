@@ -0,0 +1,40 @@
+# tests/test_audio_formats.py
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_formats import (negotiate_audio_formats, choose_audio_format, audio_extension, encode_samples,
+                           resample)
+
+
+def test_negotiation_follows_server_order_and_ends_with_mp3():
+    assert negotiate_audio_formats(['MP3', 'opus'], ['opus', 'vorbis', 'mp3']) == ['opus', 'mp3']
+    assert negotiate_audio_formats(['vorbis', 'flac'], ['opus', 'vorbis']) == ['vorbis', 'mp3']
+    assert negotiate_audio_formats(None, ['opus', 'mp3']) == ['mp3']
+
+
+def test_provider_picks_first_supported_preference():
+    polly = ('mp3', 'vorbis')
+    assert choose_audio_format(polly, ['opus', 'vorbis', 'mp3']) == 'vorbis'
+    assert choose_audio_format(polly, ['opus']) == 'mp3'  # Standard des Providers
+    assert choose_audio_format(polly) == 'mp3'
+
+
+def test_extension_per_format():
+    assert [audio_extension(f) for f in ('opus', 'vorbis', 'mp3', 'wav', 'unbekannt')] == \
+        ['ogg', 'ogg', 'mp3', 'wav', 'mp3']
+
+
+def test_encode_wav():
+    samples = np.sin(np.linspace(0, 100, 2205)).astype(np.float32)
+    with wave.open(io.BytesIO(encode_samples(samples, 22050, 'wav'))) as wav_file:
+        assert (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getnframes()) == (22050, 1, 2205)
+    with pytest.raises(ValueError):
+        encode_samples(samples, 22050, 'flac')
+
+
+def test_resample_keeps_duration():
+    resampled = resample(np.zeros(22050, dtype=np.float32), 22050, 24000)
+    assert len(resampled) == 24000 and resampled.dtype == np.float32
@@ -0,0 +1,105 @@
+# tests/test_audio_janitor.py
+import io
+import os
+import time
+
+from audio_janitor import AudioJanitor, enforce_user_limits
+from tts_pipeline import STREAM_TTL_SECONDS
+from tts_jobs import JOB_TTL_SECONDS
+
+
+def test_user_limits_keep_newest_replies_and_recordings(tmp_path):
+    now = time.time()
+    for i in range(4):
+        for name in (f"llm_{i}.ogg", f"user_recording_{i}.webm"):
+            (tmp_path / name).write_bytes(b'')
+            os.utime(tmp_path / name, (now - 100 + i, now - 100 + i))
+    (tmp_path / 'llm_9.pending').write_bytes(b'')  # laufender Job - zählt nicht als Antwort
+    os.utime(tmp_path / 'llm_9.pending', (now - 200, now - 200))
+
+    deleted = enforce_user_limits(str(tmp_path))
+    assert sorted(deleted) == ['llm_0.ogg', 'llm_1.ogg', 'user_recording_0.webm', 'user_recording_1.webm']
+    assert (tmp_path / 'llm_9.pending').exists()
+
+
+def test_sentence_parts_and_markers_expire_after_ttl(tmp_path):
+    now = time.time()
+    ages = {'llm_part_1_0.mp3': STREAM_TTL_SECONDS + 10, 'llm_part_2_0.mp3': 0,
+            'llm_3.failed': JOB_TTL_SECONDS + 10, 'llm_4.failed': 0}
+    for name, age in ages.items():
+        (tmp_path / name).write_bytes(b'')
+        os.utime(tmp_path / name, (now - age, now - age))
+
+    assert sorted(enforce_user_limits(str(tmp_path))) == ['llm_3.failed', 'llm_part_1_0.mp3']
+    assert enforce_user_limits(str(tmp_path / 'fehlt')) == []
+
+
+def test_sweep_removes_orphaned_dirs_and_enforces_budget(tmp_path):
+    now = time.time()
+    (tmp_path / 'user_alt').mkdir()
+    (tmp_path / 'user_aktiv').mkdir()
+    ages = {'user_alt/llm_1.mp3': 7200, 'user_aktiv/llm_old.mp3': 30,
+            'user_aktiv/llm_2.pending': 20,  # wird nie verdrängt
+            'user_aktiv/llm_new.mp3': 10}
+    for name, age in ages.items():
+        (tmp_path / name).write_bytes(b'x' * 60)
+        os.utime(tmp_path / name, (now - age, now - age))
+
+    janitor = AudioJanitor(str(tmp_path), max_bytes=150, max_dir_age=3600)
+    janitor.sweep()
+    assert not (tmp_path / 'user_alt').exists()
+    assert sorted(os.listdir(tmp_path / 'user_aktiv')) == ['llm_2.pending', 'llm_new.mp3']
+    stats = janitor.stats()
+    assert stats['dirs_expired'] == 1 and stats['bytes_evicted'] == 60 and stats['disk_usage_bytes'] == 120
+
+
+def test_request_cleanup_runs_in_background(tmp_path):
+    user_dir = tmp_path / 'user_1'
+    user_dir.mkdir()
+    now = time.time()
+    for i in range(3):
+        (user_dir / f"llm_{i}.mp3").write_bytes(b'')
+        os.utime(user_dir / f"llm_{i}.mp3", (now - 10 + i, now - 10 + i))
+
+    janitor = AudioJanitor(str(tmp_path), interval=3600)
+    janitor.request_cleanup(str(user_dir))
+    end = time.monotonic() + 5
+    while janitor.stats()['user_cleanups'] == 0 and time.monotonic() < end:
+        time.sleep(0.01)
+    assert sorted(os.listdir(user_dir)) == ['llm_1.mp3', 'llm_2.mp3']
+
+
+def test_part_files_are_not_counted_as_replies(tmp_path):
+    now = time.time()
+    ages = {'llm_1.mp3': 30, 'llm_2.mp3': 20,
+            'llm_3.mp3.part': 10,  # Job schreibt gerade
+            'llm_0.mp3.part': JOB_TTL_SECONDS + 10}  # abgebrochener Schreibvorgang
+    for name, age in ages.items():
+        (tmp_path / name).write_bytes(b'')
+        os.utime(tmp_path / name, (now - age, now - age))
+
+    assert enforce_user_limits(str(tmp_path)) == ['llm_0.mp3.part']
+    assert sorted(os.listdir(tmp_path)) == ['llm_1.mp3', 'llm_2.mp3', 'llm_3.mp3.part']
+
+
+def test_any_request_starts_the_sweep_and_transcribe_schedules_cleanup(flask_app):
+    user_dir = os.path.join(flask_app.TEMP_AUDIO_DIR_ROOT, 'user_1')
+    os.makedirs(user_dir)
+    now = time.time()
+    for i in range(3):
+        path = os.path.join(user_dir, f"user_recording_{i}.webm")
+        open(path, 'wb').close()
+        os.utime(path, (now - 10 + i, now - 10 + i))
+
+    client = flask_app.app.test_client()
+    assert client.get('/health').status_code == 200
+    end = time.monotonic() + 5
+    while flask_app.audio_janitor.stats()['sweeps'] == 0 and time.monotonic() < end:
+        time.sleep(0.01)
+    assert flask_app.audio_janitor.stats()['sweeps'] == 1
+
+    response = client.post('/api/transcribe', data={'user_id': '1', 'audio': (io.BytesIO(b'webm'), 'a.webm')})
+    assert response.status_code == 200
+    while flask_app.audio_janitor.stats()['user_cleanups'] == 0 and time.monotonic() < end:
+        time.sleep(0.01)
+    assert len(os.listdir(user_dir)) == 2
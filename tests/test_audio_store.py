@@ -0,0 +1,57 @@
+# tests/test_audio_store.py
+import os
+import time
+
+from audio_store import AudioBlobStore, content_etag
+
+
+def test_small_blob_in_memory_large_blob_spilled(tmp_path):
+    store = AudioBlobStore(str(tmp_path), spill_threshold=100)
+    store.put('user_1/a.mp3', b'x' * 50)
+    store.put('user_1/b.ogg', b'y' * 200)
+
+    small, large = store.get('user_1/a.mp3'), store.get('user_1/b.ogg')
+    assert small.data == b'x' * 50 and small.mimetype == 'audio/mpeg'
+    assert large.data is None and large.path.endswith('.ogg') and os.path.getsize(large.path) == 200
+    assert large.etag == content_etag(b'y' * 200)
+    assert store.stats()['memory_kb'] == 0 and store.stats()['spilled'] == 1
+
+
+def test_lru_eviction_only_counts_memory(tmp_path):
+    store = AudioBlobStore(str(tmp_path), max_bytes=100, spill_threshold=60)
+    store.put('a.mp3', b'a' * 40)
+    store.put('big.mp3', b'b' * 500)  # ausgelagert - belegt kein RAM-Budget
+    store.put('c.mp3', b'c' * 40)
+    assert store.get('a.mp3') is not None  # a ist jetzt der jüngste RAM-Eintrag
+    store.put('d.mp3', b'd' * 40)
+    assert store.get('c.mp3') is None
+    assert store.get('a.mp3') and store.get('d.mp3') and store.get('big.mp3')
+    assert store.stats()['evictions'] == 1
+
+
+def test_expired_blobs_dropped_with_spill_file(tmp_path):
+    store = AudioBlobStore(str(tmp_path), ttl=0.05, spill_threshold=10)
+    store.put('a.mp3', b'a' * 50)
+    path = store.get('a.mp3').path
+    time.sleep(0.1)
+    assert store.get('a.mp3') is None
+    assert not os.path.exists(path)
+    assert store.stats()['expired'] == 1
+
+
+def test_overwrite_replaces_spill_file(tmp_path):
+    store = AudioBlobStore(str(tmp_path), spill_threshold=10)
+    store.put('a.mp3', b'a' * 50)
+    old_path = store.get('a.mp3').path
+    store.put('a.mp3', b'b' * 5)
+    assert not os.path.exists(old_path)
+    assert store.get('a.mp3').data == b'b' * 5
+    assert store.stats()['entries'] == 1
+
+
+def test_stale_spill_files_of_previous_process_removed(tmp_path):
+    stale = tmp_path / 'old.mp3'
+    stale.write_bytes(b'alt')
+    os.utime(stale, (time.time() - 3600, time.time() - 3600))
+    AudioBlobStore(str(tmp_path), ttl=600)
+    assert not stale.exists()
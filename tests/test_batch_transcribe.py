@@ -0,0 +1,56 @@
+# tests/test_batch_transcribe.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import batch_transcribe
+from batch_transcribe import load_done, find_recordings
+
+
+@pytest.fixture
+def output(tmp_path):
+    # Abbruch mitten in der dritten Zeile: kein Zeilenumbruch, unvollständiges JSON
+    path = tmp_path / 'out.jsonl'
+    path.write_text('{"path": "/a.wav", "text": "bonjour", "audio_seconds": 1.0, "error": null}\n'
+                    '{"path": "/b.wav", "text": "", "audio_seconds": 1.0, "error": "RuntimeError: kaputt"}\n'
+                    '{"path": "/c.w', encoding='utf-8')
+    return str(path)
+
+
+def test_load_done_skips_partial_line_and_retries_failures(output):
+    assert load_done(output) == {'/a.wav'}
+    assert load_done(output, retry_failed=False) == {'/a.wav', '/b.wav'}
+    assert load_done(output + '.fehlt') == set()
+
+
+def test_resume_transcribes_only_missing_files(output, monkeypatch):
+    transcribed = []
+
+    def fake_transcribe(path):
+        transcribed.append(path)
+        return {'path': path, 'text': 'salut', 'audio_seconds': 2.0, 'skipped_seconds': 0.0,
+                'processing_seconds': 0.1, 'no_speech': False, 'error': None}
+
+    # Threads statt Prozesse und ohne Vosk-Modell - geprüft wird nur der Ablauf
+    monkeypatch.setattr(batch_transcribe, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(batch_transcribe, '_init_worker', lambda: None)
+    monkeypatch.setattr(batch_transcribe, '_transcribe_file', fake_transcribe)
+
+    summary = batch_transcribe.batch_transcribe(['/a.wav', '/b.wav', '/c.wav'], output, workers=2)
+    assert sorted(transcribed) == ['/b.wav', '/c.wav']
+    assert summary['skipped_existing'] == 1 and summary['transcribed'] == 2
+    assert summary['audio_seconds'] == 4.0
+
+    # Die halbe Zeile bleibt als eigene (ungültige) Zeile stehen, alle neuen Zeilen sind lesbar
+    assert load_done(output) == {'/a.wav', '/b.wav', '/c.wav'}
+    summary = batch_transcribe.batch_transcribe(['/a.wav', '/b.wav', '/c.wav'], output)
+    assert summary['skipped_existing'] == 3 and len(transcribed) == 2
+
+
+def test_find_recordings(tmp_path):
+    (tmp_path / 'user_1').mkdir()
+    rec = tmp_path / 'user_1' / 'user_recording_1.webm'
+    rec.write_bytes(b'')
+    (tmp_path / 'user_1' / 'llm_1.mp3').write_bytes(b'')
+    assert find_recordings([str(tmp_path), str(rec)]) == [str(rec)]
+    assert find_recordings([str(tmp_path / '*' / '*.mp3')]) == [str(tmp_path / 'user_1' / 'llm_1.mp3')]
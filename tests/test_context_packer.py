@@ -0,0 +1,48 @@
+# tests/test_context_packer.py
+import pytest
+
+import context_packer
+from context_packer import pack_messages, count_tokens, calibrate, message_tokens, MIN_RECENT_MESSAGES
+
+
+@pytest.fixture(autouse=True)
+def uncalibrated(monkeypatch):
+    monkeypatch.setattr(context_packer, '_calibration', 1.0)
+
+
+def _history(n, words=20):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f"message {i} " + 'mot ' * words}
+            for i in range(n)]
+
+
+def test_keeps_newest_messages_within_budget():
+    history = _history(10)
+    system, prompt = 'Tu es un serveur.', 'Un café, s\'il vous plaît.'
+    fixed = message_tokens({'content': system}) + message_tokens({'content': prompt})
+    budget = fixed + 3 * message_tokens(history[-1])
+
+    messages = pack_messages(system, history, prompt, budget)
+    assert messages[0] == {'role': 'system', 'content': system}
+    assert messages[-1] == {'role': 'user', 'content': prompt}
+    assert [m['content'] for m in messages[1:-1]] == [m['content'] for m in history[-3:]]
+
+
+def test_minimum_recent_messages_even_over_budget():
+    messages = pack_messages('système', _history(6, words=200), 'Bonjour', budget=10)
+    assert len(messages) == MIN_RECENT_MESSAGES + 2
+    assert context_packer.packer_stats()['over_budget'] >= 1
+
+
+def test_long_words_cost_more_tokens():
+    assert count_tokens('chat') == 1
+    assert count_tokens('anticonstitutionnellement') > count_tokens('le chat')
+    assert count_tokens("Qu'est-ce que c'est ?") == 10  # Qu ' est - ce que c ' est ?
+
+
+def test_calibration_moves_towards_reported_prompt_tokens():
+    messages = [{'role': 'user', 'content': 'mot ' * 50}]
+    before = count_tokens('mot ' * 50)
+    for _ in range(20):
+        calibrate(messages, prompt_tokens=2 * (before + context_packer.MESSAGE_OVERHEAD_TOKENS))
+    assert count_tokens('mot ' * 50) == pytest.approx(2 * before, rel=0.05)
+    calibrate(messages, prompt_tokens=0)  # fehlende usage-Angabe ändert nichts
@@ -0,0 +1,116 @@
+# tests/test_deadline.py
+import pytest
+import requests
+
+import deadline
+import resilience
+import llm_agent_mistral
+from deadline import (start_deadline, plan_llm_stage, llm_allowed, DeadlineExceeded, DEGRADE_NONE,
+                      DEGRADE_SHORT_REPLY, DEGRADE_CANNED_REPLY, SHORT_REPLY_MAX_TOKENS)
+
+
+@pytest.mark.parametrize('seconds, expected', [
+    (12, DEGRADE_NONE),
+    (deadline.TTS_MIN_BUDGET_SECONDS + 4, DEGRADE_SHORT_REPLY),
+    (deadline.TTS_MIN_BUDGET_SECONDS + 1, DEGRADE_CANNED_REPLY),
+])
+def test_plan_llm_stage_reserves_time_for_tts(seconds, expected):
+    start_deadline(seconds)
+    degradation, max_tokens = plan_llm_stage(160)
+    assert degradation == expected
+    assert max_tokens == {DEGRADE_NONE: 160, DEGRADE_SHORT_REPLY: SHORT_REPLY_MAX_TOKENS,
+                          DEGRADE_CANNED_REPLY: 0}[expected]
+    assert llm_allowed() == (expected != DEGRADE_CANNED_REPLY)
+
+
+class _FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'choices': [{'message': {'content': 'Bonjour !'}}]}
+
+
+class _SlowThenOk:
+    """Erster Aufruf: Timeout und verbrauchte Zeit (Deadline wird verkürzt), danach Erfolg."""
+
+    def __init__(self, remaining_after_failure):
+        self.remaining_after_failure = remaining_after_failure
+        self.max_tokens = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.max_tokens.append(json['max_tokens'])
+        if len(self.max_tokens) == 1:
+            start_deadline(self.remaining_after_failure)
+            raise requests.exceptions.Timeout("zu langsam")
+        return _FakeResponse()
+
+
+@pytest.fixture
+def mistral(monkeypatch):
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test-key-1234')
+    monkeypatch.setattr(llm_agent_mistral, 'MISTRAL_BASE_URL', 'http://mistral.invalid')
+    monkeypatch.setattr(llm_agent_mistral, 'retry_pause', lambda attempt, what: True)
+    resilience._breakers.pop('llm:mistral', None)
+
+    def install(client):
+        monkeypatch.setattr(llm_agent_mistral, 'get_http_session', lambda name: client)
+        return client
+    yield install
+    resilience._breakers.pop('llm:mistral', None)
+
+
+def test_retry_after_slow_failure_shortens_reply(mistral):
+    client = mistral(_SlowThenOk(deadline.TTS_MIN_BUDGET_SECONDS + 4))
+    start_deadline(12)
+    payload = {'messages': [{'role': 'user', 'content': 'Salut'}], 'max_tokens': 160}
+    assert llm_agent_mistral._send_chat_completion(payload) == 'Bonjour !'
+    assert client.max_tokens == [160, SHORT_REPLY_MAX_TOKENS]
+
+
+def test_retry_after_slow_failure_gives_up_for_canned_reply(mistral):
+    client = mistral(_SlowThenOk(deadline.TTS_MIN_BUDGET_SECONDS + 1))
+    start_deadline(12)
+    payload = {'messages': [{'role': 'user', 'content': 'Salut'}], 'max_tokens': 160}
+    with pytest.raises(DeadlineExceeded):
+        llm_agent_mistral._send_chat_completion(payload)
+    assert client.max_tokens == [160]
+
+
+def test_deadline_only_for_turn_endpoints_and_per_stage_for_streams(flask_app, monkeypatch):
+    seen = {}
+
+    def wait(job_id, output_stem, wait_seconds):
+        seen['long_poll'] = deadline.current_deadline()
+        return 'pending'
+
+    def respond(*args, **kwargs):
+        seen['respond'] = deadline.current_deadline()
+        return {'response': 'Bonjour !', 'audio_url': None}
+
+    def stream(*args, **kwargs):
+        seen['llm_stage'] = deadline.current_deadline()
+        yield 'Bonjour. '
+
+    def synthesize(text, output_stem, user_id, formats=None):
+        seen['tts_stage'] = deadline.current_deadline()
+        return None
+
+    monkeypatch.setattr(flask_app.tts_jobs, 'wait', wait)
+    monkeypatch.setattr(flask_app, 'generate_llm_and_tts_response', respond)
+    monkeypatch.setattr(flask_app, 'query_llm_for_scenario_stream', stream)
+    monkeypatch.setattr(flask_app, 'safe_synthesize_tts', synthesize)
+    client = flask_app.app.test_client()
+
+    client.post('/api/respond', json={'message': 'salut', 'userId': '1'})
+    assert seen['respond'].budget == deadline.REQUEST_DEADLINE_SECONDS
+    # Die Deadline eines vorherigen Requests im selben Thread gilt nicht für den Long-Poll
+    start_deadline(0.1)
+    client.get('/api/audio_jobs/1_ab?userId=1&wait=0')
+    assert seen['long_poll'] is deadline._NO_DEADLINE
+
+    body = client.post('/api/respond_stream', json={'message': 'salut', 'userId': '1'}).get_data(as_text=True)
+    assert 'event: done' in body
+    assert seen['llm_stage'].budget == deadline.REQUEST_DEADLINE_SECONDS
+    assert seen['tts_stage'] is not seen['llm_stage']
+    assert seen['tts_stage'].expires_at > seen['llm_stage'].expires_at
@@ -0,0 +1,83 @@
+# tests/test_history_summarizer.py
+import threading
+
+from history_summarizer import HistorySummarizer
+from session_store import SessionStore
+
+SIX_MESSAGES = [{'role': ('user', 'assistant')[i % 2], 'content': f"m{i}"} for i in range(6)]
+
+
+def test_folds_older_messages_into_summary():
+    calls = []
+
+    def summarize(previous, messages):
+        calls.append((previous, [m['content'] for m in messages]))
+        return 'Résumé'
+
+    summarizer = HistorySummarizer(summarize, trigger=4, keep_recent=2)
+    assert not summarizer.request('u', {'history': SIX_MESSAGES[:4]})  # noch unter der Schwelle
+
+    session = {'history': list(SIX_MESSAGES)}
+    assert summarizer.request('u', session)
+    summarizer._executor.shutdown(wait=True)
+    assert calls == [(None, ['m0', 'm1', 'm2', 'm3'])]
+    assert session['history'] == [{'role': 'system', 'content': 'Résumé'},
+                                  {'role': 'user', 'content': 'm4'}, {'role': 'assistant', 'content': 'm5'}]
+    assert summarizer.stats()['folded_messages'] == 4
+
+
+def test_messages_added_during_summary_are_kept():
+    started, release = threading.Event(), threading.Event()
+
+    def summarize(previous, messages):
+        started.set()
+        release.wait(2)
+        return 'Résumé'
+
+    summarizer = HistorySummarizer(summarize, trigger=4, keep_recent=2)
+    session = {'history': list(SIX_MESSAGES)}
+    summarizer.request('u', session)
+    assert started.wait(2)
+    assert not summarizer.request('u', session)  # schon in Arbeit
+    session['history'].append({'role': 'user', 'content': 'neu'})
+    release.set()
+    summarizer._executor.shutdown(wait=True)
+    assert [m['content'] for m in session['history']] == ['Résumé', 'm4', 'm5', 'neu']
+
+
+def test_result_dropped_after_reset():
+    release = threading.Event()
+    summarizer = HistorySummarizer(lambda previous, messages: release.wait(2) and 'Résumé', trigger=4, keep_recent=2)
+    session = {'history': list(SIX_MESSAGES)}
+    summarizer.request('u', session)
+    session['history'] = [{'role': 'user', 'content': 'Bonjour'}]  # Neustart des Gesprächs
+    release.set()
+    summarizer._executor.shutdown(wait=True)
+    assert session['history'] == [{'role': 'user', 'content': 'Bonjour'}]
+    assert summarizer.stats()['stale'] == 1
+
+
+def test_failure_leaves_history_untouched():
+    def summarize(previous, messages):
+        raise RuntimeError("LLM weg")
+
+    summarizer = HistorySummarizer(summarize, trigger=4, keep_recent=2)
+    session = {'history': list(SIX_MESSAGES)}
+    summarizer.request('u', session)
+    summarizer._executor.shutdown(wait=True)
+    assert session['history'] == SIX_MESSAGES
+    assert summarizer.stats()['failed'] == 1 and summarizer.stats()['in_flight'] == 0
+
+
+def test_session_pinned_while_summarizing(tmp_path):
+    store = SessionStore(str(tmp_path))
+    session = store.get_or_create('u')
+    session['history'] = list(SIX_MESSAGES)
+    release = threading.Event()
+    summarizer = HistorySummarizer(lambda previous, messages: release.wait(2) and 'Résumé', trigger=4,
+                                   keep_recent=2, sessions=store)
+    summarizer.request('u', session)
+    assert store.stats()['pinned'] == 1
+    release.set()
+    summarizer._executor.shutdown(wait=True)
+    assert store.stats()['pinned'] == 0
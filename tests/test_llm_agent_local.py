@@ -0,0 +1,117 @@
+# tests/test_llm_agent_local.py
+import threading
+import time
+
+import pytest
+
+import deadline
+import llm_agent_local
+from llm_agent_local import LocalLLMEngine, default_settings
+
+# Ersatz für llama_cpp im Worker-Prozess: der "Kontext" ist die Liste der bisherigen Prompts,
+# die Antwort gibt ihn wieder - so ist sichtbar, welcher KV-Zustand geladen war
+FAKE_LLAMA_CPP = '''
+import os
+import time
+
+
+class LlamaState:
+    def __init__(self, context):
+        self.context = context
+        self.llama_state_size = 100
+        self.scores = None
+
+
+class Llama:
+    def __init__(self, n_ctx, **kwargs):
+        self._n_ctx = n_ctx
+        self.context = []
+
+    def n_ctx(self):
+        return self._n_ctx
+
+    def create_chat_completion(self, messages, max_tokens, temperature, seed, stream):
+        prompt = messages[-1]['content']
+        if prompt == 'absturz':
+            os._exit(1)
+        if prompt == 'langsam':
+            time.sleep(1.5)
+        self.context.append(prompt)
+        if prompt == 'stumm':
+            return
+        for word in self.context:
+            yield {'choices': [{'delta': {'content': word + ' '}}]}
+
+    def save_state(self):
+        return LlamaState(list(self.context))
+
+    def load_state(self, state):
+        self.context = list(state.context)
+'''
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    (tmp_path / 'llama_cpp.py').write_text(FAKE_LLAMA_CPP)
+    monkeypatch.syspath_prepend(str(tmp_path))  # spawn übernimmt sys.path in den Worker
+    engine = LocalLLMEngine(dict(default_settings(), n_ctx=512))
+    yield engine
+    if engine._process:
+        engine._process.terminate()
+
+
+def _ask(engine, prompt, session_id=None):
+    return engine.complete([{'role': 'user', 'content': prompt}], session_id=session_id)
+
+
+def test_session_state_round_trip_and_no_save_without_tokens(engine):
+    assert _ask(engine, 'un', 'a') == 'un'
+    assert _ask(engine, 'stumm', 'a') == ''  # kein Token - Zustand von 'a' bleibt beim Stand nach 'un'
+    assert _ask(engine, 'x', 'b') == 'un stumm x'
+    assert _ask(engine, 'trois', 'a') == 'un trois'
+    assert _ask(engine, 'quatre', 'a') == 'un trois quatre'
+
+    stats = engine.stats()
+    assert (stats['kv_cold'], stats['kv_resident'], stats['kv_restored']) == (2, 2, 1)
+    assert stats['kv_sessions'] == 2 and stats['n_ctx'] == 512
+
+
+def test_expired_request_is_dropped_by_the_worker(engine):
+    slow = threading.Thread(target=_ask, args=(engine, 'langsam'))
+    slow.start()
+    time.sleep(0.1)
+    deadline.start_deadline(0.5)
+    with pytest.raises(deadline.DeadlineExceeded):
+        _ask(engine, 'un')
+    slow.join()
+
+    end = time.monotonic() + 5
+    while engine.stats()['expired'] == 0 and time.monotonic() < end:
+        time.sleep(0.05)
+    assert engine.stats()['expired'] == 1 and engine.stats()['queued'] == 0
+
+
+def test_crashed_worker_fails_pending_request_and_restarts(engine):
+    with pytest.raises(ConnectionError):
+        _ask(engine, 'absturz')
+    assert _ask(engine, 'un') == 'un'
+    assert engine.stats()['restarts'] == 1 and engine.stats()['failed'] == 1
+
+
+def test_without_llama_cpp_scenario_replies_fall_back_to_mistral(monkeypatch):
+    engine = LocalLLMEngine(dict(default_settings(), model_path='/fehlt.gguf'))
+    monkeypatch.setattr(llm_agent_local, 'engine', engine)
+    monkeypatch.setattr(llm_agent_local.remote_llm, 'query_llm_for_scenario',
+                        lambda prompt, scenario, history, max_tokens: 'Bonjour (Mistral)')
+    monkeypatch.setattr(llm_agent_local.remote_llm, 'query_llm_for_scenario_stream',
+                        lambda prompt, scenario, history, max_tokens: iter(['Bonjour ', '(Mistral)']))
+
+    assert llm_agent_local.query_llm_for_scenario('salut', session_id='a') == 'Bonjour (Mistral)'
+    assert engine.stats()['unavailable']  # llama_cpp oder Modell fehlt
+    # Kein erneuter Startversuch - die nächste Anfrage geht sofort an Mistral
+    assert list(llm_agent_local.query_llm_for_scenario_stream('salut', session_id='a')) == ['Bonjour ', '(Mistral)']
+    assert engine.stats()['restarts'] == 0
+
+    monkeypatch.setattr(llm_agent_local, 'LOCAL_LLM_REMOTE_FALLBACK', False)
+    with pytest.raises(ConnectionError):
+        llm_agent_local.query_llm_for_scenario('salut')
@@ -0,0 +1,50 @@
+# tests/test_llm_autotune.py
+import json
+
+import pytest
+
+import llm_autotune
+from llm_autotune import load_tuning, save_tuning, measure, _best, _thread_candidates
+
+
+def test_tuning_round_trip_only_for_same_model_and_host(tmp_path, monkeypatch):
+    path = str(tmp_path / 'llm' / 'autotune.json')
+    config = {'n_threads': 4, 'n_threads_batch': 8, 'n_batch': 256, 'n_ctx': 2048}
+    save_tuning('/models/mistral-7b.gguf', config, [], {}, path=path)
+    assert load_tuning('/anderswo/mistral-7b.gguf', path=path) == config
+    assert load_tuning('/models/anderes.gguf', path=path) is None
+
+    monkeypatch.setattr(llm_autotune, 'host_fingerprint', lambda: {'cpu_count': 999})
+    assert load_tuning('/models/mistral-7b.gguf', path=path) is None
+    assert load_tuning('/models/mistral-7b.gguf', path=str(tmp_path / 'fehlt.json')) is None
+
+
+def test_best_prefers_cheaper_config_within_tolerance():
+    results = [{'n_threads': 8, 'generation_tps': 10.0},
+               {'n_threads': 4, 'generation_tps': 9.8},
+               {'n_threads': 2, 'generation_tps': 6.0}]
+    assert _best(results, 'generation_tps', lambda r: r['n_threads'])['n_threads'] == 4
+
+
+@pytest.mark.parametrize('cpus, expected', [(1, [1]), (4, [1, 2, 4]), (12, [1, 2, 4, 6, 8, 12])])
+def test_thread_candidates(monkeypatch, cpus, expected):
+    monkeypatch.setattr(llm_autotune.os, 'cpu_count', lambda: cpus)
+    assert _thread_candidates() == expected
+
+
+class _FakeLlama:
+    def tokenize(self, data, add_bos=True):
+        return data.split()
+
+    def reset(self):
+        pass
+
+    def create_completion(self, prompt, max_tokens, temperature, stream):
+        return iter(range(max_tokens))
+
+
+def test_measure_reports_rates():
+    result = measure(_FakeLlama(), 'un deux trois quatre', generate_tokens=5, repeats=2)
+    assert result['prompt_tokens'] == 4
+    assert result['prompt_tps'] > 0 and result['generation_tps'] > 0
+    json.dumps(result)
@@ -0,0 +1,45 @@
+# tests/test_llm_cache.py
+import time
+
+from llm_cache import LLMResponseCache, response_cache_key
+
+
+def test_key_ignores_stream_flag():
+    payload = {'model': 'm', 'messages': [{'role': 'user', 'content': 'Bonjour'}], 'random_seed': 7}
+    assert response_cache_key(payload) == response_cache_key(dict(payload, stream=True))
+    assert response_cache_key(payload) != response_cache_key(dict(payload, random_seed=8))
+
+
+def test_lru_by_entry_count():
+    cache = LLMResponseCache(max_entries=2, enabled=True)
+    cache.put('a', 'Bonjour')
+    cache.put('b', 'Salut')
+    assert cache.get('a') == 'Bonjour'  # a ist jetzt der jüngste Eintrag
+    cache.put('c', 'Coucou')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'Bonjour' and cache.get('c') == 'Coucou'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_by_size():
+    cache = LLMResponseCache(max_bytes=25, enabled=True)  # Größe = Schlüssel + UTF-8-Text
+    cache.put('a', 'x' * 12)
+    cache.put('b', 'x' * 12)
+    assert cache.get('a') is None and cache.get('b') is not None
+    cache.put('b', 'é' * 6)  # Überschreiben zählt die Größe nicht doppelt
+    assert cache.stats()['entries'] == 1 and cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = LLMResponseCache(ttl=0.05, enabled=True)
+    cache.put('a', 'Bonjour')
+    assert cache.get('a') == 'Bonjour'
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.stats()['expired'] == 1 and cache.stats()['entries'] == 0
+
+
+def test_empty_reply_not_cached():
+    cache = LLMResponseCache(enabled=True)
+    cache.put('a', '')
+    assert cache.get('a') is None and cache.stats()['stores'] == 0
@@ -0,0 +1,64 @@
+# tests/test_opening_pool.py
+import time
+import itertools
+
+import opening_pool
+from opening_pool import OpeningPool, OpeningLine
+
+
+def test_fills_in_background_and_rotates_entries():
+    counter = itertools.count()
+    pool = OpeningPool(lambda scenario, seed: f"Bonjour {next(counter)} !",
+                       lambda text, audio_format: (text.encode(), 'vorbis' if audio_format == 'opus' else audio_format),
+                       ['opus', 'mp3'], scenarios=('restaurant',), size=2, max_uses=2)
+    assert pool.take('restaurant') is None  # erster Aufruf startet das Nachfüllen
+    end = time.monotonic() + 5
+    while pool.stats()['filled']['restaurant'] < 2 and time.monotonic() < end:
+        time.sleep(0.01)
+
+    first, second, third = pool.take('restaurant'), pool.take('restaurant'), pool.take('restaurant')
+    assert first.text != second.text and third is first
+    assert first.audio_for(['opus', 'vorbis', 'mp3']) == (first.text.encode(), 'vorbis')
+    # first ist nach max_uses verbraucht und wird ersetzt
+    while pool.stats()['generated'] < 3 and time.monotonic() < end:
+        time.sleep(0.01)
+    assert pool.stats()['retired'] == 1 and pool.stats()['misses'] == 1
+    assert pool.take('unbekannt') is None
+
+
+def test_failed_generation_retries_with_backoff(monkeypatch):
+    monkeypatch.setattr(opening_pool, 'REFILL_BACKOFF_SECONDS', 0.01)
+    attempts = itertools.count()
+
+    def flaky(scenario, seed):
+        if next(attempts) < 2:
+            raise RuntimeError("LLM weg")
+        return 'Bonsoir !'
+
+    pool = OpeningPool(flaky, lambda text, audio_format: (b'ID3', 'mp3'), ['mp3'], scenarios=('restaurant',), size=1)
+    pool.start()
+    end = time.monotonic() + 5
+    while pool.stats()['filled']['restaurant'] < 1 and time.monotonic() < end:
+        time.sleep(0.01)
+    assert pool.stats()['failed'] == 2
+    assert pool.take('restaurant').text == 'Bonsoir !'
+
+
+def test_audio_for_without_matching_format():
+    line = OpeningLine('Bonjour')
+    line.audio['mp3'] = b'ID3'
+    assert line.audio_for(['opus']) == (None, None)
+    assert line.audio_for(None) == (None, None)
+
+
+def test_refill_starts_with_the_first_request_not_at_import(flask_app, monkeypatch):
+    pool = OpeningPool(lambda scenario, seed: 'Bonjour !', lambda text, audio_format: (b'ID3', 'mp3'), ['mp3'],
+                       scenarios=('restaurant',), size=1)
+    monkeypatch.setattr(flask_app, 'opening_pool', pool)
+    assert pool.stats()['generated'] == 0 and pool._thread is None
+
+    flask_app.app.test_client().get('/health')
+    thread = pool._thread
+    assert thread is not None
+    flask_app.app.test_client().get('/health')
+    assert pool._thread is thread  # nur einmal pro Prozess gestartet
@@ -0,0 +1,61 @@
+# tests/test_provider_clients.py
+import threading
+
+import pytest
+import requests
+
+import provider_clients
+from provider_clients import get_client, get_http_session
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    provider_clients._reset_after_fork()
+    yield
+    provider_clients._reset_after_fork()
+
+
+def test_client_created_once_and_reused():
+    created = []
+    factory = lambda: created.append(object()) or created[-1]
+    first = get_client('test', factory)
+    assert get_client('test', factory) is first
+    assert len(created) == 1
+    stats = provider_clients.stats()
+    assert stats['clients_created'] == {'test': 1} and stats['clients_reused'] == {'test': 1}
+
+
+def test_concurrent_first_access_creates_one_client():
+    created = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        created.append(1)
+        return object()
+
+    def worker(results):
+        barrier.wait()
+        results.append(get_client('parallel', factory))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1 and len({id(r) for r in results}) == 1
+
+
+def test_clients_rebuilt_in_forked_child(monkeypatch):
+    parent_client = get_client('test', object)
+    monkeypatch.setattr(provider_clients, '_owner_pid', -1)  # wie nach einem Fork ohne register_at_fork
+    assert get_client('test', object) is not parent_client
+
+
+def test_http_session_has_keep_alive_pool():
+    session = get_http_session('mistral')
+    assert isinstance(session, requests.Session) and get_http_session('mistral') is session
+    adapter = session.get_adapter('https://api.mistral.ai')
+    assert adapter._pool_maxsize == provider_clients.POOL_MAXSIZE
+    assert adapter.max_retries.total == 0  # Wiederholungen steuert resilience.py
+    assert provider_clients.stats()['pools']['http:mistral']['requests'] == 0
@@ -0,0 +1,104 @@
+# tests/test_resilience.py
+import time
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, CLOSED, OPEN, HALF_OPEN
+from deadline import DeadlineExceeded, start_deadline
+
+
+def _open_breaker(**kwargs):
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_seconds=0.05, **kwargs)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def _fail():
+    raise RuntimeError("boom")
+
+
+def test_opens_after_threshold_and_rejects():
+    breaker = _open_breaker()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert not breaker.is_available()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+    assert breaker.snapshot()['rejected'] == 2
+
+
+def test_half_open_allows_single_probe():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.is_available()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Zweiter Aufruf, während die Probe läuft
+    assert not breaker.allow()
+    assert not breaker.is_available()
+
+
+def test_probe_success_closes():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_probe_failure_reopens():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_deadline_exit_releases_probe():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+
+    def out_of_time():
+        raise DeadlineExceeded("zu spät")
+
+    with pytest.raises(DeadlineExceeded):
+        breaker.call(out_of_time)
+    # Weder Erfolg noch Fehler gezählt - aber die nächste Probe ist wieder möglich
+    assert breaker.state == HALF_OPEN
+    assert breaker.is_available()
+    assert breaker.allow()
+
+
+def test_release_probe_is_noop_when_closed():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.release_probe()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_retry_budget_limits_count_and_time():
+    budget = RetryBudget(max_retries=2, max_seconds=1.0)
+    assert budget.acquire(0.4)
+    assert not budget.acquire(0.7)  # Zeitbudget
+    assert budget.acquire(0.5)
+    assert not budget.acquire(0.0)  # Anzahl
+
+
+def test_retry_pause_respects_deadline(monkeypatch):
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt: 0.0)
+    start_deadline(0.1)
+    resilience.start_retry_budget()
+    assert not resilience.retry_pause(0, 'test')
+    start_deadline(10)
+    assert resilience.retry_pause(0, 'test')
@@ -0,0 +1,137 @@
+# tests/test_respond_stream.py
+import json
+import threading
+
+import pytest
+import requests
+
+import llm_agent_mistral
+import resilience
+from llm_cache import LLMResponseCache
+
+
+def _events(chunks):
+    """SSE-Text -> [(event, data)]"""
+    events = []
+    for block in ''.join(chunks).split('\n\n'):
+        if block:
+            name, data = block.split('\n')
+            events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def _assistant_replies(app_module, user_id):
+    history = app_module.user_sessions.get_or_create(user_id)['history']
+    return [m['content'] for m in history if m['role'] == 'assistant']
+
+
+def test_tokens_then_audio_per_sentence_then_done(flask_app, monkeypatch):
+    llm_done = threading.Event()
+
+    def stream(message, scenario, history, max_tokens, session_id):
+        yield 'Bonjour et bienvenue au restaurant. '
+        yield 'Vous avez réservé une table ?'
+        llm_done.set()
+
+    def synthesize(text, output_stem, user_id, formats=None):
+        # Audio erst nach dem letzten Token - so ist die Reihenfolge im Test eindeutig
+        llm_done.wait(5)
+        return output_stem + '.mp3'
+
+    monkeypatch.setattr(flask_app, 'query_llm_for_scenario_stream', stream)
+    monkeypatch.setattr(flask_app, 'safe_synthesize_tts', synthesize)
+
+    response = flask_app.app.test_client().post('/api/respond_stream', json={'message': 'salut', 'userId': '1'},
+                                                buffered=False)
+    chunks = []
+    for chunk in response.response:
+        chunks.append(chunk.decode())
+        if 'event: done' not in chunk.decode():
+            assert _assistant_replies(flask_app, '1') == []  # Historie erst mit 'done'
+    response.close()
+
+    events = _events(chunks)
+    assert [name for name, _ in events] == ['token', 'token', 'audio', 'audio', 'done']
+    assert [data['index'] for name, data in events if name == 'audio'] == [0, 1]
+    assert events[2][1]['url'].startswith('/temp_audio/user_1/llm_part_')
+    reply = 'Bonjour et bienvenue au restaurant. Vous avez réservé une table ?'
+    assert events[-1][1] == {'response': reply, 'degraded': None}
+    assert _assistant_replies(flask_app, '1') == [reply]
+
+
+@pytest.mark.parametrize('tokens, expected', [
+    (['Bonjour. ', 'Je '], 'Bonjour. Je'),  # Abbruch mitten im Stream: Teilantwort bleibt
+    ([], "Désolé, je ne peux pas répondre maintenant."),  # Abbruch vor dem ersten Token: Fallback
+])
+def test_broken_stream_ends_with_partial_or_fallback_reply(flask_app, monkeypatch, tokens, expected):
+    def stream(*args, **kwargs):
+        yield from tokens
+        raise ConnectionError('Verbindung abgebrochen')
+
+    monkeypatch.setattr(flask_app, 'query_llm_for_scenario_stream', stream)
+    monkeypatch.setattr(flask_app, 'safe_synthesize_tts', lambda text, output_stem, user_id, formats=None: None)
+
+    body = flask_app.app.test_client().post('/api/respond_stream', json={'message': 'salut', 'userId': '1'})
+    events = _events([body.get_data(as_text=True)])
+    assert events[-1] == ('done', {'response': expected, 'degraded': None})
+    assert ''.join(data['text'] for name, data in events if name == 'token').strip() == expected
+    assert _assistant_replies(flask_app, '1') == [expected]
+
+
+class _StreamingResponse:
+    def __init__(self, lines, error=None):
+        self.lines = lines
+        self.error = error
+        self.status_code = 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        yield from self.lines
+        if self.error:
+            raise self.error
+
+
+def _delta(text):
+    return 'data: ' + json.dumps({'choices': [{'delta': {'content': text}}]})
+
+
+@pytest.fixture
+def mistral(monkeypatch):
+    """query_llm_stream gegen eine vorgegebene SSE-Antwort, mit frischem Cache und Circuit Breaker."""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    monkeypatch.setattr(llm_agent_mistral, 'response_cache', LLMResponseCache(enabled=True))
+    monkeypatch.setattr(resilience, '_breakers', {})
+    session = type('Session', (), {})()
+    monkeypatch.setattr(llm_agent_mistral, 'get_http_session', lambda name: session)
+    return session
+
+
+def test_query_llm_stream_yields_deltas_and_caches_complete_reply(mistral):
+    mistral.post = lambda *args, **kwargs: _StreamingResponse(
+        [_delta('Bon'), '', _delta('jour !'), 'data: [DONE]'])
+    messages = [{'role': 'user', 'content': 'salut'}]
+
+    assert list(llm_agent_mistral.query_llm_stream(messages)) == ['Bon', 'jour !']
+    mistral.post = None  # zweiter Aufruf darf die API nicht erreichen
+    assert list(llm_agent_mistral.query_llm_stream(messages)) == ['Bonjour !']
+
+
+def test_query_llm_stream_broken_mid_way_raises_and_is_not_cached(mistral):
+    mistral.post = lambda *args, **kwargs: _StreamingResponse(
+        [_delta('Bon')], error=requests.exceptions.ChunkedEncodingError('Verbindung weg'))
+    messages = [{'role': 'user', 'content': 'salut'}]
+
+    stream = llm_agent_mistral.query_llm_stream(messages)
+    assert next(stream) == 'Bon'
+    with pytest.raises(ConnectionError):
+        next(stream)
+    assert llm_agent_mistral.response_cache.stats()['entries'] == 0
+    assert resilience.get_breaker('llm:mistral').snapshot()['consecutive_failures'] == 1
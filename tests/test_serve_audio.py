@@ -0,0 +1,53 @@
+# tests/test_serve_audio.py
+import os
+
+
+def test_disk_file_etag_range_and_immutable(flask_app):
+    user_dir = os.path.join(flask_app.TEMP_AUDIO_DIR_ROOT, 'user_1')
+    os.makedirs(user_dir)
+    with open(os.path.join(user_dir, 'llm_1_ab.mp3'), 'wb') as f:
+        f.write(b'ID3-audio-bytes')
+    client = flask_app.app.test_client()
+
+    response = client.get('/temp_audio/user_1/llm_1_ab.mp3')
+    assert response.status_code == 200 and response.data == b'ID3-audio-bytes'
+    assert response.cache_control.immutable and response.cache_control.max_age == flask_app.IMMUTABLE_AUDIO_MAX_AGE
+    etag = response.headers['ETag']
+
+    assert client.get('/temp_audio/user_1/llm_1_ab.mp3', headers={'If-None-Match': etag}).status_code == 304
+    partial = client.get('/temp_audio/user_1/llm_1_ab.mp3', headers={'Range': 'bytes=0-2'})
+    assert partial.status_code == 206 and partial.data == b'ID3'
+    assert partial.headers['Content-Range'] == 'bytes 0-2/15'
+
+
+def test_blob_etag_range_and_revalidated_recordings(flask_app):
+    flask_app.audio_blob_store.put('user_1/llm_2_cd.ogg', b'OggS-audio')
+    flask_app.audio_blob_store.put('user_1/user_recording_1.webm', b'webm-audio')
+    client = flask_app.app.test_client()
+
+    response = client.get('/temp_audio/user_1/llm_2_cd.ogg')
+    assert response.data == b'OggS-audio' and response.mimetype == 'audio/ogg'
+    assert response.cache_control.immutable
+    assert client.get('/temp_audio/user_1/llm_2_cd.ogg',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    partial = client.get('/temp_audio/user_1/llm_2_cd.ogg', headers={'Range': 'bytes=4-'})
+    assert partial.status_code == 206 and partial.data == b'-audio'
+
+    recording = client.get('/temp_audio/user_1/user_recording_1.webm')
+    assert recording.cache_control.no_cache and not recording.cache_control.immutable
+
+
+def test_path_outside_temp_audio_is_not_touched(flask_app, monkeypatch):
+    outside = os.path.dirname(flask_app.TEMP_AUDIO_DIR_ROOT)
+    with open(os.path.join(outside, 'secret.mp3'), 'wb') as f:
+        f.write(b'geheim')
+    open(os.path.join(outside, 'job.pending'), 'wb').close()
+
+    def must_not_hash(*args):
+        raise AssertionError("Datei außerhalb von temp_audio gelesen")
+
+    monkeypatch.setattr(flask_app, '_file_content_etag', must_not_hash)
+    client = flask_app.app.test_client()
+    assert client.get('/temp_audio/user_1/..%2F..%2Fsecret.mp3').status_code == 404
+    assert client.get('/temp_audio/..%2Fjob.mp3').status_code == 404  # kein 202 für fremde Marker
+    assert client.get('/temp_audio/user_1/fehlt.mp3').status_code == 404
@@ -0,0 +1,119 @@
+# tests/test_session_store.py
+import threading
+import time
+
+import pytest
+
+import session_store
+from session_store import SessionStore
+
+
+def _add(session, n, text='x' * 50):
+    session['history'].extend({'role': 'user', 'content': text} for _ in range(n))
+
+
+def test_lru_spills_oldest_and_restores_it(tmp_path):
+    store = SessionStore(str(tmp_path), max_entries=2)
+    _add(store.get_or_create('a'), 3)
+    store.get_or_create('b')
+    store.get_or_create('a')  # a ist jetzt der jüngste Eintrag
+    store.get_or_create('c')
+    assert 'b' not in store and 'a' in store
+    assert store.stats()['evicted_max_entries'] == 1 and store.stats()['on_disk'] == 1
+
+    store.get_or_create('b')
+    assert store.stats()['restored'] == 1
+
+
+def test_memory_budget_evicts_least_recently_used(tmp_path):
+    store = SessionStore(str(tmp_path), max_bytes=4000)
+    _add(store.get_or_create('a'), 10)
+    _add(store.get_or_create('b'), 10)
+    store.get_or_create('b')  # Größe von b wird beim Zugriff neu geschätzt
+    assert 'a' not in store and 'b' in store
+    assert store.stats()['evicted_memory'] == 1
+    assert len(store.get_or_create('a')['history']) == 10
+
+
+def test_idle_sessions_spilled_and_expired_spill_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, 'SWEEP_INTERVAL_SECONDS', 0)
+    store = SessionStore(str(tmp_path), idle_seconds=0.05, spill_ttl=0.2)
+    _add(store.get_or_create('a'), 2)
+    time.sleep(0.1)
+    store.get_or_create('b')
+    assert 'a' not in store and store.stats()['evicted_idle'] == 1
+
+    time.sleep(0.25)  # Spill-TTL abgelaufen
+    assert store.get_or_create('a')['history'] == []
+    assert store.stats()['expired_spill'] == 1
+
+
+def test_pinned_session_is_not_spilled(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, 'SWEEP_INTERVAL_SECONDS', 0)
+    store = SessionStore(str(tmp_path), max_entries=1, idle_seconds=0.05)
+    session = store.get_or_create('a', pin=True)
+    time.sleep(0.1)
+    store.get_or_create('b')
+    store.get_or_create('c')
+    assert 'a' in store and store.stats()['pinned'] == 1
+
+    # Der Request schreibt noch - nach release() darf ausgelagert werden, mit dem letzten Stand
+    _add(session, 1, 'réponse')
+    store.release('a', session)
+    store.get_or_create('d')
+    assert 'a' not in store
+    assert store.get_or_create('a')['history'][-1]['content'] == 'réponse'
+
+
+def test_release_after_reset_leaves_new_session_alone(tmp_path):
+    store = SessionStore(str(tmp_path))
+    old = store.get_or_create('a', pin=True)
+    store.reset('a')
+    new = store.get_or_create('a', pin=True)
+    store.release('a', old)
+    assert store.stats()['pinned'] == 1
+    store.release('a', new)
+    assert store.stats()['pinned'] == 0
+    assert not store.pin('a', old) and store.pin('a', new)
+
+
+def test_concurrent_restore_keeps_history(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path))
+    _add(store.get_or_create('a'), 4)
+    store._spill('a', store._pop_locked('a'))
+
+    # Erster Request hängt nach dem Lesen (Datei schon gelöscht) - der zweite darf keine leere Session anlegen
+    original_restore = store._restore
+    reading = threading.Event()
+
+    def slow_restore(user_id):
+        session = original_restore(user_id)
+        if not reading.is_set():
+            reading.set()
+            time.sleep(0.2)
+        return session
+
+    monkeypatch.setattr(store, '_restore', slow_restore)
+    results = {}
+    first = threading.Thread(target=lambda: results.setdefault('first', store.get_or_create('a')))
+    first.start()
+    assert reading.wait(2)
+    results['second'] = store.get_or_create('a')
+    first.join()
+
+    assert results['first'] is results['second']
+    assert len(results['second']['history']) == 4
+    assert store.stats()['restored'] == 1 and store.stats()['created'] == 1
+
+
+def test_corrupt_spill_file_gives_new_session(tmp_path):
+    store = SessionStore(str(tmp_path))
+    with open(store._spill_path('a'), 'wb') as f:
+        f.write(b'kein zlib')
+    assert store.get_or_create('a')['history'] == []
+
+
+@pytest.mark.parametrize('user_id', ['../../etc/passwd', 'a/b', 'x' * 500])
+def test_spill_path_stays_in_spill_dir(tmp_path, user_id):
+    store = SessionStore(str(tmp_path))
+    assert store._spill_path(user_id).startswith(str(tmp_path))
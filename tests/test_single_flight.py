@@ -0,0 +1,86 @@
+# tests/test_single_flight.py
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, payload_key
+from deadline import start_deadline, DeadlineExceeded
+
+
+def _run_concurrently(flight, key, func, waiters=3):
+    """Leader startet func und blockiert; weitere Aufrufer hängen sich an. Returns: Ergebnisse/Exceptions"""
+    results = [None] * (waiters + 1)
+
+    def call(i):
+        start_deadline(5)
+        try:
+            results[i] = flight.do(key, func)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(waiters + 1)]
+    threads[0].start()
+    time.sleep(0.05)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    return threads, results
+
+
+def test_waiters_share_leader_result():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return 'Bonjour !'
+
+    threads, results = _run_concurrently(flight, 'k', work)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ['Bonjour !'] * 4
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 3 and flight.stats()['in_flight'] == 0
+
+
+def test_leader_error_fans_out_to_all_waiters():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    error = RuntimeError("Anbieter weg")
+
+    def work():
+        release.wait(2)
+        raise error
+
+    threads, results = _run_concurrently(flight, 'k', work)
+    release.set()
+    for t in threads:
+        t.join()
+    assert all(r is error for r in results)
+
+    # Fehler werden nicht aufbewahrt - der nächste Aufruf führt func erneut aus
+    start_deadline(5)
+    assert flight.do('k', lambda: 'ok') == 'ok'
+
+
+def test_waiter_gives_up_at_its_own_deadline():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: (start_deadline(5), flight.do('k', lambda: release.wait(2))))
+    leader.start()
+    time.sleep(0.05)
+
+    start_deadline(0.1)
+    with pytest.raises(DeadlineExceeded):
+        flight.do('k', lambda: 'nie aufgerufen')
+    release.set()
+    leader.join()
+
+
+def test_payload_key_is_canonical():
+    assert payload_key({'a': 1, 'b': [1, 2]}) == payload_key({'b': [1, 2], 'a': 1})
+    assert payload_key({'a': 1}) != payload_key({'a': 2})
@@ -0,0 +1,118 @@
+# tests/test_stt_stream.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import vosk_stt
+from vosk_stt import RecognizerPool
+
+
+class FakeRecognizer:
+    """Jedes PCM-Stück ist ein Wort; b'.' schließt einen Teilsatz ab (wie eine Pause für Vosk)."""
+
+    def __init__(self):
+        self.words = []
+        self.resets = 0
+
+    def AcceptWaveform(self, pcm):
+        if pcm == b'.':
+            return True
+        self.words.append(pcm.decode())
+        return False
+
+    def _take(self):
+        text, self.words = ' '.join(self.words), []
+        return text
+
+    def PartialResult(self):
+        return json.dumps({'partial': ' '.join(self.words)})
+
+    def Result(self):
+        return json.dumps({'text': self._take()})
+
+    def FinalResult(self):
+        return json.dumps({'text': self._take()})
+
+    def Reset(self):
+        self.words = []
+        self.resets += 1
+
+
+class FakeSocket:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    def receive(self, timeout=None):
+        message = self.messages.pop(0)
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    def send(self, data):
+        self.sent.append(json.loads(data))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = RecognizerPool(size=1)
+    recognizer = FakeRecognizer()
+    monkeypatch.setattr(pool, '_create', lambda: recognizer)
+    monkeypatch.setattr(vosk_stt, 'recognizer_pool', pool)
+    return pool, recognizer
+
+
+def _stream(app_module, messages):
+    ws = FakeSocket(messages)
+    with app_module.app.test_request_context('/ws/stt?userId=1'):
+        app_module.stt_stream(ws)
+    return ws.sent
+
+
+def test_partials_while_feeding_and_final_on_stop(flask_app, pool):
+    sent = _stream(flask_app, [b'bonjour', b'.', b'madame', json.dumps({'event': 'stop'})])
+    assert sent == [{'type': 'partial', 'text': 'bonjour'},
+                    {'type': 'partial', 'text': 'bonjour madame'},
+                    {'type': 'final', 'text': 'bonjour madame'}]
+
+    pool, recognizer = pool
+    assert pool.stats() == {'size': 1, 'created': 1, 'idle': 1, 'waits': 0}
+    assert recognizer.resets == 1 and recognizer.words == []
+
+
+def test_recognizer_returns_to_pool_when_client_disconnects(flask_app, pool):
+    sent = _stream(flask_app, [b'bonjour', ConnectionError('Verbindung geschlossen')])
+    assert sent == [{'type': 'partial', 'text': 'bonjour'}]
+
+    pool, recognizer = pool
+    assert pool.stats()['idle'] == 1 and recognizer.resets == 1
+    # Der nächste Stream bekommt denselben, zurückgesetzten Recognizer
+    assert _stream(flask_app, [json.dumps({'event': 'stop'})]) == [{'type': 'final', 'text': ''}]
+    assert pool.stats()['created'] == 1
+
+
+def test_route_only_registered_with_flask_sock():
+    script = (
+        "import sys\n"
+        "if sys.argv[1] == 'ohne':\n"
+        "    sys.modules['flask_sock'] = None\n"
+        "import vosk_stt\n"
+        "vosk_stt.preload = lambda: True\n"
+        "import app\n"
+        "print(any(rule.rule == '/ws/stt' for rule in app.app.url_map.iter_rules()))\n"
+    )
+    backend = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+    env = dict(os.environ, STT_ENABLED='1', OPENING_POOL_ENABLED='0')
+
+    def registered(variant):
+        result = subprocess.run([sys.executable, '-c', script, variant], cwd=backend, env=env,
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        return result.stdout.strip().splitlines()[-1]
+
+    assert registered('ohne') == 'False'
+    pytest.importorskip('flask_sock')
+    assert registered('mit') == 'True'
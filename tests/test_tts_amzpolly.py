@@ -0,0 +1,64 @@
+# tests/test_tts_amzpolly.py
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+import tts_amzpolly
+
+
+class FakePolly:
+    """Antwortet je Stimme mit einem Fehlercode oder Audiodaten."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.voices = []
+
+    def synthesize_speech(self, VoiceId, **kwargs):
+        self.voices.append(VoiceId)
+        if VoiceId in self.errors:
+            raise ClientError({'Error': {'Code': self.errors[VoiceId], 'Message': 'Fehler'}}, 'SynthesizeSpeech')
+        return {'AudioStream': io.BytesIO(b'ID3' + VoiceId.encode())}
+
+
+@pytest.fixture
+def polly(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    monkeypatch.setattr(tts_amzpolly, '_preferred_voice', None)
+    monkeypatch.setattr(tts_amzpolly, '_voice_cooldowns', {})
+    monkeypatch.setattr(tts_amzpolly, '_voice_stats', {'requests': 0, 'fallbacks': 0, 'failed_attempts': 0,
+                                                       'skipped_cooldown': 0, 'used': {}})
+    monkeypatch.setattr(tts_amzpolly, 'TTS_VOICE_PROFILE', {'voice': 'Lea', 'engine': 'neural', 'audio_format': 'mp3'})
+    client = FakePolly({})
+    monkeypatch.setattr(tts_amzpolly, 'get_polly_client', lambda: client)
+    return client
+
+
+def test_voice_error_cools_voice_down_and_remembers_fallback(polly):
+    polly.errors = {'Lea': 'EngineNotSupportedException'}
+    assert tts_amzpolly.synthesize_bytes_amzpolly('Bonjour') == b'ID3Remi'
+    assert tts_amzpolly.TTS_VOICE_PROFILE == {'voice': 'Remi', 'engine': 'neural', 'audio_format': 'mp3'}
+
+    # Zweiter Aufruf: gemerkte Stimme zuerst, die gesperrte gar nicht
+    polly.voices.clear()
+    assert tts_amzpolly.synthesize_bytes_amzpolly('Bonjour') == b'ID3Remi'
+    assert polly.voices == ['Remi']
+
+    stats = tts_amzpolly.get_voice_stats()
+    assert stats['preferred_voice'] == 'Remi/neural' and stats['cooling_down'] == ['Lea/neural']
+    assert (stats['fallbacks'], stats['failed_attempts'], stats['skipped_cooldown']) == (1, 1, 1)
+
+
+@pytest.mark.parametrize('code, message', [
+    ('ThrottlingException', 'Rate-Limit'),
+    ('ServiceUnavailable', 'temporär nicht verfügbar'),
+    ('AccessDenied', 'Zugriff verweigert'),
+])
+def test_service_errors_do_not_walk_the_voices(polly, code, message):
+    polly.errors = {'Lea': code}
+    with pytest.raises(Exception, match=message):
+        tts_amzpolly.synthesize_bytes_amzpolly('Bonjour')
+    assert polly.voices == ['Lea']
+    assert tts_amzpolly.get_voice_stats()['cooling_down'] == []
+    assert tts_amzpolly.TTS_VOICE_PROFILE['voice'] == 'Lea'
@@ -0,0 +1,44 @@
+# tests/test_tts_cache.py
+import os
+
+from tts_cache import TTSAudioCache, make_cache_key, normalize_text, CACHE_SUFFIX
+
+
+def test_key_depends_on_format_and_normalized_text():
+    assert make_cache_key('polly', 'Ça va  bien ?') == make_cache_key('polly', 'Ça va bien ?')
+    assert make_cache_key('polly', 'Bonjour', audio_format='mp3') != make_cache_key('polly', 'Bonjour', audio_format='opus')
+    assert normalize_text('l’eau') == "l'eau"
+
+
+def test_store_and_fetch_any_format(tmp_path):
+    cache = TTSAudioCache(str(tmp_path))
+    ogg_key = make_cache_key('polly', 'Bonjour', audio_format='vorbis')
+    cache.store_bytes(ogg_key, b'OggS...')
+    assert cache.fetch_first_bytes(['missing', ogg_key]) == (ogg_key, b'OggS...')
+    assert cache.fetch_first_bytes(['missing']) == (None, None)
+    assert os.path.exists(os.path.join(str(tmp_path), ogg_key[:2], ogg_key + CACHE_SUFFIX))
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_bytes=25)
+    cache.store_bytes('aa1', b'x' * 10)
+    cache.store_bytes('bb2', b'x' * 10)
+    cache.fetch_first_bytes(['aa1'])  # aa1 ist jetzt der jüngste Eintrag
+    cache.store_bytes('cc3', b'x' * 10)
+    assert cache.fetch_first_bytes(['bb2']) == (None, None)
+    assert cache.fetch_first_bytes(['aa1'])[0] == 'aa1'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_index_survives_restart_and_drops_legacy_files(tmp_path):
+    cache = TTSAudioCache(str(tmp_path))
+    cache.store_bytes('dd4', b'audio')
+    legacy = tmp_path / 'ee' / 'ee5.mp3'
+    legacy.parent.mkdir()
+    legacy.write_bytes(b'ogg bytes unter .mp3')
+
+    reloaded = TTSAudioCache(str(tmp_path))
+    assert reloaded.stats()['entries'] == 1
+    assert reloaded.fetch_first_bytes(['dd4']) == ('dd4', b'audio')
+    assert not legacy.exists()
@@ -0,0 +1,60 @@
+# tests/test_tts_jobs.py
+import os
+
+from tts_jobs import (TTSJobQueue, file_status, job_audio_path, STATUS_READY, STATUS_FAILED, STATUS_PENDING,
+                      PENDING_SUFFIX, FAILED_SUFFIX)
+
+
+def _write_ogg(text, output_stem, user_id):
+    path = output_stem + '.ogg'
+    with open(path, 'wb') as f:
+        f.write(b'OggS' + text.encode())
+    return path
+
+
+def test_job_file_named_after_delivered_format(tmp_path):
+    queue = TTSJobQueue(workers=1)
+    stem = str(tmp_path / 'user_1' / 'llm_1_ab')
+    queue.submit('1_ab', _write_ogg, 'bonjour', stem, 'u1')
+    assert queue.wait('1_ab', stem, 5) == STATUS_READY
+    assert job_audio_path(stem) == stem + '.ogg'
+    assert not os.path.exists(stem + PENDING_SUFFIX)
+    assert file_status(stem) == STATUS_READY
+    assert queue.stats()['completed'] == 1
+
+
+def test_failed_job_leaves_marker(tmp_path):
+    queue = TTSJobQueue(workers=1)
+    stem = str(tmp_path / 'llm_2_cd')
+    queue.submit('2_cd', lambda text, output_stem, user_id: None, 'bonjour', stem, 'u1')
+    assert queue.wait('2_cd', stem, 5) == STATUS_FAILED
+    assert os.path.exists(stem + FAILED_SUFFIX)
+    assert job_audio_path(stem) is None
+    assert queue.stats()['failed'] == 1
+
+
+def test_file_status_across_workers(tmp_path):
+    stem = str(tmp_path / 'llm_3_ef')
+    assert file_status(stem) == STATUS_FAILED  # unbekannt
+    open(stem + PENDING_SUFFIX, 'wb').close()
+    open(stem + '.mp3.part', 'wb').close()
+    assert file_status(stem) == STATUS_PENDING
+    assert job_audio_path(stem) is None
+    open(stem + '.mp3', 'wb').close()
+    assert file_status(stem) == STATUS_READY
+
+
+def test_job_finishes_when_marker_cannot_be_written(tmp_path):
+    queue = TTSJobQueue(workers=1)
+    user_dir = tmp_path / 'user_4'
+    stem = str(user_dir / 'llm_4_gh')
+
+    def fail_and_remove_dir(text, output_stem, user_id):
+        # Janitor räumt das Verzeichnis während der Synthese ab
+        os.remove(output_stem + PENDING_SUFFIX)
+        os.rmdir(user_dir)
+        raise RuntimeError("Provider weg")
+
+    queue.submit('4_gh', fail_and_remove_dir, 'bonjour', stem, 'u1')
+    assert queue.wait('4_gh', stem, 5) == STATUS_FAILED
+    assert queue.stats()['in_flight'] == 0
@@ -0,0 +1,44 @@
+# tests/test_tts_pipeline.py
+import os
+
+from tts_pipeline import split_sentences, SentenceAccumulator, start_sentence_stream, get_sentence_stream
+
+
+def test_split_merges_short_fragments_and_abbreviations():
+    text = "Oui. Je vous présente M. Dupont, notre directeur. Il arrive demain matin à la gare. Bien !"
+    assert split_sentences(text) == [
+        "Oui. Je vous présente M. Dupont, notre directeur.",
+        "Il arrive demain matin à la gare. Bien !",
+    ]
+    assert split_sentences('') == []
+
+
+def test_accumulator_matches_split_sentences():
+    text = "Bonjour, comment allez-vous aujourd'hui ? Très bien, merci beaucoup. Et vous ?"
+    accumulator = SentenceAccumulator()
+    streamed = []
+    for i in range(0, len(text), 3):  # Tokens mitten im Wort
+        streamed += accumulator.feed(text[i:i + 3])
+    streamed += accumulator.flush()
+    assert streamed == ["Bonjour, comment allez-vous aujourd'hui ?", "Très bien, merci beaucoup.", "Et vous ?"]
+    assert accumulator.flush() == []
+
+
+def test_stream_yields_parts_in_order_and_skips_failures(tmp_path):
+    def synthesize(text, output_stem, user_id):
+        if 'kaputt' in text:
+            raise RuntimeError("Provider weg")
+        extension = 'ogg' if 'ogg' in text else 'mp3'
+        path = f"{output_stem}.{extension}"
+        with open(path, 'wb') as f:
+            f.write(text.encode())
+        return path
+
+    text = ("Premier morceau assez long. Ce morceau est kaputt, hélas. "
+            "Ce morceau arrive en ogg, hélas. Dernier morceau assez long.")
+    stream_id = start_sentence_stream(text, synthesize, str(tmp_path), 'u1')
+    stream = get_sentence_stream(stream_id)
+    data = b''.join(stream.iter_chunks(chunk_size=4))
+    assert data == b"Premier morceau assez long.Dernier morceau assez long."
+    assert stream.is_done()
+    assert all(name.startswith('llm_part_') for name in os.listdir(tmp_path))
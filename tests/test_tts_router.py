@@ -0,0 +1,43 @@
+# tests/test_tts_router.py
+import time
+
+import pytest
+
+from tts_router import TTSRouter, TTSProvider
+from resilience import HALF_OPEN, CLOSED
+from deadline import DeadlineExceeded
+
+
+def test_deadline_in_probe_does_not_wedge_breaker():
+    def out_of_time(text, audio_format=None):
+        raise DeadlineExceeded("zu spät")
+
+    # Eigener Name je Test - die Breaker sind prozessweit
+    provider = TTSProvider('test-probe', None, {'audio_format': 'mp3'}, synthesize_bytes=out_of_time)
+    provider.breaker.reset_seconds = 0.01
+    for _ in range(provider.breaker.failure_threshold):
+        provider.breaker.record_failure()
+    time.sleep(0.02)
+
+    router = TTSRouter([provider], hedge=False)
+    with pytest.raises(Exception):
+        router.synthesize_bytes("bonjour")
+    assert provider.breaker.state == HALF_OPEN
+    assert provider.breaker.is_available()
+
+    provider.synthesize_bytes = lambda text, audio_format=None: b'audio'
+    assert router.synthesize_bytes("bonjour")[0] == b'audio'
+    assert provider.breaker.state == CLOSED
+
+
+def test_failover_to_next_provider():
+    def broken(text, audio_format=None):
+        raise RuntimeError("kaputt")
+
+    first = TTSProvider('test-broken', None, {'audio_format': 'mp3'}, synthesize_bytes=broken)
+    second = TTSProvider('test-vorbis', None, {'audio_format': 'ogg_vorbis'},
+                         synthesize_bytes=lambda text, audio_format=None: b'ogg-bytes', formats=('ogg_vorbis', 'mp3'))
+    router = TTSRouter([first, second], hedge=False)
+    audio_bytes, provider, audio_format = router.synthesize_bytes("bonjour", formats=['ogg_vorbis'])
+    assert (audio_bytes, provider, audio_format) == (b'ogg-bytes', second, 'ogg_vorbis')
+    assert first.breaker.consecutive_failures == 1
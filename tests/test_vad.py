@@ -0,0 +1,92 @@
+# tests/test_vad.py
+import io
+import wave
+import logging
+
+import numpy as np
+import pytest
+
+import vosk_stt
+from vad import detect_speech, VAD_MIN_DBFS
+
+RATE = 16000
+
+
+def _pcm(*parts):
+    """parts: (Sekunden, Pegel in dBFS oder None für Stille) -> PCM 16 bit mono."""
+    rng = np.random.default_rng(0)
+    chunks = []
+    for seconds, level_db in parts:
+        n = int(seconds * RATE)
+        if level_db is None:
+            chunks.append(np.zeros(n))
+        else:
+            chunks.append(rng.standard_normal(n) * 10 ** (level_db / 20))
+    samples = np.clip(np.concatenate(chunks), -1, 1)
+    return (samples * 32767).astype('<i2').tobytes()
+
+
+def test_silence_is_empty():
+    result = detect_speech(_pcm((2, None)), RATE)
+    assert result.empty
+    assert result.skipped_seconds == pytest.approx(2)
+
+
+def test_quiet_noise_below_floor_is_empty():
+    assert detect_speech(_pcm((2, VAD_MIN_DBFS - 15)), RATE).empty
+
+
+def test_long_pause_splits_segments_and_trims_silence():
+    result = detect_speech(_pcm((1, None), (1, -20), (1.5, None), (1, -20), (1, None)), RATE)
+    assert len(result.segments) == 2
+    first_start, first_end = result.segments[0]
+    assert first_start / RATE == pytest.approx(0.8, abs=0.05)  # 200 ms Polster vor der Sprache
+    assert first_end / RATE == pytest.approx(2.2, abs=0.05)
+    assert result.skipped_seconds > 2
+
+
+def test_short_pause_stays_in_segment():
+    result = detect_speech(_pcm((1, None), (1, -20), (0.3, None), (1, -20), (1, None)), RATE)
+    assert len(result.segments) == 1
+
+
+def test_click_is_ignored():
+    assert detect_speech(_pcm((1, None), (0.03, -10), (1, None)), RATE).empty
+
+
+def test_steady_loud_signal_is_not_rejected():
+    # Keine Pausen, keine Dynamik: früher lag die Schwelle 12 dB über allen Rahmen
+    result = detect_speech(_pcm((3, -14)), RATE)
+    assert not result.empty
+    assert result.speech_seconds == pytest.approx(3, abs=0.05)
+
+
+def test_low_dynamic_range_speech_is_not_rejected():
+    # Komprimiertes Mikrofon: Silben und Pausen unterscheiden sich nur um ~3 dB
+    parts = [(0.25, -18 if i % 2 else -21) for i in range(12)]
+    assert not detect_speech(_pcm(*parts), RATE).empty
+
+
+def test_without_numpy_audio_passes_untrimmed(monkeypatch, caplog):
+    def numpy_missing(pcm, sample_rate):
+        raise ImportError("No module named 'numpy'")
+
+    transcribed = []
+    monkeypatch.setattr(vosk_stt, 'detect_speech', numpy_missing)
+    monkeypatch.setattr(vosk_stt, '_vad_unavailable', False)
+    monkeypatch.setattr(vosk_stt, 'transcribe_pcm', lambda pcm, segments=None: transcribed.append((pcm, segments)) or 'salut')
+
+    pcm = _pcm((1, None), (1, -20), (1, None))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(RATE)
+        wav_file.writeframes(pcm)
+
+    with caplog.at_level(logging.WARNING, logger='vosk_stt'):
+        for _ in range(2):
+            result = vosk_stt.transcribe_bytes_detailed(buffer.getvalue())
+    assert transcribed == [(pcm, None), (pcm, None)]
+    assert result['skipped_seconds'] == 0.0 and result['text'] == 'salut'
+    assert sum('VAD deaktiviert' in r.message for r in caplog.records) == 1